@@ -10,30 +10,56 @@ Assumptions:
 - It contains at least: tech, plan, mode, proto, port, udp_rate, dscp, direction
 - It *may* contain throughput / loss columns; we autodetect them.
 - It already contains gw_rtt_* columns from previous processing.
+
+Every figure is a (slice, plot) pair in FIGURES: the slice function
+returns exactly the rows/columns the figure reads (or None to skip it),
+and the plot function only sees that slice. build_outputs.py hashes the
+slices to redraw only figures whose data changed.
+
+Usage:
+  python3 analysis_notebook_rq1_rq2_rq4.py                 # all figures
+  python3 analysis_notebook_rq1_rq2_rq4.py --figure NAME   # only NAME (repeatable)
 """
 
+import argparse
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from compact_tables import read_table
+
 # ----------------------------------------------------------------------
-# Paths & basic load
+# Paths
 # ----------------------------------------------------------------------
 
 BASE_DIR = Path.home() / "analysis"
 SUMMARY_CSV = BASE_DIR / "all_starlink_runs.csv"
 FIG_DIR = BASE_DIR / "figures"
-FIG_DIR.mkdir(exist_ok=True)
-
-print(f"[*] Loading summary from: {SUMMARY_CSV}")
-df = pd.read_csv(SUMMARY_CSV)
 
-print(f"[+] Loaded {len(df)} runs")
-print("\n[+] First 5 rows:")
-print(df.head())
-print("\n[+] Columns:")
-print(df.columns.tolist())
+TCP_THR_CANDIDATES = [
+    "iperf_avg_throughput_Mbps",  # our metrics_run column
+    "tcp_sender_Mbps",
+    "sender_Mbps",
+    "throughput_Mbps",
+    "bw_Mbps",
+    "avg_Mbps",
+    "goodput_Mbps",
+]
+UDP_LOSS_CANDIDATES = [
+    "iperf_udp_loss_pct",  # our metrics_run field
+    "udp_loss_percent",
+    "loss_percent",
+    "udp_loss",
+    "loss",
+]
+GW_RTT_CANDIDATES = [
+    "gw_rtt_p95_ms",
+    "gw_rtt_p90_ms",
+    "gw_rtt_p99_ms",
+    "gw_rtt_p50_ms",
+    "gw_rtt_avg_ms",
+]
 
 
 # ----------------------------------------------------------------------
@@ -41,19 +67,22 @@ print(df.columns.tolist())
 # ----------------------------------------------------------------------
 
 
-def pick_column(df: pd.DataFrame, candidates, what: str):
+def pick_column(df: pd.DataFrame, candidates, what: str, verbose=True):
     """
     Try multiple possible column names and return the first that exists.
     """
     for c in candidates:
         if c in df.columns:
-            print(f"[+] Using '{c}' as {what}")
+            if verbose:
+                print(f"[+] Using '{c}' as {what}")
             return c
-    print(f"[!] No column found for {what}. Tried: {candidates}")
+    if verbose:
+        print(f"[!] No column found for {what}. Tried: {candidates}")
     return None
 
 
 def save_fig(fig, name: str):
+    FIG_DIR.mkdir(exist_ok=True)
     out = FIG_DIR / name
     fig.tight_layout()
     fig.savefig(out, dpi=200)
@@ -61,210 +90,273 @@ def save_fig(fig, name: str):
     print(f"[+] Saved figure: {out}")
 
 
-# ----------------------------------------------------------------------
-# Quick high-level distributions (sanity)
-# ----------------------------------------------------------------------
+def _rows(df, proto=None, port=None):
+    if proto is not None:
+        if "proto" not in df.columns:
+            return None
+        df = df[df["proto"] == proto]
+    if port is not None:
+        if "port" not in df.columns:
+            return None
+        df = df[df["port"] == port]
+    return df
 
-print("\n=== HIGH-LEVEL DISTRIBUTIONS ===")
 
-for col in ["tech", "plan", "mode", "proto", "port", "udp_rate", "dscp", "direction"]:
-    if col in df.columns:
-        print(f"\n[+] Distribution of {col}:")
-        print(df[col].value_counts(dropna=False))
-    else:
-        print(f"[!] Column '{col}' not found")
+def _slice(df, cols, proto=None, port=None):
+    """
+    Rows for proto/port with only `cols`; None if a column is missing or
+    nothing is left.
+    """
+    if any(c is None or c not in df.columns for c in cols):
+        return None
+    rows = _rows(df, proto, port)
+    if rows is None or rows.empty:
+        return None
+    return rows[list(cols)].copy()
 
 
 # ----------------------------------------------------------------------
 # RQ1: Baseline capacity (TCP and UDP)
 # ----------------------------------------------------------------------
 
-print("\n=== RQ1: Baseline capacity (TCP/UDP) ===")
-
-# ---- TCP throughput by port / mode -----------------------------------
-if "proto" in df.columns:
-    tcp = df[df["proto"] == "tcp"].copy()
-else:
-    tcp = pd.DataFrame()
-
-tcp_thr_col = pick_column(
-    tcp,
-    candidates=[
-        "iperf_avg_throughput_Mbps",  # our metrics_run column
-        "tcp_sender_Mbps",
-        "sender_Mbps",
-        "throughput_Mbps",
-        "bw_Mbps",
-        "avg_Mbps",
-        "goodput_Mbps",
-    ],
-    what="TCP throughput (Mbps)",
-)
-
-if not tcp.empty and tcp_thr_col is not None and "port" in tcp.columns:
+
+def slice_tcp_thr_by_port(df):
+    thr = pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)", verbose=False)
+    return _slice(df, ["port", thr], proto="tcp")
+
+
+def plot_tcp_thr_by_port(s, name):
     # Boxplot: TCP throughput by port
     fig, ax = plt.subplots(figsize=(6, 4))
-    tcp.boxplot(column=tcp_thr_col, by="port", ax=ax)
+    s.boxplot(column=s.columns[-1], by="port", ax=ax)
     ax.set_title("TCP throughput by port")
     ax.set_xlabel("Port")
     ax.set_ylabel("Throughput (Mbps)")
     plt.suptitle("")
-    save_fig(fig, "rq1_tcp_throughput_by_port_box.png")
-
-    # Optional: split by mode if available
-    if "mode" in tcp.columns:
-        fig, ax = plt.subplots(figsize=(7, 4))
-        for mode, sub in tcp.groupby("mode"):
-            ax.scatter(
-                sub["port"],
-                sub[tcp_thr_col],
-                label=str(mode),
-                alpha=0.6,
-            )
-        ax.set_title("TCP throughput by port and mode")
-        ax.set_xlabel("Port")
-        ax.set_ylabel("Throughput (Mbps)")
-        ax.legend()
-        save_fig(fig, "rq1_tcp_throughput_by_port_mode_scatter.png")
-else:
-    print("[!] Skipping TCP RQ1 plots (missing proto/port/throughput column).")
-
-# ---- UDP loss vs rate ------------------------------------------------
-if "proto" in df.columns:
-    udp = df[df["proto"] == "udp"].copy()
-else:
-    udp = pd.DataFrame()
-
-udp_loss_col = pick_column(
-    udp,
-    candidates=[
-        "iperf_udp_loss_pct",  # our metrics_run field
-        "udp_loss_percent",
-        "loss_percent",
-        "udp_loss",
-        "loss",
-    ],
-    what="UDP loss (%)",
-)
-
-if not udp.empty and udp_loss_col is not None and "udp_rate" in udp.columns:
-    # Try to normalize udp_rate to numeric (1M,5M,10M -> 1,5,10)
-    rate_map = {"1M": 1, "5M": 5, "10M": 10}
-    udp["udp_rate_Mbps"] = udp["udp_rate"].map(rate_map)
+    save_fig(fig, name)
+
+
+def slice_tcp_thr_by_port_mode(df):
+    thr = pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)", verbose=False)
+    return _slice(df, ["port", "mode", thr], proto="tcp")
+
 
+def plot_tcp_thr_by_port_mode(s, name):
+    thr = s.columns[-1]
+    fig, ax = plt.subplots(figsize=(7, 4))
+    for mode, sub in s.groupby("mode", observed=True):
+        ax.scatter(
+            sub["port"],
+            sub[thr],
+            label=str(mode),
+            alpha=0.6,
+        )
+    ax.set_title("TCP throughput by port and mode")
+    ax.set_xlabel("Port")
+    ax.set_ylabel("Throughput (Mbps)")
+    ax.legend()
+    save_fig(fig, name)
+
+
+def slice_udp_loss_vs_rate(df):
+    loss = pick_column(df, UDP_LOSS_CANDIDATES, "UDP loss (%)", verbose=False)
+    return _slice(df, ["udp_rate", loss], proto="udp")
+
+
+def plot_udp_loss_vs_rate(s, name):
+    loss = s.columns[-1]
     fig, ax = plt.subplots(figsize=(6, 4))
-    for rate, sub in udp.groupby("udp_rate"):
+    for rate, sub in s.groupby("udp_rate", observed=True):
         ax.scatter(
             [str(rate)] * len(sub),
-            sub[udp_loss_col],
+            sub[loss],
             alpha=0.6,
             label=str(rate),
         )
     ax.set_title("UDP loss vs sending rate")
     ax.set_xlabel("UDP rate label")
     ax.set_ylabel("Loss (%)")
-    save_fig(fig, "rq1_udp_loss_vs_rate_scatter.png")
-else:
-    print("[!] Skipping UDP RQ1 plots (missing proto/udp_rate/loss column).")
+    save_fig(fig, name)
 
 
 # ----------------------------------------------------------------------
 # RQ2: DSCP / QoS impact (mainly TCP 443)
 # ----------------------------------------------------------------------
 
-print("\n=== RQ2: DSCP / QoS impact ===")
-
-if (
-    "proto" in df.columns
-    and "port" in df.columns
-    and "dscp" in df.columns
-    and tcp_thr_col is not None
-):
-    tcp443 = df[(df["proto"] == "tcp") & (df["port"] == 443)].copy()
-    if not tcp443.empty:
-        # Boxplot throughput by DSCP
-        fig, ax = plt.subplots(figsize=(6, 4))
-        tcp443.boxplot(column=tcp_thr_col, by="dscp", ax=ax)
-        ax.set_title("TCP 443 throughput by DSCP")
-        ax.set_xlabel("DSCP")
-        ax.set_ylabel("Throughput (Mbps)")
-        plt.suptitle("")
-        save_fig(fig, "rq2_tcp443_throughput_by_dscp_box.png")
-
-        # If modes exist, do a scatter / swarm-style plot
-        if "mode" in tcp443.columns:
-            fig, ax = plt.subplots(figsize=(7, 4))
-            for (mode, dscp), sub in tcp443.groupby(["mode", "dscp"]):
-                x = f"{mode}_dscp{dscp}"
-                ax.scatter(
-                    [x] * len(sub),
-                    sub[tcp_thr_col],
-                    alpha=0.6,
-                    label=None,
-                )
-            ax.set_title("TCP 443 throughput by DSCP and mode")
-            ax.set_xlabel("Mode + DSCP")
-            ax.set_ylabel("Throughput (Mbps)")
-            plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
-            save_fig(fig, "rq2_tcp443_throughput_mode_dscp_scatter.png")
-    else:
-        print("[!] No TCP 443 rows found; skipping RQ2.")
-else:
-    print("[!] Missing proto/port/dscp or TCP throughput column; skipping RQ2.")
+
+def slice_tcp443_by_dscp(df):
+    thr = pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)", verbose=False)
+    return _slice(df, ["dscp", thr], proto="tcp", port=443)
+
+
+def plot_tcp443_by_dscp(s, name):
+    # Boxplot throughput by DSCP
+    fig, ax = plt.subplots(figsize=(6, 4))
+    s.boxplot(column=s.columns[-1], by="dscp", ax=ax)
+    ax.set_title("TCP 443 throughput by DSCP")
+    ax.set_xlabel("DSCP")
+    ax.set_ylabel("Throughput (Mbps)")
+    plt.suptitle("")
+    save_fig(fig, name)
+
+
+def slice_tcp443_by_mode_dscp(df):
+    thr = pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)", verbose=False)
+    return _slice(df, ["mode", "dscp", thr], proto="tcp", port=443)
+
+
+def plot_tcp443_by_mode_dscp(s, name):
+    thr = s.columns[-1]
+    fig, ax = plt.subplots(figsize=(7, 4))
+    for (mode, dscp), sub in s.groupby(["mode", "dscp"], observed=True):
+        x = f"{mode}_dscp{dscp}"
+        ax.scatter(
+            [x] * len(sub),
+            sub[thr],
+            alpha=0.6,
+            label=None,
+        )
+    ax.set_title("TCP 443 throughput by DSCP and mode")
+    ax.set_xlabel("Mode + DSCP")
+    ax.set_ylabel("Throughput (Mbps)")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    save_fig(fig, name)
 
 
 # ----------------------------------------------------------------------
 # RQ4: Gateway RTT / latency behavior
 # ----------------------------------------------------------------------
 
-print("\n=== RQ4: Gateway RTT / latency behavior ===")
-
-gw_rtt_col = pick_column(
-    df,
-    candidates=[
-        "gw_rtt_p95_ms",
-        "gw_rtt_p90_ms",
-        "gw_rtt_p99_ms",
-        "gw_rtt_p50_ms",
-        "gw_rtt_avg_ms",
-    ],
-    what="gateway RTT representative (ms)",
-)
-
-if gw_rtt_col is not None:
-    # RTT by mode
-    if "mode" in df.columns:
-        fig, ax = plt.subplots(figsize=(6, 4))
-        df.boxplot(column=gw_rtt_col, by="mode", ax=ax)
-        ax.set_title(f"Gateway {gw_rtt_col} by mode")
-        ax.set_xlabel("Mode")
-        ax.set_ylabel("RTT (ms)")
-        plt.suptitle("")
-        save_fig(fig, "rq4_gw_rtt_by_mode_box.png")
 
-    # RTT by port
-    if "port" in df.columns:
+def slice_gw_rtt_by(key):
+    def _slice_by(df):
+        rtt = pick_column(df, GW_RTT_CANDIDATES, "gateway RTT", verbose=False)
+        return _slice(df, [key, rtt])
+
+    return _slice_by
+
+
+def plot_gw_rtt_by(key, label):
+    def _plot(s, name):
+        rtt = s.columns[-1]
         fig, ax = plt.subplots(figsize=(6, 4))
-        df.boxplot(column=gw_rtt_col, by="port", ax=ax)
-        ax.set_title(f"Gateway {gw_rtt_col} by port")
-        ax.set_xlabel("Port")
+        s.boxplot(column=rtt, by=key, ax=ax)
+        ax.set_title(f"Gateway {rtt} by {key}")
+        ax.set_xlabel(label)
         ax.set_ylabel("RTT (ms)")
         plt.suptitle("")
-        save_fig(fig, "rq4_gw_rtt_by_port_box.png")
+        save_fig(fig, name)
 
-    # Optional: relationship between RTT and throughput if we found TCP thr
-    if tcp_thr_col is not None:
-        tcp_for_rtt = df[df["proto"] == "tcp"].dropna(
-            subset=[gw_rtt_col, tcp_thr_col]
-        )
-        if not tcp_for_rtt.empty:
-            fig, ax = plt.subplots(figsize=(6, 4))
-            ax.scatter(tcp_for_rtt[gw_rtt_col], tcp_for_rtt[tcp_thr_col], alpha=0.6)
-            ax.set_title("TCP throughput vs gateway RTT")
-            ax.set_xlabel(f"Gateway {gw_rtt_col} (ms)")
-            ax.set_ylabel("Throughput (Mbps)")
-            save_fig(fig, "rq4_tcp_throughput_vs_gw_rtt_scatter.png")
-else:
-    print("[!] No gw_rtt_* columns found; skipping RQ4.")
-
-print("\n[*] Analysis complete. Figures are under:", FIG_DIR)
+    return _plot
+
+
+def slice_tcp_thr_vs_gw_rtt(df):
+    rtt = pick_column(df, GW_RTT_CANDIDATES, "gateway RTT", verbose=False)
+    thr = pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)", verbose=False)
+    s = _slice(df, [rtt, thr], proto="tcp")
+    if s is None:
+        return None
+    s = s.dropna()
+    return None if s.empty else s
+
+
+def plot_tcp_thr_vs_gw_rtt(s, name):
+    rtt, thr = s.columns
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.scatter(s[rtt], s[thr], alpha=0.6)
+    ax.set_title("TCP throughput vs gateway RTT")
+    ax.set_xlabel(f"Gateway {rtt} (ms)")
+    ax.set_ylabel("Throughput (Mbps)")
+    save_fig(fig, name)
+
+
+# figure file -> (slice function, plot function)
+FIGURES = {
+    "rq1_tcp_throughput_by_port_box.png": (slice_tcp_thr_by_port, plot_tcp_thr_by_port),
+    "rq1_tcp_throughput_by_port_mode_scatter.png": (
+        slice_tcp_thr_by_port_mode,
+        plot_tcp_thr_by_port_mode,
+    ),
+    "rq1_udp_loss_vs_rate_scatter.png": (slice_udp_loss_vs_rate, plot_udp_loss_vs_rate),
+    "rq2_tcp443_throughput_by_dscp_box.png": (slice_tcp443_by_dscp, plot_tcp443_by_dscp),
+    "rq2_tcp443_throughput_mode_dscp_scatter.png": (
+        slice_tcp443_by_mode_dscp,
+        plot_tcp443_by_mode_dscp,
+    ),
+    "rq4_gw_rtt_by_mode_box.png": (slice_gw_rtt_by("mode"), plot_gw_rtt_by("mode", "Mode")),
+    "rq4_gw_rtt_by_port_box.png": (slice_gw_rtt_by("port"), plot_gw_rtt_by("port", "Port")),
+    "rq4_tcp_throughput_vs_gw_rtt_scatter.png": (
+        slice_tcp_thr_vs_gw_rtt,
+        plot_tcp_thr_vs_gw_rtt,
+    ),
+}
+
+
+def load_summary(path=SUMMARY_CSV):
+    return read_table(path)
+
+
+def draw_figure(df, name):
+    """
+    Draw one figure from FIGURES. Returns False if its data is missing.
+    """
+    slice_fn, plot_fn = FIGURES[name]
+    s = slice_fn(df)
+    if s is None:
+        print(f"[!] Skipping {name} (missing rows or columns).")
+        return False
+    plot_fn(s, name)
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RQ1/RQ2/RQ4 figures from all_starlink_runs.csv")
+    ap.add_argument("--figure", action="append", choices=sorted(FIGURES), help="only this figure")
+    args = ap.parse_args()
+
+    print(f"[*] Loading summary from: {SUMMARY_CSV}")
+    df = load_summary()
+    print(f"[+] Loaded {len(df)} runs")
+
+    if args.figure:
+        for name in args.figure:
+            draw_figure(df, name)
+        return
+
+    print("\n[+] First 5 rows:")
+    print(df.head())
+    print("\n[+] Columns:")
+    print(df.columns.tolist())
+
+    # ------------------------------------------------------------------
+    # Quick high-level distributions (sanity)
+    # ------------------------------------------------------------------
+
+    print("\n=== HIGH-LEVEL DISTRIBUTIONS ===")
+
+    for col in ["tech", "plan", "mode", "proto", "port", "udp_rate", "dscp", "direction"]:
+        if col in df.columns:
+            print(f"\n[+] Distribution of {col}:")
+            print(df[col].value_counts(dropna=False))
+        else:
+            print(f"[!] Column '{col}' not found")
+
+    pick_column(df, TCP_THR_CANDIDATES, "TCP throughput (Mbps)")
+    pick_column(df, UDP_LOSS_CANDIDATES, "UDP loss (%)")
+    pick_column(df, GW_RTT_CANDIDATES, "gateway RTT representative (ms)")
+
+    for section, prefix in (
+        ("RQ1: Baseline capacity (TCP/UDP)", "rq1_"),
+        ("RQ2: DSCP / QoS impact", "rq2_"),
+        ("RQ4: Gateway RTT / latency behavior", "rq4_"),
+    ):
+        print(f"\n=== {section} ===")
+        for name in FIGURES:
+            if name.startswith(prefix):
+                draw_figure(df, name)
+
+    print("\n[*] Analysis complete. Figures are under:", FIG_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,64 +7,61 @@ Inputs (in RESULTS_DIR):
   - gateway_ping_samples.csv    # timestamp_epoch, seq, rtt_ms (optional)
 
 Outputs:
-  - metrics_gateway.csv         # one-line CSV with summary stats
+  - metrics_gateway.csv         # one-line CSV with summary stats + loss bursts
   - run_status.txt              # OK / DEGRADED / FAIL
+  - rtt_pyramid_<w>s.npy        # multi-resolution RTT series (rtt_pyramid.py)
+  - ~/analysis/results_catalog.sqlite (upserted, see results_catalog.py)
+  - ~/analysis/rtt_store/ (RTT samples appended, see rtt_store.py)
+  - ~/analysis/metrics/starlink_pipeline.prom (see metrics_export.py)
 
 Used later in the Jupyter / offline analysis.
 """
 
 import csv
 import math
-import re
 import sys
+import time
 from pathlib import Path
 
-
-def parse_ping_summary(raw_log: Path):
+from jitter import JITTER_FIELDS, empty_jitter_metrics, jitter_metrics
+from metrics_export import observe_stage, record_run
+from ping_gaps import (
+    GAP_FIELDS,
+    analyze_gaps,
+    empty_gap_metrics,
+    estimate_interval,
+    parse_ping_log,
+)
+from results_catalog import gateway_record, safe_upsert
+from rtt_pyramid import build_pyramid, pyramid_is_stale
+from rtt_store import safe_ingest_run
+
+
+def ping_stats_from_log(parsed, tx, rx):
     """
-    Parse ping_gateway_raw.log to extract:
-      - packets transmitted/received
-      - loss percentage
-      - rtt min/avg/max/mdev
+    Packets transmitted/received, loss percentage and rtt min/avg/max/mdev
+    (population std, as ping reports it) from the parse_ping_log()
+    timeline, so the raw log is read once.
 
-    Returns a dict or None if not found.
+    Returns a dict or None if no echo request was seen.
     """
-    if not raw_log.exists():
+    if tx <= 0:
         return None
-
+    rtt = parsed["rtt_ms"]
     stats = {
-        "tx": None,
-        "rx": None,
-        "loss_percent": None,
+        "tx": tx,
+        "rx": rx,
+        "loss_percent": (tx - rx) * 100.0 / tx,
         "rtt_min_ms": None,
         "rtt_avg_ms": None,
         "rtt_max_ms": None,
         "rtt_std_ms": None,
     }
-
-    txrx_re = re.compile(
-        r"(\d+)\s+packets transmitted,\s+(\d+)\s+received.*?(\d+(?:\.\d+)?)% packet loss"
-    )
-    rtt_re = re.compile(
-        r"rtt min/avg/max/mdev = ([0-9.]+)/([0-9.]+)/([0-9.]+)/([0-9.]+) ms"
-    )
-
-    with raw_log.open() as f:
-        for line in f:
-            m1 = txrx_re.search(line)
-            if m1:
-                stats["tx"] = int(m1.group(1))
-                stats["rx"] = int(m1.group(2))
-                stats["loss_percent"] = float(m1.group(3))
-            m2 = rtt_re.search(line)
-            if m2:
-                stats["rtt_min_ms"] = float(m2.group(1))
-                stats["rtt_avg_ms"] = float(m2.group(2))
-                stats["rtt_max_ms"] = float(m2.group(3))
-                stats["rtt_std_ms"] = float(m2.group(4))
-
-    if stats["tx"] is None or stats["rx"] is None:
-        return None
+    if rtt.size:
+        stats["rtt_min_ms"] = float(rtt.min())
+        stats["rtt_avg_ms"] = float(rtt.mean())
+        stats["rtt_max_ms"] = float(rtt.max())
+        stats["rtt_std_ms"] = float(rtt.std())
     return stats
 
 
@@ -84,13 +81,15 @@ def percentile(xs, p):
 
 def parse_samples(samples_csv: Path):
     """
-    Parse gateway_ping_samples.csv to get all RTT samples and timestamps.
+    Parse gateway_ping_samples.csv to get all RTT samples, timestamps and
+    icmp_seqs (None where the column is missing).
     """
     rtts = []
     timestamps = []
+    seqs = []
 
     if not samples_csv.exists():
-        return rtts, timestamps
+        return rtts, timestamps, seqs
 
     with samples_csv.open() as f:
         reader = csv.DictReader(f)
@@ -102,11 +101,16 @@ def parse_samples(samples_csv: Path):
                 continue
             rtts.append(rtt)
             timestamps.append(ts)
+            try:
+                seqs.append(int(row["seq"]))
+            except (ValueError, KeyError, TypeError):
+                seqs.append(None)
 
-    return rtts, timestamps
+    return rtts, timestamps, seqs
 
 
 def main():
+    t_start = time.monotonic()
     if len(sys.argv) != 5:
         print(
             f"Usage: {sys.argv[0]} <results_dir> <gateway_ip> <nut_label> <location_label>",
@@ -122,8 +126,23 @@ def main():
     raw_log = results_dir / "ping_gateway_raw.log"
     samples_csv = results_dir / "gateway_ping_samples.csv"
 
-    ping_stats = parse_ping_summary(raw_log)
-    rtts, timestamps = parse_samples(samples_csv)
+    rtts, timestamps, seqs = parse_samples(samples_csv)
+
+    # tx/rx/loss and the loss-burst / outage structure from one pass over
+    # the raw icmp_seq timeline
+    if raw_log.exists():
+        parsed = parse_ping_log(raw_log)
+        tx, rx, gaps = analyze_gaps(
+            parsed["seq"],
+            lost_seqs=parsed["lost_seq"],
+            tx_hint=parsed["tx_summary"],
+            dup=parsed["dup"],
+            interval_s=estimate_interval(parsed["seq"], parsed["ts"]),
+        )
+        ping_stats = ping_stats_from_log(parsed, tx, rx)
+    else:
+        ping_stats = None
+        gaps = empty_gap_metrics()
 
     # Derived stats from per-sample RTTs
     if rtts:
@@ -134,11 +153,12 @@ def main():
     else:
         p50 = p90 = p95 = p99 = None
 
-    if rtts and len(rtts) > 1:
-        diffs = [abs(rtts[i] - rtts[i - 1]) for i in range(1, len(rtts))]
-        jitter_mean_abs = sum(diffs) / len(diffs)
+    # RFC 3550 jitter, IPDV/PDV and mean abs delta RTT (see jitter.py)
+    if rtts:
+        jit = jitter_metrics(rtts, seq=None if None in seqs else seqs)
     else:
-        jitter_mean_abs = None
+        jit = empty_jitter_metrics()
+    jitter_mean_abs = jit["mean_abs_delta_ms"]
 
     if timestamps:
         duration_s = timestamps[-1] - timestamps[0]
@@ -176,13 +196,14 @@ def main():
             f"Packets       : tx={ping_stats['tx']} rx={ping_stats['rx']} "
             f"loss={ping_stats['loss_percent']:.2f}%"
         )
-        print(
-            "RTT ping line : "
-            f"min={ping_stats['rtt_min_ms']:.2f} ms, "
-            f"avg={ping_stats['rtt_avg_ms']:.2f} ms, "
-            f"max={ping_stats['rtt_max_ms']:.2f} ms, "
-            f"mdev≈jitter={ping_stats['rtt_std_ms']:.2f} ms"
-        )
+        if ping_stats["rtt_min_ms"] is not None:
+            print(
+                "RTT ping line : "
+                f"min={ping_stats['rtt_min_ms']:.2f} ms, "
+                f"avg={ping_stats['rtt_avg_ms']:.2f} ms, "
+                f"max={ping_stats['rtt_max_ms']:.2f} ms, "
+                f"mdev≈jitter={ping_stats['rtt_std_ms']:.2f} ms"
+            )
     else:
         print("Ping summary  : (not available)")
 
@@ -196,18 +217,33 @@ def main():
         )
         if jitter_mean_abs is not None:
             print(f"Mean abs ΔRTT : {jitter_mean_abs:.2f} ms (jitter over time)")
+            print(
+                f"RFC 3550 jit. : {jit['jitter_rfc3550_ms']:.2f} ms, "
+                f"|IPDV| p95={jit['ipdv_abs_p95_ms'] or 0:.2f} ms, "
+                f"PDV p99={jit['pdv_p99_ms']:.2f} ms"
+            )
         if duration_s is not None:
             print(f"Duration      : {duration_s:.1f} s")
     else:
         print("No RTT samples parsed from gateway_ping_samples.csv")
 
+    if gaps["loss_bursts"] is not None:
+        print(
+            f"Loss bursts   : {gaps['loss_bursts']} "
+            f"(max {gaps['burst_len_max']}, hist {gaps['burst_len_hist'] or '-'})"
+        )
+        print(
+            f"Outages       : {gaps['outages']} "
+            f"(total {gaps['outage_total_s']:.1f} s, MTBO {gaps['mtbo_s']} s)"
+        )
+
     print(f"\nRun status    : {status}")
 
     # Write single-row metrics CSV for Jupyter later
     metrics_path = results_dir / "metrics_gateway.csv"
     with metrics_path.open("w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(
+        header = (
             [
                 "gateway_ip",
                 "nut_label",
@@ -227,10 +263,12 @@ def main():
                 "rtt_p95_ms",
                 "rtt_p99_ms",
                 "jitter_mean_abs_ms",
-                "run_status",
             ]
+            + [k for k in JITTER_FIELDS if k != "mean_abs_delta_ms"]
+            + GAP_FIELDS
+            + ["run_status"]
         )
-        writer.writerow(
+        row = (
             [
                 gateway_ip,
                 nut_label,
@@ -250,15 +288,40 @@ def main():
                 p95,
                 p99,
                 jitter_mean_abs,
-                status,
             ]
+            + [jit[k] for k in JITTER_FIELDS if k != "mean_abs_delta_ms"]
+            + [gaps[k] for k in GAP_FIELDS]
+            + [status]
         )
+        writer.writerow(header)
+        writer.writerow(row)
+
+    safe_upsert([gateway_record(results_dir.name, dict(zip(header, row)))])
+    safe_ingest_run(results_dir, "gateway")
 
     # Also write a simple run_status.txt for schedulers
     status_path = results_dir / "run_status.txt"
     with status_path.open("w") as f:
         f.write(status + "\n")
 
+    # Precompute the decimated RTT series once for time-series plots
+    if pyramid_is_stale(str(results_dir)):
+        built = build_pyramid(str(results_dir))
+        if built:
+            print(f"RTT pyramid   : {built}")
+
+    record_run(
+        "gateway",
+        status,
+        labels={"gateway": gateway_ip, "nut": nut_label, "location": location_label},
+        values={
+            "rtt_p95_ms": p95,
+            "loss_pct": ping_stats["loss_percent"] if ping_stats else None,
+        },
+        run_id=results_dir.name,
+    )
+    observe_stage("analyze_gateway_ping", time.monotonic() - t_start)
+
 
 if __name__ == "__main__":
     main()
@@ -7,9 +7,35 @@ Expected inputs (produced by run_starlink_*_qoe.sh):
   - ~/analysis/results_apps_video/*/video_timing.csv
   - ~/analysis/results_apps_audio/*/audio_timing.csv
 
+Multi-flow web runs (FLOWS>1, web_multiflow.py) have one row per flow
+with a flow_id column. Rows get an n_flows column; the single-flow CDFs
+and percentiles use n_flows == 1 only, multi-flow runs are summarized
+separately (aggregate goodput, Jain's fairness index).
+
+Segmented video runs (SEGMENTED=1, video_segments.py) add startup delay,
+stall and per-segment delivery columns to video_timing.csv; they are
+summarized per slot/mode/pipeline depth in rq3_video_segments.csv and
+kept out of the CDFs and percentiles (a session's time_total spans every
+segment, about the media duration when the buffer is capped). Only
+*_timing.csv files are loaded, so per-segment logs next to them are not
+mistaken for QoE rows.
+
+Paced audio runs (PACED=1, audio_stream.py) stream at the encoded
+bitrate, so their time_total is the audio duration: they stay out of the
+CDFs and percentiles (like multi-flow runs) and are summarized per
+slot/mode/buffer in rq3_audio_paced.csv (lateness, underruns, required
+jitter-buffer depth).
+
 Outputs:
   - ~/analysis/rq3_all_qoe.csv
+  - ~/analysis/rq3_percentiles.csv   (p50/p90/p95/p99 per breakdown)
+  - ~/analysis/rq3_ecdfs.npz         (serialized ECDFs, see ecdf.py)
+  - ~/analysis/rq3_multiflow.csv     (one row per multi-flow run)
+  - ~/analysis/rq3_video_segments.csv (segmented video, per depth)
+  - ~/analysis/rq3_audio_paced.csv   (paced audio, per buffer size)
   - ~/analysis/rq3_plots/*.png
+  - ~/analysis/results_catalog.sqlite (upserted, see results_catalog.py)
+  - ~/analysis/metrics/starlink_pipeline.prom (stage duration, see metrics_export.py)
 """
 
 import glob
@@ -19,6 +45,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from compact_tables import concat, memory_bytes, parse_timestamps, read_table
+from ecdf import ECDFStore
+from metrics_export import stage_timer
+from multiflow import flow_metrics
+from results_catalog import qoe_record, safe_upsert
+
 BASE_DIR = os.path.expanduser("~/analysis")
 RESULT_DIRS = {
     "web": os.path.join(BASE_DIR, "results_apps_web"),
@@ -27,8 +59,19 @@ RESULT_DIRS = {
 }
 
 OUT_COMBINED_CSV = os.path.join(BASE_DIR, "rq3_all_qoe.csv")
+OUT_PERCENTILES_CSV = os.path.join(BASE_DIR, "rq3_percentiles.csv")
+OUT_ECDFS = os.path.join(BASE_DIR, "rq3_ecdfs.npz")
+OUT_MULTIFLOW_CSV = os.path.join(BASE_DIR, "rq3_multiflow.csv")
+OUT_VIDEO_SEGMENTS_CSV = os.path.join(BASE_DIR, "rq3_video_segments.csv")
+OUT_AUDIO_PACED_CSV = os.path.join(BASE_DIR, "rq3_audio_paced.csv")
 PLOT_DIR = os.path.join(BASE_DIR, "rq3_plots")
 
+ECDF_METRICS = [
+    "time_starttransfer",
+    "time_total",
+    "goodput_mbps",
+]
+
 os.makedirs(PLOT_DIR, exist_ok=True)
 
 
@@ -39,7 +82,7 @@ def load_all_results():
             print(f"[!] Missing results dir for {app_class}: {rdir}")
             continue
 
-        csv_files = glob.glob(os.path.join(rdir, "**", "*.csv"), recursive=True)
+        csv_files = glob.glob(os.path.join(rdir, "**", "*_timing.csv"), recursive=True)
         if not csv_files:
             print(f"[!] No CSVs found in {rdir}")
             continue
@@ -47,10 +90,11 @@ def load_all_results():
         print(f"[*] Loading {len(csv_files)} CSVs from {rdir}")
         for path in csv_files:
             try:
-                df = pd.read_csv(path)
+                df = read_table(path)
                 # Ensure app_class column is set (in case scripts missed it)
                 if "app_class" not in df.columns:
                     df["app_class"] = app_class
+                df["run_dir"] = os.path.basename(os.path.dirname(path))
                 dfs.append(df)
             except Exception as e:
                 print(f"[!] Failed to load {path}: {e}")
@@ -58,7 +102,9 @@ def load_all_results():
     if not dfs:
         raise SystemExit("[!] No RQ3 CSVs found, nothing to analyze.")
 
-    combined = pd.concat(dfs, ignore_index=True)
+    # Categories are unioned across runs, see compact_tables.py
+    combined = concat(dfs)
+    print(f"[*] Loaded {len(combined)} rows ({memory_bytes(combined) / 2**20:.1f} MiB in memory)")
     return combined
 
 
@@ -80,111 +126,220 @@ def add_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
         np.nan,
     )
 
-    # Parse timestamp if present
-    if "timestamp" in df.columns:
-        try:
-            df["timestamp_dt"] = pd.to_datetime(df["timestamp"], format="%Y%m%d-%H%M%S")
-        except Exception:
-            # If format differs somewhere, ignore conversion errors
-            df["timestamp_dt"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    # Concurrent flows per run (multi-flow web runs carry flow_id)
+    if "flow_id" in df.columns:
+        df["n_flows"] = df.groupby("run_dir", observed=True)["flow_id"].transform("count").clip(lower=1)
+    else:
+        df["n_flows"] = 1
+
+    # Parse timestamp if present (read_table already did for CSV inputs;
+    # keep it as the last column of rq3_all_qoe.csv either way)
+    if "timestamp_dt" in df.columns:
+        df["timestamp_dt"] = df.pop("timestamp_dt")
+    elif "timestamp" in df.columns:
+        df["timestamp_dt"] = parse_timestamps(df["timestamp"], ("%Y%m%d-%H%M%S", "%Y-%m-%dT%H:%M:%S"))
 
     return df
 
 
-def plot_cdf(data, label, ax):
-    data = np.asarray(data)
-    data = data[~np.isnan(data)]
-    if data.size == 0:
+def plot_cdf(ecdf, label, ax):
+    if ecdf is None or ecdf.n == 0:
         return
-    data = np.sort(data)
-    y = np.linspace(0, 1, len(data))
-    ax.plot(data, y, label=label)
-
+    x, y = ecdf.step_points()
+    ax.plot(x, y, label=label)
 
-def plot_time_total_by_app_class(df: pd.DataFrame):
-    fig, ax = plt.subplots()
-    for app_class in sorted(df["app_class"].dropna().unique()):
-        sub = df[df["app_class"] == app_class]
-        plot_cdf(sub["time_total"], label=app_class, ax=ax)
 
-    ax.set_xlabel("Total transfer time (s)")
+def _save_cdf_fig(fig, ax, xlabel, title, name):
+    ax.set_xlabel(xlabel)
     ax.set_ylabel("CDF")
-    ax.set_title("RQ3: CDF of total transfer time by application class")
+    ax.set_title(title)
     ax.grid(True)
     ax.legend()
-    out_path = os.path.join(PLOT_DIR, "rq3_cdf_time_total_by_app_class.png")
+    out_path = os.path.join(PLOT_DIR, name)
     fig.tight_layout()
     fig.savefig(out_path)
     plt.close(fig)
     print(f"[*] Saved {out_path}")
 
 
-def plot_goodput_by_app_class(df: pd.DataFrame):
+def plot_time_total_by_app_class(store: ECDFStore):
     fig, ax = plt.subplots()
-    for app_class in sorted(df["app_class"].dropna().unique()):
-        sub = df[df["app_class"] == app_class]
-        plot_cdf(sub["goodput_mbps"], label=app_class, ax=ax)
+    for (app_class,), e in sorted(store.by("time_total", ["app_class"]).items()):
+        plot_cdf(e, label=app_class, ax=ax)
+
+    _save_cdf_fig(
+        fig,
+        ax,
+        "Total transfer time (s)",
+        "RQ3: CDF of total transfer time by application class",
+        "rq3_cdf_time_total_by_app_class.png",
+    )
 
-    ax.set_xlabel("Goodput (Mbps)")
-    ax.set_ylabel("CDF")
-    ax.set_title("RQ3: CDF of HTTP goodput by application class")
-    ax.grid(True)
-    ax.legend()
-    out_path = os.path.join(PLOT_DIR, "rq3_cdf_goodput_by_app_class.png")
-    fig.tight_layout()
-    fig.savefig(out_path)
-    plt.close(fig)
-    print(f"[*] Saved {out_path}")
+
+def plot_goodput_by_app_class(store: ECDFStore):
+    fig, ax = plt.subplots()
+    for (app_class,), e in sorted(store.by("goodput_mbps", ["app_class"]).items()):
+        plot_cdf(e, label=app_class, ax=ax)
+
+    _save_cdf_fig(
+        fig,
+        ax,
+        "Goodput (Mbps)",
+        "RQ3: CDF of HTTP goodput by application class",
+        "rq3_cdf_goodput_by_app_class.png",
+    )
 
 
-def plot_video_synthetic_vs_real(df: pd.DataFrame):
-    sub = df[df["app_class"] == "video"]
-    if sub.empty:
+def plot_video_synthetic_vs_real(store: ECDFStore):
+    ecdfs = store.by("goodput_mbps", ["app_class", "app_kind"])
+    if not any(k[0] == "video" for k in ecdfs):
         print("[!] No video rows, skipping video-specific plots.")
         return
 
     fig, ax = plt.subplots()
     for kind in ["synthetic", "real"]:
-        subk = sub[sub["app_kind"] == kind]
-        if subk.empty:
-            continue
-        plot_cdf(subk["goodput_mbps"], label=f"video-{kind}", ax=ax)
-
-    ax.set_xlabel("Goodput (Mbps)")
-    ax.set_ylabel("CDF")
-    ax.set_title("RQ3: Video goodput, synthetic vs real")
-    ax.grid(True)
-    ax.legend()
-    out_path = os.path.join(PLOT_DIR, "rq3_cdf_video_goodput_synthetic_vs_real.png")
-    fig.tight_layout()
-    fig.savefig(out_path)
-    plt.close(fig)
-    print(f"[*] Saved {out_path}")
+        plot_cdf(ecdfs.get(("video", kind)), label=f"video-{kind}", ax=ax)
+
+    _save_cdf_fig(
+        fig,
+        ax,
+        "Goodput (Mbps)",
+        "RQ3: Video goodput, synthetic vs real",
+        "rq3_cdf_video_goodput_synthetic_vs_real.png",
+    )
 
 
-def plot_audio_time(df: pd.DataFrame):
-    sub = df[df["app_class"] == "audio"]
-    if sub.empty:
+def plot_audio_time(store: ECDFStore):
+    ecdfs = store.by("time_total", ["app_class", "app_kind"])
+    if not any(k[0] == "audio" for k in ecdfs):
         print("[!] No audio rows, skipping audio-specific plots.")
         return
 
     fig, ax = plt.subplots()
     for kind in ["synthetic", "real"]:
-        subk = sub[sub["app_kind"] == kind]
-        if subk.empty:
-            continue
-        plot_cdf(subk["time_total"], label=f"audio-{kind}", ax=ax)
+        plot_cdf(ecdfs.get(("audio", kind)), label=f"audio-{kind}", ax=ax)
+
+    _save_cdf_fig(
+        fig,
+        ax,
+        "Total transfer time (s)",
+        "RQ3: Audio transfer time, synthetic vs real",
+        "rq3_cdf_audio_time_synthetic_vs_real.png",
+    )
 
-    ax.set_xlabel("Total transfer time (s)")
-    ax.set_ylabel("CDF")
-    ax.set_title("RQ3: Audio transfer time, synthetic vs real")
-    ax.grid(True)
-    ax.legend()
-    out_path = os.path.join(PLOT_DIR, "rq3_cdf_audio_time_synthetic_vs_real.png")
-    fig.tight_layout()
-    fig.savefig(out_path)
-    plt.close(fig)
-    print(f"[*] Saved {out_path}")
+
+def write_multiflow_summary(df: pd.DataFrame):
+    """
+    One row per multi-flow run: flows start together, so aggregate
+    goodput is total bytes over the slowest flow's time_total. Only
+    completed flows count, as in web_multiflow.py (see multiflow.py).
+    """
+    multi = df[df["n_flows"] > 1]
+    if multi.empty:
+        return
+    keys = [c for c in ("run_dir", "slot", "tech", "plan", "mode", "app_kind") if c in multi.columns]
+    rows = []
+    for gk, g in multi.groupby(keys, dropna=False, observed=True):
+        row = dict(zip(keys, gk))
+        errors = g["error"] if "error" in g.columns else [None] * len(g)
+        m = flow_metrics(g["size_download"], g["time_total"], errors)
+        goodputs = pd.Series(m["goodputs_mbps"], dtype="float64")
+        row["n_flows"] = len(g)
+        row["ok_flows"] = m["ok_flows"]
+        row["aggregate_mbps"] = m["aggregate_mbps"]
+        row["jain_index"] = m["jain_index"]
+        row["flow_goodput_min_mbps"] = goodputs.min()
+        row["flow_goodput_median_mbps"] = goodputs.median()
+        row["flow_goodput_max_mbps"] = goodputs.max()
+        rows.append(row)
+
+    out = pd.DataFrame(rows)
+    out.to_csv(OUT_MULTIFLOW_CSV, index=False)
+    print(f"[*] Wrote multi-flow summary: {OUT_MULTIFLOW_CSV}")
+
+    by = [c for c in ("mode", "n_flows") if c in out.columns]
+    print("\n=== Multi-flow web runs ===")
+    print(out.groupby(by, observed=True)[["aggregate_mbps", "jain_index"]].mean().round(3).to_string())
+
+
+def write_video_segment_summary(df: pd.DataFrame):
+    """
+    Segmented video runs (pipeline_depth column) averaged per
+    slot/mode/depth: startup delay, stalls, per-segment delivery.
+    """
+    seg = df[is_segmented(df)]
+    if seg.empty:
+        return
+    keys = [c for c in ("slot", "tech", "mode", "app_kind", "pipeline_depth") if c in seg.columns]
+    metrics = [
+        "startup_delay_s",
+        "stall_count",
+        "stall_total_s",
+        "seg_ttfb_p50_s",
+        "seg_ttfb_p95_s",
+        "seg_time_p95_s",
+        "seg_goodput_p05_mbps",
+    ]
+    g = seg.groupby(keys, dropna=False, observed=True)
+    out = g[metrics].mean()
+    out.insert(0, "runs", g.size())
+    out["stall_run_frac"] = g["stall_count"].apply(lambda s: float((s > 0).mean()))
+    out = out.reset_index()
+    out.to_csv(OUT_VIDEO_SEGMENTS_CSV, index=False)
+    print(f"[*] Wrote segmented video summary: {OUT_VIDEO_SEGMENTS_CSV}")
+
+    print("\n=== Segmented video runs ===")
+    by = [c for c in ("mode", "pipeline_depth") if c in out.columns]
+    print(seg.groupby(by, observed=True)[["startup_delay_s", "stall_total_s"]].mean().round(3).to_string())
+
+
+def is_segmented(df: pd.DataFrame) -> pd.Series:
+    if "pipeline_depth" not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df["pipeline_depth"].notna()
+
+
+def is_paced(df: pd.DataFrame) -> pd.Series:
+    if "chunk_ms" not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df["chunk_ms"].notna()
+
+
+def write_audio_paced_summary(df: pd.DataFrame):
+    """
+    Paced audio streams averaged per slot/mode/buffer: lateness,
+    underruns and the jitter buffer each stream would have needed.
+    """
+    paced = df[is_paced(df)]
+    if paced.empty:
+        return
+    keys = [c for c in ("slot", "tech", "mode", "app_kind", "buffer_ms") if c in paced.columns]
+    g = paced.groupby(keys, dropna=False, observed=True)
+    out = g[["late_p95_ms", "late_p99_ms", "underruns", "underrun_total_s"]].mean()
+    out.insert(0, "streams", g.size())
+    out["underrun_stream_frac"] = g["underruns"].apply(lambda s: float((s > 0).mean()))
+    out["required_buffer_p50_ms"] = g["required_buffer_ms"].median()
+    out["required_buffer_p95_ms"] = g["required_buffer_ms"].quantile(0.95)
+    out = out.reset_index()
+    out.to_csv(OUT_AUDIO_PACED_CSV, index=False)
+    print(f"[*] Wrote paced audio summary: {OUT_AUDIO_PACED_CSV}")
+
+    print("\n=== Paced audio streams ===")
+    by = [c for c in ("mode", "buffer_ms") if c in out.columns]
+    print(out.groupby(by, observed=True)[["underrun_stream_frac", "required_buffer_p95_ms"]].mean().round(3).to_string())
+
+
+def write_percentile_tables(store: ECDFStore):
+    tables = [
+        store.percentile_table(keys)
+        for keys in (["app_class"], ["app_class", "app_kind"], ["app_class", "slot"], ["app_class", "mode"])
+        if all(k in store.keys for k in keys)
+    ]
+    if not tables:
+        return
+    out = pd.concat(tables, ignore_index=True)
+    out.to_csv(OUT_PERCENTILES_CSV, index=False)
+    print(f"[*] Wrote percentile table: {OUT_PERCENTILES_CSV}")
 
 
 def main():
@@ -196,12 +351,28 @@ def main():
     print(f"[*] Wrote combined CSV: {OUT_COMBINED_CSV}")
     print(f"    Rows: {len(df)}")
 
+    n = safe_upsert(qoe_record(r) for r in df.to_dict("records"))
+    print(f"[*] Upserted {n} QoE rows into results catalog")
+
+    # One grouped sort per metric; every CDF/percentile below reuses it.
+    # Concurrent flows share capacity, and segmented sessions and paced
+    # streams last about as long as the media, so keep them out of these CDFs.
+    single = (df["n_flows"] == 1) & ~is_segmented(df) & ~is_paced(df)
+    store = ECDFStore(df[single], metrics=ECDF_METRICS)
+    store.save(OUT_ECDFS)
+    print(f"[*] Wrote ECDFs: {OUT_ECDFS}")
+
     # Basic CDFs
-    plot_time_total_by_app_class(df)
-    plot_goodput_by_app_class(df)
-    plot_video_synthetic_vs_real(df)
-    plot_audio_time(df)
+    plot_time_total_by_app_class(store)
+    plot_goodput_by_app_class(store)
+    plot_video_synthetic_vs_real(store)
+    plot_audio_time(store)
+    write_percentile_tables(store)
+    write_multiflow_summary(df)
+    write_video_segment_summary(df)
+    write_audio_paced_summary(df)
 
 
 if __name__ == "__main__":
-    main()
+    with stage_timer("analyze_rq3_qoe"):
+        main()
@@ -3,23 +3,33 @@
 Analyze one Starlink scenario run directory.
 
 Inputs (in RUN_DIR):
-  - meta.txt
+  - run_metadata.txt   (written by run_starlink_scenario.sh; older runs: meta.txt)
   - iperf3_raw.json
   - ping_gw_raw.log
 
 Outputs:
   - gw_ping_samples.csv   (seq,rtt_ms for each gateway ping reply)
-  - metrics_run.csv       (one-line CSV with metadata + metrics)
+  - metrics_run.csv       (one-line CSV with metadata + metrics,
+                           including gw_* loss-burst/outage columns)
+  - ~/analysis/results_catalog.sqlite (upserted, see results_catalog.py)
+  - ~/analysis/rtt_store/ (gateway RTT samples appended, see rtt_store.py)
+  - ~/analysis/metrics/starlink_pipeline.prom (see metrics_export.py)
 """
 
 import json
 import math
 import os
-import re
 import statistics
 import sys
+import time
 from datetime import datetime
 
+from jitter import JITTER_FIELDS, empty_jitter_metrics, iperf_rtt_samples, jitter_metrics
+from metrics_export import ACTIVE_LABELS, observe_stage, record_run
+from ping_gaps import GAP_FIELDS, analyze_gaps, estimate_interval, parse_ping_log
+from results_catalog import active_record, safe_upsert
+from rtt_store import safe_ingest_run
+
 
 def read_meta(meta_path):
     meta = {}
@@ -42,7 +52,10 @@ def parse_iperf3(json_path, proto):
       iperf_avg_throughput_Mbps,
       iperf_retrans_total,
       iperf_udp_jitter_ms,
-      iperf_udp_loss_pct
+      iperf_udp_loss_pct,
+      iperf_seconds (test length; shorter than planned after a live early stop),
+      iperf_stop_reason ("converged"/"link_down" from client/iperf_live.py, else ""),
+      iperf_<JITTER_FIELDS> (TCP: from the per-interval sender RTT)
     Missing/non-applicable values are None.
     """
     res = {
@@ -51,7 +64,11 @@ def parse_iperf3(json_path, proto):
         "iperf_retrans_total": None,
         "iperf_udp_jitter_ms": None,
         "iperf_udp_loss_pct": None,
+        "iperf_seconds": None,
+        "iperf_stop_reason": "",
     }
+    for k, v in empty_jitter_metrics().items():
+        res["iperf_" + k] = v
 
     if not os.path.isfile(json_path):
         return res
@@ -68,12 +85,14 @@ def parse_iperf3(json_path, proto):
 
     end = data.get("end", {})
     res["iperf_success"] = 1
+    res["iperf_stop_reason"] = data.get("early_stop", {}).get("reason", "")
 
     if proto == "tcp":
         # Typical: end["sum_sent"]["bits_per_second"]
         sum_sent = end.get("sum_sent")
         if sum_sent and "bits_per_second" in sum_sent:
             res["iperf_avg_throughput_Mbps"] = sum_sent["bits_per_second"] / 1e6
+            res["iperf_seconds"] = sum_sent.get("seconds")
             if "retransmits" in sum_sent:
                 res["iperf_retrans_total"] = sum_sent["retransmits"]
         else:
@@ -81,8 +100,11 @@ def parse_iperf3(json_path, proto):
             sum_recv = end.get("sum_received")
             if sum_recv and "bits_per_second" in sum_recv:
                 res["iperf_avg_throughput_Mbps"] = sum_recv["bits_per_second"] / 1e6
+                res["iperf_seconds"] = sum_recv.get("seconds")
                 if "retransmits" in sum_recv:
                     res["iperf_retrans_total"] = sum_recv["retransmits"]
+        for k, v in jitter_metrics(iperf_rtt_samples(data)).items():
+            res["iperf_" + k] = v
 
     else:  # udp
         # Typical: end["sum"]["bits_per_second"], ["jitter_ms"], ["lost_percent"]
@@ -90,6 +112,7 @@ def parse_iperf3(json_path, proto):
         if s:
             if "bits_per_second" in s:
                 res["iperf_avg_throughput_Mbps"] = s["bits_per_second"] / 1e6
+            res["iperf_seconds"] = s.get("seconds")
             if "jitter_ms" in s:
                 res["iperf_udp_jitter_ms"] = s["jitter_ms"]
             if "lost_percent" in s:
@@ -120,40 +143,42 @@ def percentile(data, p):
     return d0 + d1
 
 
+def _empty_gw_metrics():
+    res = {
+        "gw_ping_tx": None,
+        "gw_ping_rx": None,
+        "gw_ping_loss_pct": None,
+        "gw_rtt_min_ms": None,
+        "gw_rtt_avg_ms": None,
+        "gw_rtt_max_ms": None,
+        "gw_rtt_p50_ms": None,
+        "gw_rtt_p90_ms": None,
+        "gw_rtt_p95_ms": None,
+        "gw_rtt_p99_ms": None,
+        "gw_jitter_mean_abs_dRTT_ms": None,
+    }
+    for k in GAP_FIELDS:
+        res["gw_" + k] = None
+    for k in JITTER_FIELDS:
+        res["gw_" + k] = None
+    return res
+
+
 def parse_ping_gateway(ping_path, samples_out_path):
     """
     Parse ping_gw_raw.log and write gw_ping_samples.csv (seq,rtt_ms).
-    Returns dict with RTT stats and loss estimate.
-    """
-    rtts = []
-    seqs = []
+    Returns dict with RTT stats, loss and loss-burst/outage structure.
 
+    tx/rx come from the reconstructed icmp_seq timeline (see ping_gaps.py),
+    so leading/trailing loss, DUP! replies and "no answer" lines are
+    accounted for.
+    """
     if not os.path.isfile(ping_path):
-        return {
-            "gw_ping_tx": None,
-            "gw_ping_rx": None,
-            "gw_ping_loss_pct": None,
-            "gw_rtt_min_ms": None,
-            "gw_rtt_avg_ms": None,
-            "gw_rtt_max_ms": None,
-            "gw_rtt_p50_ms": None,
-            "gw_rtt_p90_ms": None,
-            "gw_rtt_p95_ms": None,
-            "gw_rtt_p99_ms": None,
-            "gw_jitter_mean_abs_dRTT_ms": None,
-        }
-
-    line_re = re.compile(r"icmp_seq=(\d+).*time=([\d\.]+)\s*ms")
+        return _empty_gw_metrics()
 
-    with open(ping_path, "r") as f:
-        for line in f:
-            m = line_re.search(line)
-            if not m:
-                continue
-            seq = int(m.group(1))
-            rtt = float(m.group(2))
-            seqs.append(seq)
-            rtts.append(rtt)
+    parsed = parse_ping_log(ping_path)
+    seqs = parsed["seq"].tolist()
+    rtts = parsed["rtt_ms"].tolist()
 
     # Write samples CSV
     if rtts:
@@ -162,24 +187,24 @@ def parse_ping_gateway(ping_path, samples_out_path):
             for s, r in zip(seqs, rtts):
                 out.write(f"{s},{r:.3f}\n")
 
+    tx, rx, gaps = analyze_gaps(
+        parsed["seq"],
+        lost_seqs=parsed["lost_seq"],
+        tx_hint=parsed["tx_summary"],
+        dup=parsed["dup"],
+        interval_s=estimate_interval(parsed["seq"], parsed["ts"]),
+    )
+
+    res = _empty_gw_metrics()
+    for k in GAP_FIELDS:
+        res["gw_" + k] = gaps[k]
+
     if not rtts:
-        return {
-            "gw_ping_tx": 0,
-            "gw_ping_rx": 0,
-            "gw_ping_loss_pct": 100.0,
-            "gw_rtt_min_ms": None,
-            "gw_rtt_avg_ms": None,
-            "gw_rtt_max_ms": None,
-            "gw_rtt_p50_ms": None,
-            "gw_rtt_p90_ms": None,
-            "gw_rtt_p95_ms": None,
-            "gw_rtt_p99_ms": None,
-            "gw_jitter_mean_abs_dRTT_ms": None,
-        }
+        res["gw_ping_tx"] = tx
+        res["gw_ping_rx"] = 0
+        res["gw_ping_loss_pct"] = 100.0
+        return res
 
-    # Estimate transmitted pings by max icmp_seq
-    tx = max(seqs)
-    rx = len(rtts)
     loss_pct = 0.0
     if tx > 0:
         loss_pct = (tx - rx) * 100.0 / tx
@@ -193,29 +218,32 @@ def parse_ping_gateway(ping_path, samples_out_path):
     p95 = percentile(rtts, 95)
     p99 = percentile(rtts, 99)
 
-    # Mean abs delta RTT
-    if len(rtts) >= 2:
-        diffs = [abs(rtts[i] - rtts[i - 1]) for i in range(1, len(rtts))]
-        jitter_mean = statistics.mean(diffs)
-    else:
-        jitter_mean = 0.0
-
-    return {
-        "gw_ping_tx": tx,
-        "gw_ping_rx": rx,
-        "gw_ping_loss_pct": loss_pct,
-        "gw_rtt_min_ms": rtt_min,
-        "gw_rtt_avg_ms": rtt_avg,
-        "gw_rtt_max_ms": rtt_max,
-        "gw_rtt_p50_ms": p50,
-        "gw_rtt_p90_ms": p90,
-        "gw_rtt_p95_ms": p95,
-        "gw_rtt_p99_ms": p99,
-        "gw_jitter_mean_abs_dRTT_ms": jitter_mean,
-    }
+    # RFC 3550 jitter, IPDV/PDV and mean abs delta RTT (see jitter.py)
+    jit = jitter_metrics(parsed["rtt_ms"], seq=parsed["seq"])
+    for k in JITTER_FIELDS:
+        res["gw_" + k] = jit[k]
+    jitter_mean = jit["mean_abs_delta_ms"] if jit["mean_abs_delta_ms"] is not None else 0.0
+
+    res.update(
+        {
+            "gw_ping_tx": tx,
+            "gw_ping_rx": rx,
+            "gw_ping_loss_pct": loss_pct,
+            "gw_rtt_min_ms": rtt_min,
+            "gw_rtt_avg_ms": rtt_avg,
+            "gw_rtt_max_ms": rtt_max,
+            "gw_rtt_p50_ms": p50,
+            "gw_rtt_p90_ms": p90,
+            "gw_rtt_p95_ms": p95,
+            "gw_rtt_p99_ms": p99,
+            "gw_jitter_mean_abs_dRTT_ms": jitter_mean,
+        }
+    )
+    return res
 
 
 def main():
+    t_start = time.monotonic()
     if len(sys.argv) != 2:
         print(f"Usage: {sys.argv[0]} <run_dir>", file=sys.stderr)
         sys.exit(1)
@@ -225,7 +253,9 @@ def main():
         print(f"[!] {run_dir} is not a directory", file=sys.stderr)
         sys.exit(1)
 
-    meta = read_meta(os.path.join(run_dir, "meta.txt"))
+    meta = read_meta(os.path.join(run_dir, "run_metadata.txt")) or read_meta(
+        os.path.join(run_dir, "meta.txt")
+    )
     proto = meta.get("proto", "tcp")
     tos_str = meta.get("tos", "0")
     try:
@@ -267,6 +297,8 @@ def main():
         "iperf_retrans_total": iperf_res["iperf_retrans_total"],
         "iperf_udp_jitter_ms": iperf_res["iperf_udp_jitter_ms"],
         "iperf_udp_loss_pct": iperf_res["iperf_udp_loss_pct"],
+        "iperf_seconds": iperf_res["iperf_seconds"],
+        "iperf_stop_reason": iperf_res["iperf_stop_reason"],
         "gw_ping_tx": gw_res["gw_ping_tx"],
         "gw_ping_rx": gw_res["gw_ping_rx"],
         "gw_ping_loss_pct": gw_res["gw_ping_loss_pct"],
@@ -279,6 +311,11 @@ def main():
         "gw_rtt_p99_ms": gw_res["gw_rtt_p99_ms"],
         "gw_jitter_mean_abs_dRTT_ms": gw_res["gw_jitter_mean_abs_dRTT_ms"],
     }
+    for k in GAP_FIELDS:
+        fields["gw_" + k] = gw_res["gw_" + k]
+    for k in JITTER_FIELDS:
+        fields["gw_" + k] = gw_res["gw_" + k]
+        fields["iperf_" + k] = iperf_res["iperf_" + k]
 
     # Write metrics_run.csv (overwrite each time)
     out_path = os.path.join(run_dir, "metrics_run.csv")
@@ -293,6 +330,24 @@ def main():
 
     print(f"[*] Wrote metrics_run.csv in {run_dir}")
 
+    record = active_record(fields)
+    if safe_upsert([record]):
+        print("[*] Updated results catalog")
+    safe_ingest_run(run_dir, "active")
+
+    record_run(
+        "active",
+        record["run_status"],
+        labels={k: fields.get(k) for k in ACTIVE_LABELS},
+        values={
+            "throughput_mbps": record["throughput_mbps"],
+            "rtt_p95_ms": record["rtt_p95_ms"],
+            "loss_pct": record["loss_pct"],
+        },
+        run_id=record["run_id"],
+    )
+    observe_stage("analyze_starlink_run", time.monotonic() - t_start)
+
 
 if __name__ == "__main__":
     main()
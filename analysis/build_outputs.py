@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Dependency-tracked build of the analysis outputs.
+
+Replaces running the analysis chain by hand. The DAG is:
+
+  run:<dir>        results_starlink/<dir>/metrics_run.csv   (analyze_starlink_run.py)
+  summary          all_starlink_runs.csv                     (summarize_starlink_metrics.py)
+  change_points    change_points.csv                         (change_points.py)
+  fig:<name>       figures/<name>                            (analysis_notebook_rq1_rq2_rq4.py)
+  rq3              rq3_all_qoe.csv, rq3_plots/, ...          (analyze_rq3_qoe.py)
+
+Each target has a fingerprint: SHA-256 over its code files, its input
+files, the fingerprints of its dependencies and, for figures, a hash of
+the exact DataFrame slice the figure reads (see FIGURES in the
+notebook). A target is rebuilt only when its fingerprint changed or an
+output is missing, so a new run redraws only the figures whose slice it
+touches. Fingerprints are evaluated lazily, once the dependencies are
+up to date, and ready targets run in parallel (-j).
+
+Provenance for every output (fingerprint, input/code hashes, git
+revision, build time and duration) is kept in ~/analysis/build_manifest.json,
+which also caches file hashes by (size, mtime) so unchanged inputs are not
+re-read.
+
+Usage:
+  python3 build_outputs.py [-j N] [-n] [--force] [target-prefix ...]
+    e.g. build_outputs.py fig:     (all figures and what they depend on)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path.home() / "analysis"
+CODE_DIR = Path(__file__).resolve().parent
+MANIFEST = BASE_DIR / "build_manifest.json"
+
+RESULTS_STARLINK = BASE_DIR / "results_starlink"
+QOE_DIRS = [BASE_DIR / f"results_apps_{a}" for a in ("web", "video", "audio")]
+
+HASH_CHUNK = 1 << 20
+
+
+class FileHasher:
+    """
+    SHA-256 of files, cached by (size, mtime_ns) across builds.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+
+    def __call__(self, path):
+        path = Path(path)
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        key = str(path)
+        hit = self.cache.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+
+class Target:
+    """
+    One buildable node. `inputs` may be a callable so that file lists of
+    upstream outputs are resolved after the upstream targets ran.
+    `extra_key` returns an additional fingerprint component (data slice).
+    """
+
+    def __init__(
+        self, name, outputs, cmd, code=(), inputs=(), deps=(), extra_key=None, needs_inputs=False
+    ):
+        self.name = name
+        self.outputs = [Path(p) for p in outputs]
+        self.cmd = cmd
+        self.code = [CODE_DIR / c for c in code]
+        self.inputs = inputs
+        self.deps = list(deps)
+        self.extra_key = extra_key
+        self.needs_inputs = needs_inputs
+
+    def input_files(self):
+        files = self.inputs() if callable(self.inputs) else self.inputs
+        return sorted(Path(p) for p in files)
+
+
+def _code_rev():
+    try:
+        out = subprocess.run(
+            ["git", "-C", str(CODE_DIR), "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _py(script, *args):
+    return [sys.executable, str(CODE_DIR / script), *map(str, args)]
+
+
+# ----------------------------------------------------------------------
+# DAG definition
+# ----------------------------------------------------------------------
+
+RUN_CODE = [
+    "analyze_starlink_run.py",
+    "ping_gaps.py",
+    "jitter.py",
+    "results_catalog.py",
+    "metrics_export.py",
+    "rtt_store.py",
+    "rtt_pyramid.py",
+]
+SUMMARY_CODE = ["summarize_starlink_metrics.py", "metrics_union.py", "metrics_export.py"]
+NOTEBOOK = "analysis_notebook_rq1_rq2_rq4.py"
+RQ3_CODE = [
+    "analyze_rq3_qoe.py",
+    "ecdf.py",
+    "compact_tables.py",
+    "results_catalog.py",
+    "metrics_export.py",
+    "multiflow.py",
+]
+
+
+class SummarySlices:
+    """
+    Loads all_starlink_runs.csv once per build and hashes the slice each
+    figure reads.
+    """
+
+    def __init__(self):
+        self._df = None
+        self._mtime = None
+
+    def key(self, fig_name):
+        import pandas as pd
+
+        import analysis_notebook_rq1_rq2_rq4 as nb
+
+        path = nb.SUMMARY_CSV
+        if not path.exists():
+            return "missing"
+        mtime = path.stat().st_mtime_ns
+        if self._df is None or self._mtime != mtime:
+            self._df = nb.load_summary(path)
+            self._mtime = mtime
+        s = nb.FIGURES[fig_name][0](self._df)
+        if s is None:
+            return "empty"
+        h = hashlib.sha256(json.dumps([str(c) for c in s.columns]).encode())
+        h.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+        return h.hexdigest()
+
+
+def build_dag():
+    targets = {}
+
+    run_names = []
+    if RESULTS_STARLINK.is_dir():
+        for run_dir in sorted(RESULTS_STARLINK.iterdir()):
+            # run_metadata.txt from run_starlink_scenario.sh; meta.txt on older runs
+            inputs = [
+                p
+                for p in (
+                    run_dir / "run_metadata.txt",
+                    run_dir / "meta.txt",
+                    run_dir / "iperf3_raw.json",
+                    run_dir / "ping_gw_raw.log",
+                )
+                if p.exists()
+            ]
+            if not any(p.name in ("run_metadata.txt", "meta.txt", "iperf3_raw.json") for p in inputs):
+                continue
+            name = f"run:{run_dir.name}"
+            targets[name] = Target(
+                name,
+                outputs=[run_dir / "metrics_run.csv"],
+                cmd=_py("analyze_starlink_run.py", run_dir),
+                code=RUN_CODE,
+                inputs=inputs,
+            )
+            run_names.append(name)
+
+    def summary_inputs():
+        if not RESULTS_STARLINK.is_dir():
+            return []
+        return list(RESULTS_STARLINK.glob("*/metrics_run.csv"))
+
+    targets["summary"] = Target(
+        "summary",
+        outputs=[BASE_DIR / "all_starlink_runs.csv", BASE_DIR / "all_starlink_runs_coverage.csv"],
+        cmd=_py("summarize_starlink_metrics.py"),
+        code=SUMMARY_CODE,
+        inputs=summary_inputs,
+        deps=run_names,
+        needs_inputs=True,
+    )
+
+    targets["change_points"] = Target(
+        "change_points",
+        outputs=[BASE_DIR / "change_points.csv"],
+        cmd=_py("change_points.py"),
+        code=["change_points.py", "compact_tables.py", "results_catalog.py"],
+        inputs=lambda: [BASE_DIR / "all_starlink_runs.csv"],
+        deps=["summary"],
+    )
+
+    sys.path.insert(0, str(CODE_DIR))
+    import analysis_notebook_rq1_rq2_rq4 as nb
+
+    slices = SummarySlices()
+    for fig in nb.FIGURES:
+        name = f"fig:{fig}"
+        targets[name] = Target(
+            name,
+            outputs=[nb.FIG_DIR / fig],
+            cmd=_py(NOTEBOOK, "--figure", fig),
+            code=[NOTEBOOK, "compact_tables.py"],
+            deps=["summary"],
+            # The slice hash replaces the summary fingerprint, so a new
+            # UDP run does not redraw TCP figures
+            extra_key=lambda fig=fig: slices.key(fig),
+        )
+
+    def rq3_inputs():
+        files = []
+        for d in QOE_DIRS:
+            if d.is_dir():
+                files.extend(d.glob("*/*_timing.csv"))
+        return files
+
+    targets["rq3"] = Target(
+        "rq3",
+        outputs=[BASE_DIR / "rq3_all_qoe.csv", BASE_DIR / "rq3_percentiles.csv"],
+        cmd=_py("analyze_rq3_qoe.py"),
+        code=RQ3_CODE,
+        inputs=rq3_inputs,
+        needs_inputs=True,
+    )
+    return targets
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
+
+
+def load_manifest(path=MANIFEST):
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {"targets": {}, "file_hashes": {}}
+
+
+def save_manifest(manifest, path=MANIFEST):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def select(targets, prefixes):
+    """
+    Targets matching any prefix plus everything they depend on.
+    """
+    if not prefixes:
+        return set(targets)
+    todo = [n for n in targets if any(n.startswith(p) for p in prefixes)]
+    chosen = set()
+    while todo:
+        n = todo.pop()
+        if n in chosen:
+            continue
+        chosen.add(n)
+        todo.extend(targets[n].deps)
+    return chosen
+
+
+def fingerprint(t, hasher, dep_fps):
+    code = {str(p.name): hasher(p) for p in t.code}
+    inputs = {str(p): hasher(p) for p in t.input_files()}
+    # With an extra_key the dependencies only order the build: the key
+    # already covers the part of their outputs this target reads
+    deps = [dep_fps[d] for d in t.deps] if t.extra_key is None else []
+    h = hashlib.sha256()
+    h.update(json.dumps([code, inputs, deps], sort_keys=True).encode())
+    if t.extra_key is not None:
+        h.update(t.extra_key().encode())
+    return h.hexdigest(), code, inputs
+
+
+def build(targets, names, jobs=None, force=False, dry_run=False, manifest_path=MANIFEST):
+    manifest = load_manifest(manifest_path)
+    hasher = FileHasher(manifest.get("file_hashes"))
+    records = manifest.setdefault("targets", {})
+    rev = _code_rev()
+
+    pending = {n: set(d for d in targets[n].deps if d in names) for n in names}
+    dep_fps = {}
+    status = {}
+    running = {}
+    counts = {"built": 0, "fresh": 0, "failed": 0, "skipped": 0}
+
+    def finish(name, fp, state):
+        dep_fps[name] = fp
+        status[name] = state
+        counts[state] += 1
+        for other, deps in pending.items():
+            deps.discard(name)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while len(status) < len(names):
+            ready = [n for n, deps in pending.items() if not deps and n not in status and n not in running]
+            for name in sorted(ready):
+                t = targets[name]
+                if any(status.get(d) in ("failed", "skipped") for d in t.deps if d in names):
+                    print(f"[!] {name}: skipped (dependency not built)")
+                    finish(name, None, "skipped")
+                    continue
+                if t.needs_inputs and not t.input_files():
+                    print(f"[*] {name}: no inputs, skipped")
+                    finish(name, None, "skipped")
+                    continue
+                fp, code, inputs = fingerprint(t, hasher, dep_fps)
+                rec = records.get(name, {})
+                # A target may legitimately produce nothing (e.g. a figure
+                # whose slice is empty); only the recorded outputs must exist
+                outputs_ok = "outputs" in rec and all(Path(p).exists() for p in rec["outputs"])
+                if not force and rec.get("fingerprint") == fp and outputs_ok:
+                    finish(name, fp, "fresh")
+                    continue
+                if dry_run:
+                    print(f"[*] would build {name}")
+                    finish(name, fp, "built")
+                    continue
+                print(f"[*] building {name}")
+                running[name] = (pool.submit(_run, t.cmd), fp, code, inputs, time.monotonic())
+
+            if not running:
+                continue
+            done, _ = wait([r[0] for r in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, r in running.items() if r[0] in done]:
+                fut, fp, code, inputs, t0 = running.pop(name)
+                rc, tail = fut.result()
+                t = targets[name]
+                if rc != 0:
+                    print(f"[!] {name} failed (exit {rc})\n{tail}")
+                    records.pop(name, None)
+                    finish(name, None, "failed")
+                    continue
+                records[name] = {
+                    "fingerprint": fp,
+                    "code": code,
+                    "inputs": inputs,
+                    "deps": {d: dep_fps.get(d) for d in t.deps},
+                    "outputs": {str(p): hasher(p) for p in t.outputs if p.exists()},
+                    "code_rev": rev,
+                    "built_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "duration_s": round(time.monotonic() - t0, 3),
+                }
+                finish(name, fp, "built")
+
+    if not dry_run:
+        # Drop targets that no longer exist (e.g. deleted runs)
+        for name in [n for n in records if n not in targets]:
+            del records[name]
+        manifest["file_hashes"] = hasher.cache
+        save_manifest(manifest, manifest_path)
+    return counts
+
+
+def _run(cmd):
+    p = subprocess.run(cmd, cwd=str(CODE_DIR), capture_output=True, text=True)
+    tail = "\n".join((p.stdout + p.stderr).splitlines()[-15:])
+    return p.returncode, tail
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rebuild stale analysis outputs")
+    ap.add_argument("targets", nargs="*", help="target name prefixes (default: all)")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="parallel targets (default: CPUs)")
+    ap.add_argument("-n", "--dry-run", action="store_true", help="only list stale targets")
+    ap.add_argument("--force", action="store_true", help="rebuild even if fresh")
+    ap.add_argument("--list", action="store_true", help="list targets and exit")
+    args = ap.parse_args()
+
+    targets = build_dag()
+    if args.list:
+        for name, t in targets.items():
+            print(f"{name}  ->  {', '.join(str(p) for p in t.outputs)}")
+        return
+
+    names = select(targets, args.targets)
+    t0 = time.monotonic()
+    counts = build(targets, names, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    print(
+        f"[*] {counts['built']} built, {counts['fresh']} up to date, "
+        f"{counts['failed']} failed, {counts['skipped']} skipped "
+        f"({time.monotonic() - t0:.1f}s)"
+    )
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
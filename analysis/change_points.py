@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Change-point detection over the run-level history in all_starlink_runs.csv.
+
+Firmware updates, gateway swaps or new PoPs show up as regime shifts in
+run-level metrics. For every scenario group (tech, plan, mode, proto,
+port, udp_rate, dscp) the runs are put in chronological order (run start
+from the <YYYYmmdd-HHMMSS>_ run_dir prefix) and each metric in METRICS
+is segmented with PELT (Killick et al. 2012) under a Gaussian mean-shift
+cost:
+
+  - series are scaled by a robust noise estimate (MAD of first
+    differences), so one penalty works for Mbps, ms and %
+  - penalty = PENALTY_K * log(n) per change (BIC-like)
+  - segments are at least MIN_SEG runs long
+  - pruning keeps the expected cost linear in the number of runs while
+    shifts keep occurring (~0.1 s for 2000 runs), so the whole
+    history is simply re-segmented on every refresh
+
+Outputs:
+  - ~/analysis/change_points.csv  one row per detected shift: group keys,
+    metric, first run of the new regime (run_dir + UTC time), mean and
+    n before/after, delta and delta_pct
+
+Usage:
+  python3 change_points.py [--csv all_starlink_runs.csv] [--penalty K] [--min-seg N]
+"""
+
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compact_tables import read_table
+from results_catalog import run_epoch
+
+BASE_DIR = Path.home() / "analysis"
+SUMMARY_CSV = BASE_DIR / "all_starlink_runs.csv"
+OUT_CP = BASE_DIR / "change_points.csv"
+
+SCENARIO_KEYS = ["tech", "plan", "mode", "proto", "port", "udp_rate", "dscp"]
+METRICS = ["iperf_avg_throughput_Mbps", "gw_rtt_p95_ms", "iperf_udp_loss_pct"]
+
+PENALTY_K = 3.0
+MIN_SEG = 5
+
+CP_FIELDS = [
+    "metric",
+    "change_idx",
+    "ts_utc",
+    "run_dir",
+    "n_before",
+    "n_after",
+    "mean_before",
+    "mean_after",
+    "delta",
+    "delta_pct",
+]
+
+
+def robust_sigma(x):
+    """
+    Noise scale from first differences (insensitive to the mean shifts we
+    are looking for); falls back to the plain std.
+    """
+    if x.size < 3:
+        return float(np.std(x))
+    s = 1.4826 * np.median(np.abs(np.diff(x))) / np.sqrt(2.0)
+    if s > 0:
+        return float(s)
+    return float(np.std(x))
+
+
+def pelt_mean(x, penalty, min_seg=MIN_SEG):
+    """
+    Optimal mean-shift segmentation of x (PELT). Returns the sorted start
+    indices of every segment after the first.
+    """
+    n = x.size
+    if n < 2 * min_seg:
+        return []
+
+    cs = np.r_[0.0, np.cumsum(x)]
+    cs2 = np.r_[0.0, np.cumsum(x * x)]
+
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    cands = np.array([0], dtype=np.int64)
+
+    for t in range(min_seg, n + 1):
+        ready = t - cands >= min_seg
+        s = cands[ready]
+        seg_n = t - s
+        seg_sum = cs[t] - cs[s]
+        cost = (cs2[t] - cs2[s]) - seg_sum * seg_sum / seg_n
+        tot = F[s] + cost + penalty
+
+        k = int(np.argmin(tot))
+        F[t] = tot[k]
+        last[t] = s[k]
+
+        # PELT pruning: s can never be optimal again once F[s] + cost > F[t]
+        keep = F[s] + cost <= F[t]
+        cands = np.r_[s[keep], cands[~ready], t]
+
+    cps = []
+    t = n
+    while t > 0:
+        t = int(last[t])
+        if t > 0:
+            cps.append(t)
+    return sorted(cps)
+
+
+def load_runs(csv_path):
+    df = read_table(csv_path)
+    if "run_dir" not in df.columns:
+        raise SystemExit(f"[!] {csv_path} has no run_dir column")
+    fallback = df["timestamp_utc"] if "timestamp_utc" in df.columns else [None] * len(df)
+    df["run_epoch"] = [run_epoch(r, f) for r, f in zip(df["run_dir"].astype(str), fallback)]
+    df = df.dropna(subset=["run_epoch"]).sort_values("run_epoch", kind="stable")
+    return df
+
+
+def _ts_utc(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def detect(df, metrics=METRICS, penalty_k=PENALTY_K, min_seg=MIN_SEG):
+    keys = [k for k in SCENARIO_KEYS if k in df.columns]
+    rows = []
+    for gk, g in df.groupby(keys, dropna=False, sort=True, observed=True):
+        gk = gk if isinstance(gk, tuple) else (gk,)
+        for metric in metrics:
+            if metric not in g.columns:
+                continue
+            series = g[["run_epoch", "run_dir", metric]].copy()
+            series[metric] = pd.to_numeric(series[metric], errors="coerce")
+            series = series.dropna(subset=[metric])
+            x = series[metric].to_numpy(dtype=np.float64)
+            if x.size < 2 * min_seg:
+                continue
+            sigma = robust_sigma(x)
+            if sigma <= 0:
+                continue
+
+            z = (x - x.mean()) / sigma
+            cps = pelt_mean(z, penalty_k * np.log(x.size), min_seg)
+            bounds = [0] + cps + [x.size]
+            for j, cp in enumerate(cps):
+                before = x[bounds[j] : cp]
+                after = x[cp : bounds[j + 2]]
+                m0 = float(before.mean())
+                m1 = float(after.mean())
+                row = dict(zip(keys, gk))
+                row.update(
+                    metric=metric,
+                    change_idx=cp,
+                    ts_utc=_ts_utc(series["run_epoch"].iloc[cp]),
+                    run_dir=series["run_dir"].iloc[cp],
+                    n_before=before.size,
+                    n_after=after.size,
+                    mean_before=m0,
+                    mean_after=m1,
+                    delta=m1 - m0,
+                    delta_pct=(m1 - m0) / abs(m0) * 100.0 if m0 != 0 else np.nan,
+                )
+                rows.append(row)
+    return pd.DataFrame(rows, columns=keys + CP_FIELDS)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Regime-shift detection over all_starlink_runs.csv")
+    ap.add_argument("--csv", default=str(SUMMARY_CSV))
+    ap.add_argument("--out", default=str(OUT_CP))
+    ap.add_argument("--penalty", type=float, default=PENALTY_K, help="penalty multiplier on log(n)")
+    ap.add_argument("--min-seg", type=int, default=MIN_SEG, help="minimum runs per regime")
+    args = ap.parse_args()
+
+    print(f"[*] Loading runs from: {args.csv}")
+    df = load_runs(args.csv)
+    print(f"[+] {len(df)} runs with a start time")
+
+    cps = detect(df, penalty_k=args.penalty, min_seg=args.min_seg)
+    cps.to_csv(args.out, index=False)
+    print(f"[*] Wrote {len(cps)} change points to {args.out}")
+
+    if cps.empty:
+        return
+    print("\n=== Regime shifts ===")
+    keys = [k for k in SCENARIO_KEYS if k in cps.columns]
+    for _, r in cps.iterrows():
+        group = ",".join(str(r[k]) for k in keys)
+        print(
+            f"{r['ts_utc']}  {group}  {r['metric']}: "
+            f"{r['mean_before']:.2f} -> {r['mean_after']:.2f} ({r['delta_pct']:+.1f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Compact table loading for the QoE and run tables.
+
+rq3_all_qoe.csv and all_starlink_runs.csv repeat the same handful of
+strings (url, anchor_host, asset_name, tech, plan, mode, slot,
+app_class, app_kind, run_dir, ...) on every row and pandas keeps them as
+one Python string object per cell. read_table() applies the dtypes at
+read time instead:
+
+  - CATEGORY_COLS and any other string column with few distinct values
+    (<= CATEGORY_MAX_RATIO of the rows) -> category
+  - integer columns -> smallest integer type that holds them
+  - float columns whose magnitude stays below 2**24 -> float32
+    (ms, s, Mbps, %: still ~7 significant digits; epochs and byte
+    counts above 16 MiB keep float64)
+  - TIMESTAMP_COLS -> an extra <col>_dt datetime64 column (the original
+    string is kept, as a category, for the CSV outputs and the catalog)
+
+Datasets bigger than RAM are read in chunks: iter_table() yields
+compacted chunks for streaming aggregations, read_table(chunksize=N)
+compacts chunk by chunk and concatenates, so peak memory is the
+compact table plus one raw chunk. concat() unions the categories so
+concatenating compact frames does not fall back to strings.
+
+Usage:
+  python3 compact_tables.py report <csv> [--chunksize N]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+)
+
+CATEGORY_COLS = [
+    "url",
+    "anchor_host",
+    "asset_name",
+    "tech",
+    "plan",
+    "mode",
+    "slot",
+    "app_class",
+    "app_kind",
+    "run_dir",
+    "proto",
+    "udp_rate",
+    "timestamp",
+    "timestamp_utc",
+]
+TIMESTAMP_COLS = {
+    "timestamp": ("%Y-%m-%dT%H:%M:%S", "%Y%m%d-%H%M%S"),
+    "timestamp_utc": ("%Y-%m-%dT%H:%M:%S", "%Y%m%d-%H%M%S"),
+}
+
+CATEGORY_MAX_RATIO = 0.5
+FLOAT32_MAX_ABS = float(2**24)
+
+
+def parse_timestamps(s, formats):
+    """
+    Parse a string column trying each format in turn; unparseable cells
+    become NaT.
+    """
+    s = s.astype("string")
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        todo = out.isna() & s.notna()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(s[todo].str.slice(0, 19), format=fmt, errors="coerce")
+    return out
+
+
+def _compact_numeric(s):
+    if is_bool_dtype(s):
+        return s
+    if is_integer_dtype(s):
+        return pd.to_numeric(s, downcast="unsigned" if s.min() >= 0 else "integer")
+    if is_float_dtype(s) and s.dtype != np.float32:
+        x = s.to_numpy()
+        finite = x[np.isfinite(x)]
+        if finite.size == 0 or np.abs(finite).max() < FLOAT32_MAX_ABS:
+            return s.astype(np.float32)
+    return s
+
+
+def compact(df, category_cols=CATEGORY_COLS, timestamp_cols=TIMESTAMP_COLS):
+    """
+    Compact dtypes of df in place (see module docstring) and return it.
+    """
+    n = len(df)
+    for c in df.columns:
+        s = df[c]
+        if c in timestamp_cols and f"{c}_dt" not in df.columns:
+            df[f"{c}_dt"] = parse_timestamps(s, timestamp_cols[c])
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if is_numeric_dtype(s):
+            df[c] = _compact_numeric(s)
+            continue
+        if c in category_cols or s.nunique(dropna=True) <= CATEGORY_MAX_RATIO * n:
+            df[c] = s.astype("category")
+    return df
+
+
+def concat(frames):
+    """
+    pd.concat that keeps categoricals categorical (categories are unioned
+    first; plain concat falls back to strings when they differ).
+    """
+    frames = [f for f in frames if f is not None and len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+    cat_cols = {
+        c
+        for f in frames
+        for c in f.columns
+        if isinstance(f[c].dtype, pd.CategoricalDtype)
+    }
+    for c in cat_cols:
+        cats = pd.Index([])
+        for f in frames:
+            if c not in f.columns:
+                continue
+            s = f[c]
+            vals = s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique()
+            cats = cats.union(pd.Index(vals).astype(str))
+        dtype = pd.CategoricalDtype(cats)
+        for f in frames:
+            if c not in f.columns:
+                continue
+            if isinstance(f[c].dtype, pd.CategoricalDtype):
+                f[c] = f[c].cat.set_categories(cats)
+            else:
+                f[c] = f[c].astype(str).where(f[c].notna()).astype(dtype)
+    out = pd.concat(frames, ignore_index=True)
+    # Columns missing from some frames come back as float64
+    for c in out.columns:
+        if out[c].dtype == np.float64:
+            out[c] = _compact_numeric(out[c])
+    return out
+
+
+def _read_kwargs(path, usecols=None):
+    header = pd.read_csv(path, nrows=0, usecols=usecols).columns
+    return {
+        "usecols": usecols,
+        "dtype": {c: "category" for c in header if c in CATEGORY_COLS},
+    }
+
+
+def iter_table(path, chunksize=200_000, usecols=None):
+    """
+    Yield compacted chunks of a CSV (for streaming aggregations).
+    """
+    kw = _read_kwargs(path, usecols)
+    for chunk in pd.read_csv(path, chunksize=chunksize, **kw):
+        yield compact(chunk)
+
+
+def read_table(path, chunksize=None, usecols=None):
+    """
+    Read a CSV into a compact DataFrame. With chunksize, the raw rows are
+    never all in memory at once.
+    """
+    if chunksize:
+        return concat(iter_table(path, chunksize, usecols))
+    return compact(pd.read_csv(path, **_read_kwargs(path, usecols)))
+
+
+def memory_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(before, after, top=10):
+    """
+    Text report of deep memory usage before/after compaction.
+    """
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    tb, ta = int(b.sum()), int(a.sum())
+    lines = [
+        f"rows={len(before)} cols={len(before.columns)}",
+        f"before={tb / 2**20:.2f} MiB after={ta / 2**20:.2f} MiB "
+        f"reduction={tb / ta if ta else float('nan'):.1f}x",
+        f"{'column':<32} {'dtype':>12} {'before_KiB':>12} {'after_KiB':>12}",
+    ]
+    for c in b.sort_values(ascending=False).index[:top]:
+        lines.append(f"{c:<32} {str(after[c].dtype):>12} {b[c] / 1024:>12.1f} {a[c] / 1024:>12.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Memory report for compact table loading")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("report", help="memory before/after compaction")
+    p.add_argument("csv")
+    p.add_argument("--chunksize", type=int, default=None)
+    args = ap.parse_args()
+
+    before = pd.read_csv(args.csv)
+    after = read_table(args.csv, chunksize=args.chunksize)
+    print(memory_report(before, after))
+    if memory_bytes(after) > memory_bytes(before):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
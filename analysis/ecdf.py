@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Precomputed ECDF engine for the RQ3 CDF plots and percentile tables.
+
+analyze_rq3_qoe.py used to re-filter the DataFrame per app_class/app_kind
+and re-sort every subset inside each plot function. ECDFStore instead
+sorts each metric once, grouped by the finest combination of breakdown
+keys (app_class, app_kind, slot, mode, asset_name). Any coarser
+breakdown (by app_class, by slot, by mode, ...) is then assembled from
+those already-sorted cells and cached, so new breakdowns don't cost
+another full pass over the data.
+
+ECDF objects support quantile / cdf lookup, downsampled step points for
+plotting, and round-trip through a single .npz file.
+
+Usage:
+    store = ECDFStore(df, metrics=["time_total", "goodput_mbps"])
+    for key, e in store.by("time_total", ["app_class"]).items():
+        xs, ys = e.step_points()
+    store.save("rq3_ecdfs.npz")
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+BREAKDOWN_KEYS = ("app_class", "app_kind", "slot", "mode", "asset_name")
+
+# Enough points for a smooth step line at paper figure sizes
+PLOT_POINTS = 2000
+
+
+class ECDF:
+    """
+    Empirical CDF over a sorted float64 array.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, sorted_values):
+        self.values = np.asarray(sorted_values, dtype=np.float64)
+
+    @property
+    def n(self):
+        return int(self.values.size)
+
+    def quantile(self, q):
+        """
+        Linear-interpolated quantile(s), q in [0, 1] (same as np.percentile).
+        """
+        if self.n == 0:
+            return np.nan if np.isscalar(q) else np.full(np.shape(q), np.nan)
+        pos = np.asarray(q, dtype=np.float64) * (self.n - 1)
+        res = np.interp(pos, np.arange(self.n), self.values)
+        return float(res) if np.isscalar(q) else res
+
+    def cdf(self, x):
+        """
+        Fraction of samples <= x.
+        """
+        if self.n == 0:
+            return np.nan
+        return np.searchsorted(self.values, x, side="right") / self.n
+
+    def step_points(self, max_points=PLOT_POINTS):
+        """
+        (x, y) for plotting, y running 0..1 like the old plot_cdf; at most
+        max_points points, always keeping both ends.
+        """
+        n = self.n
+        if n == 0:
+            return np.empty(0), np.empty(0)
+        if n == 1:
+            return self.values.copy(), np.array([1.0])
+        if n <= max_points:
+            idx = np.arange(n)
+        else:
+            idx = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+        return self.values[idx], idx / (n - 1)
+
+
+def _codes_for(df, keys):
+    """
+    Integer cell code per row for the combination of `keys`, plus the
+    key tuple of every code.
+    """
+    if not keys:
+        return np.zeros(len(df), dtype=np.int64), [()]
+    cols = [df[k].astype("string").fillna("") for k in keys]
+    frame = pd.concat(cols, axis=1)
+    codes, uniques = pd.MultiIndex.from_frame(frame).factorize()
+    return codes.astype(np.int64), [tuple(u) for u in uniques]
+
+
+class ECDFStore:
+    """
+    One grouped sort per metric at the finest breakdown; cached ECDFs for
+    any subset of BREAKDOWN_KEYS.
+    """
+
+    def __init__(self, df=None, metrics=(), keys=BREAKDOWN_KEYS):
+        self.keys = tuple(k for k in keys if df is None or k in df.columns)
+        self._cells = {}  # metric -> (cell_keys, starts, sorted values)
+        self._cache = {}
+        if df is not None:
+            codes, cell_keys = _codes_for(df, list(self.keys))
+            for m in metrics:
+                if m in df.columns:
+                    values = pd.to_numeric(df[m], errors="coerce").to_numpy(dtype=np.float64)
+                    self._add_metric(m, values, codes, cell_keys)
+
+    def _add_metric(self, metric, values, codes, cell_keys):
+        ok = ~np.isnan(values)
+        v = values[ok]
+        c = codes[ok]
+        order = np.lexsort((v, c))
+        v = v[order]
+        c = c[order]
+        if c.size:
+            present = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+        else:
+            present = np.empty(0, dtype=np.int64)
+        self._cells[metric] = (
+            [cell_keys[i] for i in c[present]],
+            np.r_[present, c.size].astype(np.int64),
+            v,
+        )
+
+    @property
+    def metrics(self):
+        return list(self._cells)
+
+    def by(self, metric, keys=()):
+        """
+        {key tuple: ECDF} for `metric` broken down by `keys` (a subset of
+        self.keys, in any order). Cached.
+        """
+        keys = tuple(keys)
+        cache_key = (metric, keys)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
+        if metric not in self._cells:
+            return {}
+
+        cell_keys, bounds, values = self._cells[metric]
+        pos = [self.keys.index(k) for k in keys]
+
+        parts = {}
+        for i, ck in enumerate(cell_keys):
+            gk = tuple(ck[p] for p in pos)
+            parts.setdefault(gk, []).append(values[bounds[i] : bounds[i + 1]])
+
+        out = {}
+        for gk, chunks in parts.items():
+            if len(chunks) == 1:
+                out[gk] = ECDF(chunks[0])
+            else:
+                # Concatenated sorted runs: a stable sort merges them cheaply
+                out[gk] = ECDF(np.sort(np.concatenate(chunks), kind="stable"))
+        self._cache[cache_key] = out
+        return out
+
+    def get(self, metric, **where):
+        """
+        Single ECDF for one cell of a breakdown, e.g.
+        store.get("goodput_mbps", app_class="video", app_kind="real").
+        """
+        keys = tuple(k for k in self.keys if k in where)
+        return self.by(metric, keys).get(tuple(str(where[k]) for k in keys))
+
+    def percentile_table(self, keys, qs=(0.5, 0.9, 0.95, 0.99)):
+        """
+        Long-format DataFrame: metric, breakdown keys, n, p50/p90/... .
+        """
+        rows = []
+        for m in self.metrics:
+            for gk, e in sorted(self.by(m, keys).items()):
+                row = {"metric": m}
+                row.update(dict(zip(keys, gk)))
+                row["n"] = e.n
+                for q in qs:
+                    row[f"p{int(round(q * 100))}"] = e.quantile(q)
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+    def save(self, path):
+        """
+        Serialize the per-metric sorted cells to one .npz.
+        """
+        arrays = {}
+        meta = {"keys": list(self.keys), "metrics": {}}
+        for i, (m, (cell_keys, bounds, values)) in enumerate(self._cells.items()):
+            arrays[f"v{i}"] = values
+            arrays[f"b{i}"] = bounds
+            meta["metrics"][m] = {"idx": i, "cells": [list(k) for k in cell_keys]}
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            meta = json.loads(z["meta"].tobytes().decode())
+            store = cls(keys=tuple(meta["keys"]))
+            for m, info in meta["metrics"].items():
+                i = info["idx"]
+                store._cells[m] = (
+                    [tuple(k) for k in info["cells"]],
+                    z[f"b{i}"],
+                    z[f"v{i}"],
+                )
+        return store
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Delay-variation metrics from per-packet (or per-interval) delay samples.
+
+The analyzers used to report jitter as the ping mdev or the mean |dRTT|
+of consecutive replies, and iperf3's RFC 3550 jitter for UDP runs only.
+This module computes, from one array of delays, the metrics VoIP/RTC
+work uses so every run type can be compared on the same scale:
+
+  - jitter_rfc3550_ms   RFC 3550 interarrival jitter, J += (|D| - J) / 16,
+                        over consecutive samples in arrival order; for
+                        RTT samples D is the RTT difference
+  - ipdv_*              RFC 5481 IPDV: delay difference of packets with
+                        consecutive sequence numbers (losses break pairs);
+                        percentiles of |IPDV|
+  - pdv_*               RFC 5481 PDV: delay minus the minimum delay;
+                        percentiles and a histogram over PDV_BIN_EDGES_MS
+                        ("lo-hi:count;..." like burst_len_hist)
+  - mean_abs_delta_ms   mean |D| (the old jitter_mean_abs column)
+
+Everything is vectorized; the RFC 3550 recursion has the closed form
+J_n = sum_k |D_k| / 16 * (15/16)^(n-k), evaluated as one dot product.
+
+Inputs:
+  - gateway ping: rtt_ms + icmp_seq (parse_ping_log or the samples CSVs)
+  - iperf3 TCP runs: per-interval sender RTT (iperf_rtt_samples); UDP
+    intervals only carry iperf3's own RFC 3550 jitter, which stays in
+    iperf_udp_jitter_ms
+
+Usage from other scripts:
+
+    from jitter import JITTER_FIELDS, jitter_metrics
+    m = jitter_metrics(parsed["rtt_ms"], seq=parsed["seq"])
+
+Standalone:
+
+    python3 jitter.py <ping_raw.log | iperf3_raw.json>
+"""
+
+import json
+import sys
+
+import numpy as np
+
+from ping_gaps import parse_ping_log, unwrap_seq
+
+RFC3550_GAIN = 1.0 / 16.0
+
+# Jitter-buffer sized bins (ms); the last bin is open-ended
+PDV_BIN_EDGES_MS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+JITTER_FIELDS = [
+    "jitter_rfc3550_ms",
+    "mean_abs_delta_ms",
+    "ipdv_pairs",
+    "ipdv_abs_p50_ms",
+    "ipdv_abs_p95_ms",
+    "ipdv_abs_p99_ms",
+    "pdv_p50_ms",
+    "pdv_p95_ms",
+    "pdv_p99_ms",
+    "pdv_hist",
+]
+
+
+def empty_jitter_metrics():
+    return {k: None for k in JITTER_FIELDS}
+
+
+def rfc3550_jitter(delays):
+    """
+    Final RFC 3550 jitter estimate (J_0 = 0) over delays in arrival order.
+    """
+    d = np.abs(np.diff(np.asarray(delays, dtype=np.float64)))
+    if d.size == 0:
+        return None
+    weights = RFC3550_GAIN * (1.0 - RFC3550_GAIN) ** np.arange(d.size - 1, -1, -1, dtype=np.float64)
+    return float(d @ weights)
+
+
+def ipdv(delays, seq=None):
+    """
+    RFC 5481 IPDV for sequence-consecutive pairs; without seq every
+    consecutive pair counts.
+    """
+    delays = np.asarray(delays, dtype=np.float64)
+    if seq is None:
+        return np.diff(delays)
+    seq = unwrap_seq(seq)
+    order = np.argsort(seq, kind="stable")
+    s = seq[order]
+    d = delays[order]
+    consecutive = np.diff(s) == 1
+    return np.diff(d)[consecutive]
+
+
+def pdv_hist_str(pdv, edges=PDV_BIN_EDGES_MS):
+    """
+    Compact PDV histogram "lo-hi:count;...;lo+:count" (empty bins omitted).
+    """
+    if pdv.size == 0:
+        return ""
+    counts = np.bincount(np.searchsorted(edges, pdv, side="right") - 1, minlength=len(edges))
+    labels = [f"{lo}-{hi}" for lo, hi in zip(edges[:-1], edges[1:])] + [f"{edges[-1]}+"]
+    return ";".join(f"{lab}:{c}" for lab, c in zip(labels, counts.tolist()) if c)
+
+
+def jitter_metrics(delays_ms, seq=None):
+    """
+    All JITTER_FIELDS from delays (ms) in arrival order, plus the matching
+    sequence numbers if known.
+    """
+    res = empty_jitter_metrics()
+    x = np.asarray(delays_ms, dtype=np.float64)
+    ok = np.isfinite(x)
+    x = x[ok]
+    if seq is not None:
+        seq = np.asarray(seq, dtype=np.int64)[ok]
+    if x.size == 0:
+        return res
+
+    pdv = x - x.min()
+    p = np.percentile(pdv, [50, 95, 99])
+    res["pdv_p50_ms"], res["pdv_p95_ms"], res["pdv_p99_ms"] = (float(v) for v in p)
+    res["pdv_hist"] = pdv_hist_str(pdv)
+
+    if x.size < 2:
+        return res
+    res["jitter_rfc3550_ms"] = rfc3550_jitter(x)
+    res["mean_abs_delta_ms"] = float(np.abs(np.diff(x)).mean())
+
+    v = np.abs(ipdv(x, seq))
+    res["ipdv_pairs"] = int(v.size)
+    if v.size:
+        p = np.percentile(v, [50, 95, 99])
+        res["ipdv_abs_p50_ms"], res["ipdv_abs_p95_ms"], res["ipdv_abs_p99_ms"] = (float(q) for q in p)
+    return res
+
+
+def iperf_rtt_samples(data):
+    """
+    Per-interval sender RTT (ms) from iperf3 JSON (TCP on Linux reports
+    streams[].rtt in microseconds). Streams are averaged per interval;
+    returns an empty array for UDP or when RTT is not reported.
+    """
+    rtts = []
+    for iv in data.get("intervals", []):
+        vals = [s["rtt"] for s in iv.get("streams", []) if isinstance(s.get("rtt"), (int, float))]
+        if vals:
+            rtts.append(sum(vals) / len(vals) / 1000.0)
+    return np.asarray(rtts, dtype=np.float64)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <ping_raw.log | iperf3_raw.json>", file=sys.stderr)
+        sys.exit(1)
+
+    path = sys.argv[1]
+    if path.endswith(".json"):
+        with open(path) as f:
+            m = jitter_metrics(iperf_rtt_samples(json.load(f)))
+    else:
+        parsed = parse_ping_log(path)
+        m = jitter_metrics(parsed["rtt_ms"], seq=parsed["seq"])
+    for k in JITTER_FIELDS:
+        print(f"{k}={m[k]}")
+
+
+if __name__ == "__main__":
+    main()
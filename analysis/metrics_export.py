@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Prometheus textfile export for the measurement / analysis pipeline.
+
+The analyzers and campaign scripts update a small JSON state file and
+re-render a node_exporter textfile-collector file from it:
+
+  starlink_runs_total{kind,status}                       counter (per run_id,
+                                                         re-analysis not counted)
+  starlink_analysis_stage_duration_seconds{stage}        histogram
+  starlink_latest_<metric>{kind,<scenario labels>}       gauge
+  starlink_latest_run_timestamp_seconds{kind,...}        gauge
+  starlink_queue_depth{queue}                            gauge
+  starlink_metrics_last_update_timestamp_seconds         gauge
+
+Every update takes an flock on the state file, and both the state and the
+.prom file are written to a temp file in the same directory and renamed
+over the old one, so node_exporter never reads a half-written file. An
+update is a few KB of JSON, cheap enough for every run. Failures only
+print a warning; they never fail the analysis.
+
+Point node_exporter's --collector.textfile.directory at TEXTFILE_DIR
+(default ~/analysis/metrics, override with STARLINK_TEXTFILE_DIR).
+
+Usage (from shell scripts):
+  python3 metrics_export.py run --kind active --status OK [--run-id ID]
+                                [--label k=v ...] [--value k=v ...]
+  python3 metrics_export.py stage --name summarize --seconds 1.7
+  python3 metrics_export.py queue --name matrix_pending --depth 12
+  python3 metrics_export.py scan      # unanalyzed_runs queue from results_* dirs
+  python3 metrics_export.py show
+"""
+
+import argparse
+import fcntl
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path.home() / "analysis"
+TEXTFILE_DIR = Path(os.environ.get("STARLINK_TEXTFILE_DIR", str(BASE_DIR / "metrics")))
+PROM_NAME = "starlink_pipeline.prom"
+STATE_NAME = "starlink_pipeline_state.json"
+
+PREFIX = "starlink"
+STAGE_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LATEST_HELP = {
+    "throughput_mbps": "Throughput of the latest run (Mbps).",
+    "rtt_p95_ms": "Gateway RTT p95 of the latest run (ms).",
+    "loss_pct": "Loss of the latest run (%).",
+}
+
+ACTIVE_LABELS = ("tech", "plan", "mode", "proto", "port", "udp_rate", "dscp")
+
+
+def _empty_state():
+    return {"runs": {}, "counted": {}, "stages": {}, "latest": {}, "queues": {}}
+
+
+def _atomic_write(path, text):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def _locked_state(textfile_dir=None):
+    d = Path(textfile_dir) if textfile_dir else TEXTFILE_DIR
+    d.mkdir(parents=True, exist_ok=True)
+    state_path = d / STATE_NAME
+    with open(d / (STATE_NAME + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = _empty_state()
+        try:
+            state.update(json.loads(state_path.read_text()))
+        except (OSError, ValueError):
+            pass
+        yield state
+        state["updated"] = time.time()
+        _atomic_write(state_path, json.dumps(state, sort_keys=True))
+        _atomic_write(d / PROM_NAME, render(state))
+
+
+def _update(mutate, textfile_dir=None):
+    try:
+        with _locked_state(textfile_dir) as state:
+            mutate(state)
+        return True
+    except OSError as e:
+        print(f"[!] Metrics export failed: {e}", file=sys.stderr)
+        return False
+
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(d):
+    if not d:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in d.items()) + "}"
+
+
+def _num(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+
+def _fmt(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render(state):
+    out = []
+
+    def head(name, kind, text):
+        out.append(f"# HELP {PREFIX}_{name} {text}")
+        out.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    head("runs_total", "counter", "Measurement runs analyzed, by kind and status.")
+    for key, n in sorted(state["runs"].items()):
+        kind, status = key.split("|", 1)
+        out.append(f"{PREFIX}_runs_total{_labels({'kind': kind, 'status': status})} {n}")
+
+    name = "analysis_stage_duration_seconds"
+    head(name, "histogram", "Wall time of analysis stages.")
+    for stage, h in sorted(state["stages"].items()):
+        cum = 0
+        for le, c in zip(list(STAGE_BUCKETS_S) + [math.inf], h["buckets"]):
+            cum += c
+            out.append(f"{PREFIX}_{name}_bucket{_labels({'stage': stage, 'le': _fmt(le)})} {cum}")
+        out.append(f"{PREFIX}_{name}_sum{_labels({'stage': stage})} {_fmt(h['sum'])}")
+        out.append(f"{PREFIX}_{name}_count{_labels({'stage': stage})} {h['count']}")
+
+    latest = sorted(state["latest"].items())
+    for metric, text in LATEST_HELP.items():
+        head(f"latest_{metric}", "gauge", text)
+        for _, e in latest:
+            if metric in e["values"]:
+                out.append(f"{PREFIX}_latest_{metric}{_labels(e['labels'])} {_fmt(e['values'][metric])}")
+    head("latest_run_timestamp_seconds", "gauge", "Unix time the latest run per scenario was analyzed.")
+    for _, e in latest:
+        out.append(f"{PREFIX}_latest_run_timestamp_seconds{_labels(e['labels'])} {_fmt(e['ts'])}")
+
+    head("queue_depth", "gauge", "Pending work items (unanalyzed runs, remaining campaign scenarios).")
+    for q, n in sorted(state["queues"].items()):
+        out.append(f"{PREFIX}_queue_depth{_labels({'queue': q})} {n}")
+
+    head("metrics_last_update_timestamp_seconds", "gauge", "Unix time of the last update of this file.")
+    out.append(f"{PREFIX}_metrics_last_update_timestamp_seconds {_fmt(state.get('updated', time.time()))}")
+    return "\n".join(out) + "\n"
+
+
+def record_run(kind, status, labels=None, values=None, textfile_dir=None, run_id=None):
+    """
+    Count one analyzed run and, if given, remember its headline values as
+    the latest for its scenario (labels). With run_id, a run already
+    counted (re-analysis) only updates the latest values.
+    """
+    labels = {"kind": kind, **{k: "" if v is None else str(v) for k, v in (labels or {}).items()}}
+    values = {k: _num(v) for k, v in (values or {}).items()}
+    values = {k: v for k, v in values.items() if v is not None}
+
+    def mutate(state):
+        counted = state["counted"].setdefault(kind, {})
+        if run_id is None or run_id not in counted:
+            key = f"{kind}|{status}"
+            state["runs"][key] = state["runs"].get(key, 0) + 1
+            if run_id is not None:
+                counted[run_id] = status
+        if values:
+            lk = ",".join(f"{k}={v}" for k, v in labels.items())
+            state["latest"][lk] = {"labels": labels, "values": values, "ts": time.time()}
+
+    return _update(mutate, textfile_dir)
+
+
+def observe_stage(stage, seconds, textfile_dir=None):
+    def mutate(state):
+        h = state["stages"].setdefault(
+            stage, {"buckets": [0] * (len(STAGE_BUCKETS_S) + 1), "sum": 0.0, "count": 0}
+        )
+        i = next((i for i, le in enumerate(STAGE_BUCKETS_S) if seconds <= le), len(STAGE_BUCKETS_S))
+        h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+    return _update(mutate, textfile_dir)
+
+
+@contextmanager
+def stage_timer(stage, textfile_dir=None):
+    """
+    with stage_timer("summarize"): ...  -> one histogram observation.
+    """
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.monotonic() - t0, textfile_dir)
+
+
+def set_queue_depth(queue, depth, textfile_dir=None):
+    def mutate(state):
+        state["queues"][queue] = int(depth)
+
+    return _update(mutate, textfile_dir)
+
+
+def count_pending_runs(base_dir=BASE_DIR):
+    """
+    Run dirs that have raw data but no metrics file yet.
+    """
+    pending = 0
+    for sub, metrics_name in (
+        ("results_starlink", "metrics_run.csv"),
+        ("results_gateway", "metrics_gateway.csv"),
+    ):
+        d = Path(base_dir) / sub
+        if not d.is_dir():
+            continue
+        for run_dir in d.iterdir():
+            if run_dir.is_dir() and not (run_dir / metrics_name).exists():
+                pending += 1
+    return pending
+
+
+def _kv_list(items):
+    out = {}
+    for item in items or []:
+        k, sep, v = item.partition("=")
+        if not sep:
+            raise SystemExit(f"[!] Expected key=value, got: {item}")
+        out[k] = v
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prometheus textfile export for the Starlink pipeline")
+    ap.add_argument("--dir", default=None, help=f"textfile directory (default {TEXTFILE_DIR})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="count one analyzed run")
+    p.add_argument("--kind", required=True)
+    p.add_argument("--status", required=True)
+    p.add_argument("--run-id", help="count each run once, even when re-analyzed")
+    p.add_argument("--label", action="append", help="scenario label k=v (repeatable)")
+    p.add_argument("--value", action="append", help="latest value k=v (repeatable)")
+
+    p = sub.add_parser("stage", help="observe one stage duration")
+    p.add_argument("--name", required=True)
+    p.add_argument("--seconds", type=float, required=True)
+
+    p = sub.add_parser("queue", help="set a queue depth")
+    p.add_argument("--name", required=True)
+    p.add_argument("--depth", type=int, required=True)
+
+    sub.add_parser("scan", help="set unanalyzed_runs from results_* dirs")
+    sub.add_parser("show", help="print the current .prom file")
+
+    args = ap.parse_args()
+    if args.cmd == "run":
+        record_run(args.kind, args.status, _kv_list(args.label), _kv_list(args.value), args.dir, args.run_id)
+    elif args.cmd == "stage":
+        observe_stage(args.name, args.seconds, args.dir)
+    elif args.cmd == "queue":
+        set_queue_depth(args.name, args.depth, args.dir)
+    elif args.cmd == "scan":
+        n = count_pending_runs()
+        set_queue_depth("unanalyzed_runs", n, args.dir)
+        print(f"[*] unanalyzed_runs={n}")
+    elif args.cmd == "show":
+        d = Path(args.dir) if args.dir else TEXTFILE_DIR
+        path = d / PROM_NAME
+        if path.exists():
+            sys.stdout.write(path.read_text())
+
+
+if __name__ == "__main__":
+    main()
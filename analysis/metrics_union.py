@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Streaming union-schema merge for heterogeneous one-row metrics CSVs.
+
+Every time a metric column is added to analyze_starlink_run.py, older
+metrics_run.csv files have a different header. Instead of skipping those
+runs, UnionTable builds the union of all headers in one pass:
+
+  - columns appear in first-seen order (new metrics end up at the end)
+  - each column is typed on the fly: empty -> int -> float -> text
+  - runs that lack a column are null-filled
+  - values are stored column-wise (array('d') for numbers, dictionary-
+    encoded codes for text), never as per-row lists of strings
+
+Usage:
+    table = UnionTable()
+    for path in paths:
+        table.add_csv(path, extra={"source": path})
+    table.write_csv(out_path)
+    table.print_coverage()
+"""
+
+import csv
+import math
+from array import array
+
+KIND_EMPTY = "empty"
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_TEXT = "text"
+
+_NAN = float("nan")
+
+
+class _Column:
+    """
+    One typed, null-aware column. Numeric values live in array('d') with
+    NaN as null; once a non-numeric value shows up the column is promoted
+    to dictionary-encoded text (array('l') codes, -1 as null).
+    """
+
+    def __init__(self, name, n_nulls=0):
+        self.name = name
+        self.kind = KIND_EMPTY
+        self.non_null = 0
+        self._num = array("d", [_NAN]) * n_nulls
+        self._codes = None
+        self._values = None
+        self._index = None
+
+    def __len__(self):
+        return len(self._codes) if self.kind == KIND_TEXT else len(self._num)
+
+    def append_null(self):
+        if self.kind == KIND_TEXT:
+            self._codes.append(-1)
+        else:
+            self._num.append(_NAN)
+
+    def append(self, raw):
+        if raw is None:
+            self.append_null()
+            return
+        raw = raw.strip()
+        if raw == "" or raw == "None":
+            self.append_null()
+            return
+        self.non_null += 1
+
+        if self.kind != KIND_TEXT:
+            try:
+                v = int(raw)
+                if self.kind == KIND_EMPTY:
+                    self.kind = KIND_INT
+                self._num.append(float(v))
+                return
+            except ValueError:
+                pass
+            try:
+                v = float(raw)
+                self.kind = KIND_FLOAT
+                self._num.append(v)
+                return
+            except ValueError:
+                self._promote_to_text()
+
+        self._codes.append(self._encode(raw))
+
+    def _encode(self, s):
+        code = self._index.get(s)
+        if code is None:
+            code = len(self._values)
+            self._values.append(s)
+            self._index[s] = code
+        return code
+
+    def _promote_to_text(self):
+        old_kind = self.kind
+        self.kind = KIND_TEXT
+        self._values = []
+        self._index = {}
+        self._codes = array("l")
+        for v in self._num:
+            if math.isnan(v):
+                self._codes.append(-1)
+            else:
+                self._codes.append(self._encode(_format_num(v, old_kind)))
+        self._num = None
+
+    def get(self, i):
+        """
+        Typed value at row i (int/float/str) or None.
+        """
+        if self.kind == KIND_TEXT:
+            c = self._codes[i]
+            return None if c < 0 else self._values[c]
+        v = self._num[i]
+        if math.isnan(v):
+            return None
+        return int(v) if self.kind == KIND_INT else v
+
+    def get_str(self, i):
+        if self.kind == KIND_TEXT:
+            c = self._codes[i]
+            return "" if c < 0 else self._values[c]
+        v = self._num[i]
+        return "" if math.isnan(v) else _format_num(v, self.kind)
+
+    def values(self):
+        return [self.get(i) for i in range(len(self))]
+
+
+def _format_num(v, kind):
+    if kind == KIND_INT:
+        return str(int(v))
+    return repr(v)
+
+
+class UnionTable:
+    """
+    Column-wise union of rows with differing schemas (see module doc).
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self._cols = {}
+
+    @property
+    def columns(self):
+        return list(self._cols)
+
+    def kind(self, name):
+        return self._cols[name].kind
+
+    def add_row(self, record):
+        """
+        Append one row given as {column: raw string}.
+        """
+        for name, raw in record.items():
+            col = self._cols.get(name)
+            if col is None:
+                col = self._cols[name] = _Column(name, self.n_rows)
+            col.append(raw)
+        self.n_rows += 1
+        for col in self._cols.values():
+            if len(col) < self.n_rows:
+                col.append_null()
+
+    def add_csv(self, path, extra=None):
+        """
+        Append every data row of a CSV file. Returns the number of rows
+        added (0 for an empty/headerless file).
+        """
+        added = 0
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return 0
+            for row in reader:
+                if not row:
+                    continue
+                record = dict(zip(header, row))
+                if extra:
+                    record.update(extra)
+                self.add_row(record)
+                added += 1
+        return added
+
+    def column(self, name):
+        """
+        Typed values of one column (None where missing). Unknown columns
+        are all-None, so callers don't need to special-case old schemas.
+        """
+        col = self._cols.get(name)
+        if col is None:
+            return [None] * self.n_rows
+        return col.values()
+
+    def iter_str_rows(self):
+        cols = list(self._cols.values())
+        for i in range(self.n_rows):
+            yield [c.get_str(i) for c in cols]
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(self.iter_str_rows())
+
+    def coverage(self):
+        """
+        [(column, kind, non_null, fraction)] in column order.
+        """
+        out = []
+        for name, col in self._cols.items():
+            frac = col.non_null / self.n_rows if self.n_rows else 0.0
+            out.append((name, col.kind, col.non_null, frac))
+        return out
+
+    def write_coverage_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["column", "kind", "non_null", "coverage"])
+            for name, kind, nn, frac in self.coverage():
+                writer.writerow([name, kind, nn, f"{frac:.4f}"])
+
+    def print_coverage(self, only_partial=False):
+        print(f"\n=== Column coverage ({self.n_rows} rows) ===")
+        print("column,kind,non_null,coverage_pct")
+        for name, kind, nn, frac in self.coverage():
+            if only_partial and frac >= 1.0:
+                continue
+            print(f"{name},{kind},{nn},{frac * 100:.1f}")
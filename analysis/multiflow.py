@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Multi-flow web metrics (household contention mode, FLOWS>1).
+
+client/web_multiflow.py writes multiflow_summary.txt and
+analyze_rq3_qoe.py writes rq3_multiflow.csv with flow_metrics(), so both
+report the same numbers for a run. Only completed flows count: a
+time_total > 0 and no error (web_timing.csv's error column is empty for
+them; failed and short-body flows carry the message).
+
+Standard library only: the client imports this module too.
+"""
+
+
+def _num(x):
+    """
+    float(x), or None for None/NaN/non-numeric values.
+    """
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if x != x else x
+
+
+def completed(time_total, error):
+    """
+    True for a flow that delivered its whole body.
+    """
+    t = _num(time_total)
+    failed = error is not None and error == error and str(error) != ""
+    return t is not None and t > 0 and not failed
+
+
+def jain_index(xs):
+    """
+    Jain's fairness index (sum x)^2 / (n * sum x^2); 1.0 = perfectly fair.
+    None/NaN entries are ignored.
+    """
+    xs = [x for x in map(_num, xs) if x is not None]
+    if not xs:
+        return float("nan")
+    sq = sum(x * x for x in xs)
+    if sq == 0:
+        return float("nan")
+    return sum(xs) ** 2 / (len(xs) * sq)
+
+
+def aggregate_mbps(sizes, times):
+    """
+    Aggregate goodput of flows that start together: total bytes over the
+    slowest flow's time_total. None/NaN entries are ignored.
+    """
+    total = sum(s for s in map(_num, sizes) if s is not None)
+    t_max = max((t for t in map(_num, times) if t is not None), default=0.0)
+    return total * 8.0 / t_max / 1e6 if t_max > 0 else float("nan")
+
+
+def flow_metrics(sizes, times, errors):
+    """
+    Per-run summary over the completed flows: ok_flows, aggregate_mbps,
+    jain_index and goodputs_mbps (one entry per completed flow).
+    """
+    ok = [(_num(s) or 0.0, _num(t)) for s, t, e in zip(sizes, times, errors) if completed(t, e)]
+    goodputs = [s * 8.0 / t / 1e6 for s, t in ok]
+    return {
+        "ok_flows": len(ok),
+        "aggregate_mbps": aggregate_mbps([s for s, _ in ok], [t for _, t in ok]),
+        "jain_index": jain_index(goodputs),
+        "goodputs_mbps": goodputs,
+    }
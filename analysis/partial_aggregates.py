@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Mergeable partial aggregates for multi-site / multi-client campaigns.
+
+Each site (dish / location / client host) summarizes its own ~/analysis
+tree into one small JSON file instead of shipping raw results_* dirs:
+
+  partials_<site>_<timestamp>.json
+    active groups : (proto, port, tos, mode)          <- like summarize_by_key
+    qoe groups    : (app_class, app_kind, asset_name, mode)
+
+Per group and metric we keep count / sum / M2 (Chan et al. parallel
+variance), min / max and a log-bucketed quantile sketch with relative
+error SKETCH_ALPHA. All of these merge exactly by addition, so merging
+any number of partials costs O(groups x buckets), independent of how many
+raw samples or runs were behind them.
+
+Usage:
+  python3 partial_aggregates.py build <site_label> [out.json]
+  python3 partial_aggregates.py merge [--out merged.csv] part1.json part2.json ...
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from metrics_union import UnionTable
+
+BASE_DIR = Path.home() / "analysis"
+RESULTS_DIR = BASE_DIR / "results_starlink"
+QOE_DIRS = {
+    "web": BASE_DIR / "results_apps_web",
+    "video": BASE_DIR / "results_apps_video",
+    "audio": BASE_DIR / "results_apps_audio",
+}
+
+FORMAT_VERSION = 1
+SKETCH_ALPHA = 0.01
+SKETCH_MIN_VALUE = 1e-9
+
+ACTIVE_KEYS = ("proto", "port", "tos", "mode")
+ACTIVE_METRICS = (
+    "iperf_avg_throughput_Mbps",
+    "gw_rtt_avg_ms",
+    "gw_rtt_p95_ms",
+    "iperf_udp_loss_pct",
+)
+
+QOE_KEYS = ("app_class", "app_kind", "asset_name", "mode")
+QOE_METRICS = (
+    "time_starttransfer",
+    "time_total",
+    "goodput_mbps",
+)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch-style). Any value x > 0 lands in
+    bucket ceil(log_gamma(x)); quantiles come back within SKETCH_ALPHA
+    relative error. Values <= SKETCH_MIN_VALUE (incl. negatives) are
+    counted in a separate zero bucket.
+    """
+
+    def __init__(self, alpha=SKETCH_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1.0 + alpha) / (1.0 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = defaultdict(int)
+        self.zero = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= SKETCH_MIN_VALUE:
+            self.zero += 1
+            return
+        self.bins[int(math.ceil(math.log(x) / self._log_gamma))] += 1
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        for k, c in other.bins.items():
+            self.bins[k] += c
+        self.zero += other.zero
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        cum = self.zero
+        if cum > rank:
+            return 0.0
+        for k in sorted(self.bins):
+            cum += self.bins[k]
+            if cum > rank:
+                return 2.0 * self.gamma**k / (self.gamma + 1.0)
+        return 2.0 * self.gamma ** max(self.bins) / (self.gamma + 1.0)
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "zero": self.zero,
+            "bins": {str(k): c for k, c in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(d["alpha"])
+        s.zero = int(d["zero"])
+        for k, c in d["bins"].items():
+            s.bins[int(k)] = int(c)
+        s.count = s.zero + sum(s.bins.values())
+        return s
+
+
+class MetricAgg:
+    """
+    count / sum / M2 / min / max plus a QuantileSketch for one metric.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.sum = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch()
+
+    def add(self, x):
+        mean_old = self.sum / self.n if self.n else 0.0
+        self.n += 1
+        self.sum += x
+        self.m2 += (x - mean_old) * (x - self.sum / self.n)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.sketch.add(x)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.sum, self.m2 = other.n, other.sum, other.m2
+            self.min, self.max = other.min, other.max
+        else:
+            delta = other.sum / other.n - self.sum / self.n
+            n = self.n + other.n
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+            self.n = n
+            self.sum += other.sum
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def mean(self):
+        return self.sum / self.n if self.n else None
+
+    def std(self):
+        # Sample std, 0.0 below two values (same as summarize_by_key)
+        if self.n < 2:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.n - 1))
+
+    def to_dict(self):
+        return {
+            "n": self.n,
+            "sum": self.sum,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        a = cls()
+        a.n = int(d["n"])
+        a.sum = float(d["sum"])
+        a.m2 = float(d["m2"])
+        a.min = d["min"]
+        a.max = d["max"]
+        a.sketch = QuantileSketch.from_dict(d["sketch"])
+        return a
+
+
+class GroupAgg:
+    def __init__(self, metrics):
+        self.count = 0
+        self.metrics = {m: MetricAgg() for m in metrics}
+
+    def merge(self, other):
+        self.count += other.count
+        for m, agg in other.metrics.items():
+            self.metrics.setdefault(m, MetricAgg()).merge(agg)
+
+
+def _key_str(v):
+    return "" if v is None else str(v)
+
+
+def _float_or_none(x):
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+
+def aggregate_table(table, keys, metrics):
+    """
+    Group a UnionTable by `keys` and aggregate `metrics` per group.
+    """
+    key_cols = [table.column(k) for k in keys]
+    metric_cols = {m: table.column(m) for m in metrics}
+    groups = {}
+    for i in range(table.n_rows):
+        key = tuple(_key_str(c[i]) for c in key_cols)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = GroupAgg(metrics)
+        g.count += 1
+        for m, col in metric_cols.items():
+            v = _float_or_none(col[i])
+            if v is not None:
+                g.metrics[m].add(v)
+    return groups
+
+
+def load_active_table(results_dir=RESULTS_DIR):
+    table = UnionTable()
+    if results_dir.exists():
+        for run_dir in sorted(results_dir.iterdir()):
+            f = run_dir / "metrics_run.csv"
+            if f.is_file():
+                table.add_csv(f)
+    return table
+
+
+def load_qoe_table(qoe_dirs=QOE_DIRS):
+    table = UnionTable()
+    for app_class, rdir in qoe_dirs.items():
+        if not rdir.exists():
+            continue
+        for f in sorted(rdir.glob("*/*_timing.csv")):
+            with open(f, "r") as fh:
+                header = fh.readline().strip().split(",")
+            # Concurrent-flow runs share capacity, and segmented video sessions
+            # and paced audio streams last about as long as the media; keep
+            # them out like the RQ3 CDFs
+            if "flow_id" in header or "pipeline_depth" in header or "chunk_ms" in header:
+                continue
+            table.add_csv(f, extra={"app_class": app_class})
+
+    # Goodput derived the same way as analyze_rq3_qoe.add_derived_metrics
+    t_total = table.column("time_total")
+    size = table.column("size_download")
+    goodput = []
+    for t, s in zip(t_total, size):
+        t = _float_or_none(t)
+        s = _float_or_none(s)
+        ok = t is not None and s is not None and t > 0 and s > 0
+        goodput.append(s * 8.0 / t / 1e6 if ok else None)
+    return table, goodput
+
+
+def build_partials(site):
+    active = aggregate_table(load_active_table(), ACTIVE_KEYS, ACTIVE_METRICS)
+
+    qoe_table, goodput = load_qoe_table()
+    qoe = aggregate_table(
+        qoe_table, QOE_KEYS, [m for m in QOE_METRICS if m != "goodput_mbps"]
+    )
+    # goodput is not a table column; fold it in row by row
+    key_cols = [qoe_table.column(k) for k in QOE_KEYS]
+    for i, g in enumerate(goodput):
+        key = tuple(_key_str(c[i]) for c in key_cols)
+        agg = qoe[key].metrics.setdefault("goodput_mbps", MetricAgg())
+        if g is not None:
+            agg.add(g)
+
+    return {
+        "version": FORMAT_VERSION,
+        "sites": [site],
+        "created_utc": datetime.now(timezone.utc).isoformat(),
+        "active": _groups_to_list(active, ACTIVE_KEYS),
+        "qoe": _groups_to_list(qoe, QOE_KEYS),
+    }
+
+
+def _groups_to_list(groups, keys):
+    return {
+        "keys": list(keys),
+        "groups": [
+            {
+                "key": list(k),
+                "count": g.count,
+                "metrics": {m: a.to_dict() for m, a in g.metrics.items()},
+            }
+            for k, g in sorted(groups.items())
+        ],
+    }
+
+
+def _groups_from_list(section):
+    groups = {}
+    for item in section["groups"]:
+        g = GroupAgg(())
+        g.count = int(item["count"])
+        g.metrics = {m: MetricAgg.from_dict(d) for m, d in item["metrics"].items()}
+        groups[tuple(item["key"])] = g
+    return groups
+
+
+def merge_partials(paths):
+    """
+    Merge any number of partial files. Returns (sites, active, qoe) where
+    active/qoe map group key -> GroupAgg.
+    """
+    sites = []
+    merged = {"active": {}, "qoe": {}}
+    for p in paths:
+        with open(p, "r") as f:
+            part = json.load(f)
+        if part.get("version") != FORMAT_VERSION:
+            print(f"[!] {p}: unsupported partials version, skipping")
+            continue
+        sites.extend(part.get("sites", []))
+        for section in ("active", "qoe"):
+            for key, g in _groups_from_list(part[section]).items():
+                if key in merged[section]:
+                    merged[section][key].merge(g)
+                else:
+                    merged[section][key] = g
+    return sites, merged["active"], merged["qoe"]
+
+
+def print_active_summary(groups):
+    """
+    Same columns/format as summarize_starlink_metrics.summarize_by_key,
+    plus sketch-based p50/p95 of throughput and gateway RTT.
+    """
+    print("\n=== Aggregate summary by (proto, port, tos, mode) ===")
+    print(
+        "proto,port,tos,mode,count,avg_thr_Mbps,std_thr_Mbps,"
+        "avg_gw_rtt_ms,std_gw_rtt_ms,p50_thr_Mbps,p95_thr_Mbps,p95_gw_rtt_p95_ms"
+    )
+    for key, g in sorted(groups.items()):
+        thr = g.metrics.get("iperf_avg_throughput_Mbps", MetricAgg())
+        rtt = g.metrics.get("gw_rtt_avg_ms", MetricAgg())
+        rtt95 = g.metrics.get("gw_rtt_p95_ms", MetricAgg())
+        print(
+            "{},{},{},{},{},{:.3f},{:.3f},{:.3f},{:.3f},{},{},{}".format(
+                key[0],
+                key[1],
+                key[2],
+                key[3],
+                g.count,
+                thr.mean() if thr.mean() is not None else 0.0,
+                thr.std(),
+                rtt.mean() if rtt.mean() is not None else 0.0,
+                rtt.std(),
+                _fmt(thr.sketch.quantile(0.50)),
+                _fmt(thr.sketch.quantile(0.95)),
+                _fmt(rtt95.sketch.quantile(0.95)),
+            )
+        )
+
+
+def _fmt(v):
+    return "" if v is None else f"{v:.3f}"
+
+
+def write_merged_csv(path, active, qoe):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["section", "group", "count", "metric", "n", "mean", "std", "min", "max"]
+            + ["p50", "p90", "p95", "p99"]
+        )
+        for section, groups in (("active", active), ("qoe", qoe)):
+            for key, g in sorted(groups.items()):
+                for m, a in sorted(g.metrics.items()):
+                    if a.n == 0:
+                        continue
+                    writer.writerow(
+                        [section, "/".join(key), g.count, m, a.n, a.mean(), a.std()]
+                        + [a.min, a.max]
+                        + [a.sketch.quantile(q) for q in (0.5, 0.9, 0.95, 0.99)]
+                    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mergeable partial aggregates")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="summarize the local ~/analysis tree")
+    b.add_argument("site")
+    b.add_argument("out", nargs="?")
+
+    m = sub.add_parser("merge", help="merge partial files from several sites")
+    m.add_argument("--out", help="write long-format merged CSV")
+    m.add_argument("parts", nargs="+")
+
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        part = build_partials(args.site)
+        out = args.out
+        if out is None:
+            ts = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+            out = BASE_DIR / f"partials_{args.site}_{ts}.json"
+        with open(out, "w") as f:
+            json.dump(part, f, separators=(",", ":"))
+        print(
+            f"[*] Wrote {out}: {len(part['active']['groups'])} active groups, "
+            f"{len(part['qoe']['groups'])} QoE groups"
+        )
+        return
+
+    sites, active, qoe = merge_partials(args.parts)
+    if not active and not qoe:
+        print("[!] Nothing to merge.", file=sys.stderr)
+        sys.exit(1)
+    print(f"[*] Merged {len(args.parts)} partial files from sites: {sorted(set(sites))}")
+    print_active_summary(active)
+    if args.out:
+        write_merged_csv(args.out, active, qoe)
+        print(f"[*] Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Loss-burst and outage analysis from ping icmp_seq gaps.
+
+The per-run analyzers used to estimate tx as max(icmp_seq) and derive loss
+from a reply count. That misses leading/trailing loss, double-counts DUP!
+replies and says nothing about *how* packets were lost. This module
+reconstructs the full seq timeline from a raw ping log and computes:
+
+  - loss bursts (runs of consecutive lost seqs) and their length histogram
+  - outages (bursts lasting at least OUTAGE_MIN_S) and their durations
+  - mean time between outages (uptime / number of outages)
+  - 2-state Gilbert-Elliott loss-model parameters (p, r, pi_bad)
+
+Usage from other scripts:
+
+    from ping_gaps import parse_ping_log, analyze_gaps
+    parsed = parse_ping_log("ping_gw_raw.log")
+    tx, rx, gaps = analyze_gaps(parsed["seq"], lost_seqs=parsed["lost_seq"],
+                                tx_hint=parsed["tx_summary"], dup=parsed["dup"])
+
+Standalone:
+
+    python3 ping_gaps.py <ping_raw.log> [interval_s]
+"""
+
+import math
+import re
+import sys
+
+import numpy as np
+
+# Bursts at least this long (in seconds) count as outages
+OUTAGE_MIN_S = 2.0
+
+# Linux ping starts at icmp_seq=1 and wraps at 2^16
+FIRST_SEQ = 1
+SEQ_MODULO = 65536
+
+GAP_FIELDS = [
+    "ping_dup",
+    "ping_reordered",
+    "ping_leading_lost",
+    "loss_bursts",
+    "burst_len_mean",
+    "burst_len_max",
+    "burst_len_hist",
+    "outages",
+    "outage_total_s",
+    "outage_max_s",
+    "mtbo_s",
+    "ge_p_good_to_bad",
+    "ge_r_bad_to_good",
+    "ge_pi_bad",
+]
+
+_seq_re = re.compile(r"icmp_seq[=\s](\d+)")
+_time_re = re.compile(r"time[=<]([\d\.]+)\s*ms")
+_ts_re = re.compile(r"^\[(\d+(?:\.\d+)?)\]")
+_txrx_re = re.compile(r"(\d+)\s+packets transmitted,\s+(\d+)\s+(?:packets )?received")
+
+
+def empty_gap_metrics():
+    return {k: None for k in GAP_FIELDS}
+
+
+def parse_ping_log(ping_path):
+    """
+    Single pass over a raw ping log.
+
+    Recognizes echo replies (icmp_seq=N ... time=X ms, optionally prefixed
+    by a `ping -D` [epoch] timestamp), DUP! replies, and explicit losses
+    ("no answer yet for icmp_seq=N", "Destination Host Unreachable",
+    "Request timeout for icmp_seq N").
+
+    Returns a dict of numpy arrays:
+      seq, rtt_ms, ts   replies in log order (ts is NaN without ping -D)
+      lost_seq          seqs reported as lost/unreachable
+      dup               number of DUP! replies (not included in seq)
+      tx_summary        "N packets transmitted" from the trailer, or None
+    """
+    seqs = []
+    rtts = []
+    tss = []
+    lost = []
+    dup = 0
+    tx_summary = None
+
+    with open(ping_path, "r", errors="replace") as f:
+        for line in f:
+            m_seq = _seq_re.search(line)
+            if not m_seq:
+                m_tx = _txrx_re.search(line)
+                if m_tx:
+                    tx_summary = int(m_tx.group(1))
+                continue
+            seq = int(m_seq.group(1))
+            m_time = _time_re.search(line)
+            if m_time is None:
+                lost.append(seq)
+                continue
+            if "DUP!" in line:
+                dup += 1
+                continue
+            m_ts = _ts_re.match(line)
+            seqs.append(seq)
+            rtts.append(float(m_time.group(1)))
+            tss.append(float(m_ts.group(1)) if m_ts else math.nan)
+
+    return {
+        "seq": np.asarray(seqs, dtype=np.int64),
+        "rtt_ms": np.asarray(rtts, dtype=np.float64),
+        "ts": np.asarray(tss, dtype=np.float64),
+        "lost_seq": np.asarray(lost, dtype=np.int64),
+        "dup": dup,
+        "tx_summary": tx_summary,
+    }
+
+
+def unwrap_seq(seqs):
+    """
+    Undo 16-bit icmp_seq wraparound (long captures at 1 Hz wrap after ~18 h).
+    A backwards jump of more than half the seq space is treated as a wrap.
+    """
+    seqs = np.asarray(seqs, dtype=np.int64)
+    if seqs.size < 2:
+        return seqs.copy()
+    wraps = np.cumsum(np.diff(seqs) < -(SEQ_MODULO // 2))
+    out = seqs.copy()
+    out[1:] += SEQ_MODULO * wraps
+    return out
+
+
+def loss_runs(received):
+    """
+    Return (starts, lengths) of runs of consecutive False in a bool array.
+    """
+    lost = np.concatenate(([False], ~received, [False])).astype(np.int8)
+    edges = np.diff(lost)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends - starts
+
+
+def burst_hist_str(lengths):
+    """
+    Compact burst-length histogram "len:count;len:count" (CSV-safe).
+    """
+    if lengths.size == 0:
+        return ""
+    vals, counts = np.unique(lengths, return_counts=True)
+    return ";".join(f"{v}:{c}" for v, c in zip(vals.tolist(), counts.tolist()))
+
+
+def gilbert_elliott(received):
+    """
+    Fit the 2-state Gilbert-Elliott model (loss only in the bad state) from
+    the per-seq loss indicator.
+
+      p      = P(good -> bad)
+      r      = P(bad -> good)
+      pi_bad = p / (p + r)  stationary loss probability
+    """
+    if received.size < 2:
+        return None, None, None
+    prev = ~received[:-1]
+    nxt = ~received[1:]
+    n_good = int((~prev).sum())
+    n_bad = int(prev.sum())
+    p = float((~prev & nxt).sum()) / n_good if n_good else None
+    r = float((prev & ~nxt).sum()) / n_bad if n_bad else None
+    if n_bad == 0:
+        return p, r, 0.0
+    if n_good == 0:
+        return p, r, 1.0
+    return p, r, p / (p + r)
+
+
+def analyze_gaps(
+    seqs,
+    lost_seqs=None,
+    tx_hint=None,
+    dup=0,
+    interval_s=1.0,
+    outage_min_s=OUTAGE_MIN_S,
+    first_seq=FIRST_SEQ,
+):
+    """
+    Reconstruct the seq timeline and compute loss/outage structure.
+
+    seqs        reply icmp_seqs in log order (repeated seqs count as dups)
+    lost_seqs   seqs explicitly reported as lost (extend the timeline)
+    tx_hint     transmitted count from the ping trailer (catches trailing loss)
+    dup         DUP! replies already filtered out by the parser
+    interval_s  ping interval used to convert burst lengths to seconds
+
+    Returns (tx, rx, metrics) where metrics has the GAP_FIELDS keys.
+    """
+    seqs = unwrap_seq(seqs)
+    if lost_seqs is not None and len(lost_seqs):
+        lost_seqs = unwrap_seq(lost_seqs)
+        last = max(int(seqs.max()) if seqs.size else 0, int(lost_seqs.max()))
+    else:
+        last = int(seqs.max()) if seqs.size else first_seq - 1
+
+    tx = last - first_seq + 1
+    if tx_hint is not None and tx_hint > tx:
+        tx = int(tx_hint)
+
+    metrics = empty_gap_metrics()
+    if tx <= 0:
+        return 0, 0, metrics
+
+    idx = seqs - first_seq
+    idx = idx[(idx >= 0) & (idx < tx)]
+    received = np.zeros(tx, dtype=bool)
+    received[idx] = True
+    rx = int(received.sum())
+
+    if seqs.size > 1:
+        running_max = np.maximum.accumulate(seqs)[:-1]
+        metrics["ping_reordered"] = int((seqs[1:] < running_max).sum())
+    else:
+        metrics["ping_reordered"] = 0
+    metrics["ping_dup"] = int(dup) + int(seqs.size - np.unique(seqs).size)
+
+    starts, lengths = loss_runs(received)
+    metrics["ping_leading_lost"] = (
+        int(lengths[0]) if starts.size and starts[0] == 0 else 0
+    )
+    metrics["loss_bursts"] = int(lengths.size)
+    metrics["burst_len_hist"] = burst_hist_str(lengths)
+    if lengths.size:
+        metrics["burst_len_mean"] = float(lengths.mean())
+        metrics["burst_len_max"] = int(lengths.max())
+
+    min_lost = max(1, int(math.ceil(outage_min_s / interval_s)))
+    outage_lens = lengths[lengths >= min_lost]
+    outage_s = outage_lens * interval_s
+    metrics["outages"] = int(outage_lens.size)
+    metrics["outage_total_s"] = float(outage_s.sum())
+    if outage_lens.size:
+        metrics["outage_max_s"] = float(outage_s.max())
+        uptime_s = tx * interval_s - float(outage_s.sum())
+        metrics["mtbo_s"] = uptime_s / outage_lens.size
+
+    p, r, pi_bad = gilbert_elliott(received)
+    metrics["ge_p_good_to_bad"] = p
+    metrics["ge_r_bad_to_good"] = r
+    metrics["ge_pi_bad"] = pi_bad
+
+    return tx, rx, metrics
+
+
+def estimate_interval(seqs, ts, default=1.0):
+    """
+    Ping interval from `ping -D` timestamps if present, else `default`.
+    """
+    seqs = unwrap_seq(seqs)
+    ok = ~np.isnan(ts)
+    if ok.sum() < 2:
+        return default
+    s = seqs[ok]
+    t = ts[ok]
+    dseq = s[-1] - s[0]
+    if dseq <= 0:
+        return default
+    return float((t[-1] - t[0]) / dseq)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: {sys.argv[0]} <ping_raw.log> [interval_s]", file=sys.stderr)
+        sys.exit(1)
+
+    parsed = parse_ping_log(sys.argv[1])
+    if len(sys.argv) == 3:
+        interval = float(sys.argv[2])
+    else:
+        interval = estimate_interval(parsed["seq"], parsed["ts"])
+
+    tx, rx, gaps = analyze_gaps(
+        parsed["seq"],
+        lost_seqs=parsed["lost_seq"],
+        tx_hint=parsed["tx_summary"],
+        dup=parsed["dup"],
+        interval_s=interval,
+    )
+    loss = (tx - rx) * 100.0 / tx if tx else None
+    print(f"tx={tx} rx={rx} loss_pct={loss} interval_s={interval:.3f}")
+    for k in GAP_FIELDS:
+        print(f"{k}={gaps[k]}")
+
+
+if __name__ == "__main__":
+    main()
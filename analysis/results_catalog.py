@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+SQLite results catalog for all measurement runs.
+
+Run parameters otherwise only live in directory names and run_metadata.txt,
+so every question meant rebuilding all_starlink_runs.csv. The per-run
+analyzers (analyze_starlink_run.py, analyze_gateway_ping.py) and the RQ3
+pipeline (analyze_rq3_qoe.py) upsert their metrics here instead:
+
+  ~/analysis/results_catalog.sqlite
+    runs(kind, run_id, ts_epoch, tech, plan, mode, proto, port, udp_rate,
+         dscp, tos, slot, app_class, app_kind, asset_name, run_idx,
+         throughput_mbps, rtt_p50_ms, rtt_p95_ms, rtt_p99_ms, loss_pct,
+         jitter_ms, time_total_s, run_status, metrics_json)
+
+The common scenario keys and the headline metrics are real columns with
+indexes; everything else is kept in metrics_json (queryable through
+json_extract). The database runs in WAL mode with a busy timeout, so
+several analyzers can write concurrently while queries keep reading.
+
+Usage:
+  python3 results_catalog.py query --mode vpn --proto udp --udp-rate 10M \\
+      --since 7d --metric rtt_p95_ms --stat p95
+  python3 results_catalog.py ingest            # backfill from results_* dirs
+"""
+
+import argparse
+import csv
+import json
+import math
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path.home() / "analysis"
+CATALOG_DB = BASE_DIR / "results_catalog.sqlite"
+
+KINDS = ("active", "gateway", "qoe")
+
+KEY_COLUMNS = [
+    "tech",
+    "plan",
+    "mode",
+    "proto",
+    "port",
+    "udp_rate",
+    "dscp",
+    "tos",
+    "slot",
+    "app_class",
+    "app_kind",
+    "asset_name",
+    "run_idx",
+]
+
+METRIC_COLUMNS = [
+    "throughput_mbps",
+    "rtt_p50_ms",
+    "rtt_p95_ms",
+    "rtt_p99_ms",
+    "loss_pct",
+    "jitter_ms",
+    "time_total_s",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    kind            TEXT NOT NULL,
+    run_id          TEXT NOT NULL,
+    ts_epoch        REAL,
+    tech            TEXT,
+    plan            TEXT,
+    mode            TEXT,
+    proto           TEXT,
+    port            INTEGER,
+    udp_rate        TEXT,
+    dscp            INTEGER,
+    tos             INTEGER,
+    slot            TEXT,
+    app_class       TEXT,
+    app_kind        TEXT,
+    asset_name      TEXT,
+    run_idx         INTEGER,
+    throughput_mbps REAL,
+    rtt_p50_ms      REAL,
+    rtt_p95_ms      REAL,
+    rtt_p99_ms      REAL,
+    loss_pct        REAL,
+    jitter_ms       REAL,
+    time_total_s    REAL,
+    run_status      TEXT,
+    metrics_json    TEXT,
+    updated_epoch   REAL,
+    PRIMARY KEY (kind, run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs (ts_epoch);
+CREATE INDEX IF NOT EXISTS idx_runs_scenario
+    ON runs (mode, proto, port, dscp, ts_epoch);
+CREATE INDEX IF NOT EXISTS idx_runs_udp ON runs (proto, udp_rate, ts_epoch);
+CREATE INDEX IF NOT EXISTS idx_runs_tech_plan ON runs (tech, plan, ts_epoch);
+CREATE INDEX IF NOT EXISTS idx_runs_app ON runs (app_class, app_kind, ts_epoch);
+"""
+
+_ALL_COLUMNS = (
+    ["kind", "run_id", "ts_epoch"]
+    + KEY_COLUMNS
+    + METRIC_COLUMNS
+    + ["run_status", "metrics_json", "updated_epoch"]
+)
+
+_UPSERT_SQL = (
+    "INSERT INTO runs ({cols}) VALUES ({qs}) "
+    "ON CONFLICT(kind, run_id) DO UPDATE SET {upd}"
+).format(
+    cols=", ".join(_ALL_COLUMNS),
+    qs=", ".join("?" for _ in _ALL_COLUMNS),
+    upd=", ".join(f"{c}=excluded.{c}" for c in _ALL_COLUMNS[2:]),
+)
+
+_INT_COLUMNS = {"port", "dscp", "tos", "run_idx"}
+_TEXT_COLUMNS = {"kind", "run_id", "run_status"} | (set(KEY_COLUMNS) - _INT_COLUMNS)
+
+_run_ts_re = re.compile(r"^(\d{8}-\d{6})_")
+
+
+def connect(db_path=CATALOG_DB):
+    """
+    Open (and create if needed) the catalog in WAL mode.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _float_or_none(x):
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+
+def _int_or_none(x):
+    v = _float_or_none(x)
+    return None if v is None else int(v)
+
+
+def run_epoch(run_id, fallback=None):
+    """
+    Run start time from the <YYYYmmdd-HHMMSS>_ directory prefix written by
+    the client scripts; falls back to an ISO/epoch string.
+    """
+    m = _run_ts_re.match(run_id or "")
+    if m:
+        dt = datetime.strptime(m.group(1), "%Y%m%d-%H%M%S")
+        return dt.replace(tzinfo=timezone.utc).timestamp()
+    if fallback in (None, ""):
+        return None
+    v = _float_or_none(fallback)
+    if v is not None:
+        return v
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y%m%d-%H%M%S"):
+        try:
+            dt = datetime.strptime(str(fallback)[:19], fmt)
+            return dt.replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def active_record(fields):
+    """
+    Map a metrics_run.csv row (dict) to a catalog record.
+    """
+    udp = fields.get("proto") == "udp"
+    if not fields.get("mode") or not fields.get("port"):
+        print(f"[!] Active run {fields.get('run_dir')} has no mode/port (run_metadata.txt missing?)")
+    return {
+        "kind": "active",
+        "run_id": fields.get("run_dir"),
+        "ts_epoch": run_epoch(fields.get("run_dir"), fields.get("timestamp_utc")),
+        "tech": fields.get("tech"),
+        "plan": fields.get("plan"),
+        "mode": fields.get("mode"),
+        "proto": fields.get("proto"),
+        "port": fields.get("port"),
+        "udp_rate": fields.get("udp_rate") or None,
+        "dscp": fields.get("dscp"),
+        "tos": fields.get("tos"),
+        "run_idx": fields.get("run_idx"),
+        "throughput_mbps": fields.get("iperf_avg_throughput_Mbps"),
+        "rtt_p50_ms": fields.get("gw_rtt_p50_ms"),
+        "rtt_p95_ms": fields.get("gw_rtt_p95_ms"),
+        "rtt_p99_ms": fields.get("gw_rtt_p99_ms"),
+        "loss_pct": fields.get("iperf_udp_loss_pct" if udp else "gw_ping_loss_pct"),
+        "jitter_ms": fields.get(
+            "iperf_udp_jitter_ms" if udp else "gw_jitter_mean_abs_dRTT_ms"
+        ),
+        "run_status": "OK" if str(fields.get("iperf_success")) == "1" else "FAIL",
+        "metrics": fields,
+    }
+
+
+def gateway_record(run_id, fields):
+    """
+    Map a metrics_gateway.csv row (dict) to a catalog record.
+    """
+    return {
+        "kind": "gateway",
+        "run_id": run_id,
+        "ts_epoch": run_epoch(run_id, fields.get("start_ts")),
+        "tech": fields.get("nut_label"),
+        "slot": fields.get("location_label"),
+        "rtt_p50_ms": fields.get("rtt_p50_ms"),
+        "rtt_p95_ms": fields.get("rtt_p95_ms"),
+        "rtt_p99_ms": fields.get("rtt_p99_ms"),
+        "loss_pct": fields.get("loss_percent"),
+        "jitter_ms": fields.get("jitter_mean_abs_ms"),
+        "run_status": fields.get("run_status"),
+        "metrics": fields,
+    }
+
+
+def qoe_record(fields):
+    """
+    Map one RQ3 QoE row (web/video/audio timing + derived metrics).
+    """
+    run_id = fields.get("run_dir") or "{}_{}_{}_{}".format(
+        fields.get("timestamp"),
+        fields.get("app_class"),
+        fields.get("asset_name"),
+        fields.get("run_idx"),
+    )
+    # Multi-flow web runs: one row per flow in the same run dir
+    flow_id = fields.get("flow_id")
+    if flow_id is not None and flow_id == flow_id:
+        run_id = f"{run_id}#f{int(flow_id)}"
+    # Paced audio runs: one row per stream in the same run dir
+    stream_id = _int_or_none(fields.get("stream_id"))
+    if stream_id is not None:
+        run_id = f"{run_id}#s{stream_id}"
+    return {
+        "kind": "qoe",
+        "run_id": run_id,
+        "ts_epoch": run_epoch(run_id, fields.get("timestamp")),
+        "tech": fields.get("tech"),
+        "plan": fields.get("plan"),
+        "mode": fields.get("mode"),
+        "slot": fields.get("slot"),
+        "app_class": fields.get("app_class"),
+        "app_kind": fields.get("app_kind"),
+        "asset_name": fields.get("asset_name"),
+        "run_idx": fields.get("run_idx"),
+        "throughput_mbps": fields.get("goodput_mbps"),
+        "time_total_s": fields.get("time_total"),
+        "metrics": fields,
+    }
+
+
+def _row_values(rec, now):
+    vals = []
+    for c in _ALL_COLUMNS:
+        if c == "metrics_json":
+            metrics = {
+                k: (None if isinstance(v, float) and math.isnan(v) else v)
+                for k, v in rec.get("metrics", {}).items()
+            }
+            vals.append(json.dumps(metrics, default=str))
+        elif c == "updated_epoch":
+            vals.append(now)
+        elif c in _TEXT_COLUMNS:
+            v = rec.get(c)
+            vals.append(None if v in (None, "") else str(v))
+        elif c in _INT_COLUMNS:
+            vals.append(_int_or_none(rec.get(c)))
+        else:
+            vals.append(_float_or_none(rec.get(c)))
+    return vals
+
+
+def upsert(records, db_path=CATALOG_DB):
+    """
+    Insert or replace records (dicts from *_record()) in one transaction.
+    Returns the number of rows written.
+    """
+    now = time.time()
+    rows = [_row_values(r, now) for r in records if r.get("run_id")]
+    if not rows:
+        return 0
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(_UPSERT_SQL, rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def safe_upsert(records, db_path=CATALOG_DB):
+    """
+    upsert() for analyzers: a catalog problem must never fail a run.
+    """
+    try:
+        n = upsert(records, db_path)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[!] Catalog update failed ({db_path}): {e}")
+        return 0
+    if n:
+        _refresh_cube(db_path)
+    return n
+
+
+def _refresh_cube(db_path):
+    # Keep the time-of-day cube in step (imported here: tod_cube itself
+    # builds on this module)
+    from tod_cube import safe_refresh
+
+    safe_refresh(db_path)
+
+
+# ----------------------------------------------------------------------
+# Backfill from results_* directories
+# ----------------------------------------------------------------------
+
+
+def _read_one_row(path):
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        return next(reader, None)
+
+
+def _read_kv(path):
+    kv = {}
+    if path.is_file():
+        with path.open() as f:
+            for line in f:
+                k, sep, v = line.strip().partition("=")
+                if sep:
+                    kv[k.strip()] = v.strip()
+    return kv
+
+
+# metrics_run.csv written before the analyzer read run_metadata.txt has
+# these columns empty (tos/dscp as 0); the metadata file wins
+SCENARIO_KEYS = ("tech", "plan", "mode", "proto", "port", "udp_rate", "dscp", "tos", "run_idx")
+
+
+def ingest_tree(base_dir=BASE_DIR, db_path=CATALOG_DB):
+    records = []
+    for run_dir in sorted((base_dir / "results_starlink").glob("*")):
+        f = run_dir / "metrics_run.csv"
+        if f.is_file():
+            row = _read_one_row(f)
+            if row:
+                row.setdefault("run_dir", run_dir.name)
+                meta = _read_kv(run_dir / "run_metadata.txt")
+                for k in SCENARIO_KEYS:
+                    if meta.get(k):
+                        row[k] = meta[k]
+                records.append(active_record(row))
+    for run_dir in sorted((base_dir / "results_gateway").glob("*")):
+        f = run_dir / "metrics_gateway.csv"
+        if f.is_file():
+            row = _read_one_row(f)
+            if row:
+                records.append(gateway_record(run_dir.name, row))
+    for app in ("web", "video", "audio"):
+        for f in sorted((base_dir / f"results_apps_{app}").glob("*/*_timing.csv")):
+            with open(f, "r", newline="") as fh:
+                for row in csv.DictReader(fh):
+                    row["run_dir"] = f.parent.name
+                    row.setdefault("app_class", app)
+                    t = _float_or_none(row.get("time_total"))
+                    s = _float_or_none(row.get("size_download"))
+                    if t and s and t > 0:
+                        row["goodput_mbps"] = s * 8.0 / t / 1e6
+                    records.append(qoe_record(row))
+    return upsert(records, db_path)
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+
+
+def percentile(xs, p):
+    if not xs:
+        return None
+    xs_sorted = sorted(xs)
+    k = (len(xs_sorted) - 1) * (p / 100.0)
+    f = math.floor(k)
+    c = math.ceil(k)
+    if f == c:
+        return xs_sorted[int(k)]
+    return xs_sorted[f] * (c - k) + xs_sorted[c] * (k - f)
+
+
+def parse_since(s):
+    """
+    '7d' / '12h' / '30m' relative to now, or an ISO date/epoch.
+    """
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([dhm])", s)
+    if m:
+        mult = {"d": 86400, "h": 3600, "m": 60}[m.group(2)]
+        return time.time() - float(m.group(1)) * mult
+    v = _float_or_none(s)
+    if v is not None:
+        return v
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def query_values(metric, filters, since=None, until=None, kind=None, db_path=CATALOG_DB):
+    """
+    Return the non-null values of `metric` for runs matching `filters`
+    ({column: value}). `metric` is a catalog column or any key of
+    metrics_json.
+    """
+    where = []
+    args = []
+    if kind:
+        where.append("kind = ?")
+        args.append(kind)
+    for col, val in filters.items():
+        if col not in KEY_COLUMNS:
+            raise ValueError(f"Unknown filter column: {col}")
+        where.append(f"{col} = ?")
+        args.append(int(val) if col in _INT_COLUMNS else val)
+    if since is not None:
+        where.append("ts_epoch >= ?")
+        args.append(since)
+    if until is not None:
+        where.append("ts_epoch < ?")
+        args.append(until)
+
+    if metric in METRIC_COLUMNS:
+        expr = metric
+    else:
+        if not re.fullmatch(r"[A-Za-z0-9_]+", metric):
+            raise ValueError(f"Bad metric name: {metric}")
+        expr = f"CAST(json_extract(metrics_json, '$.{metric}') AS REAL)"
+
+    sql = f"SELECT {expr} FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    conn = connect(db_path)
+    try:
+        vals = [r[0] for r in conn.execute(sql, args) if r[0] is not None]
+    finally:
+        conn.close()
+    return vals
+
+
+def summarize(vals, stat):
+    if stat == "count":
+        return len(vals)
+    if not vals:
+        return None
+    if stat == "mean":
+        return sum(vals) / len(vals)
+    if stat == "min":
+        return min(vals)
+    if stat == "max":
+        return max(vals)
+    m = re.fullmatch(r"p(\d+(?:\.\d+)?)", stat)
+    if m:
+        return percentile(vals, float(m.group(1)))
+    raise ValueError(f"Unknown stat: {stat}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Starlink results catalog")
+    ap.add_argument("--db", default=str(CATALOG_DB))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("ingest", help="backfill from ~/analysis/results_* dirs")
+
+    q = sub.add_parser("query", help="aggregate one metric over matching runs")
+    q.add_argument("--kind", choices=KINDS)
+    for col in KEY_COLUMNS:
+        q.add_argument("--" + col.replace("_", "-"), dest=col)
+    q.add_argument("--since", help="e.g. 7d, 12h, 2025-01-01")
+    q.add_argument("--until")
+    q.add_argument("--metric", default="rtt_p95_ms")
+    q.add_argument("--stat", default="p95", help="count|mean|min|max|pNN")
+
+    args = ap.parse_args()
+    db_path = Path(args.db)
+
+    if args.cmd == "ingest":
+        n = ingest_tree(BASE_DIR, db_path)
+        print(f"[*] Upserted {n} runs into {db_path}")
+        _refresh_cube(db_path)
+        return
+
+    filters = {c: getattr(args, c) for c in KEY_COLUMNS if getattr(args, c)}
+    t0 = time.perf_counter()
+    try:
+        vals = query_values(
+            args.metric,
+            filters,
+            since=parse_since(args.since) if args.since else None,
+            until=parse_since(args.until) if args.until else None,
+            kind=args.kind,
+            db_path=db_path,
+        )
+        result = summarize(vals, args.stat)
+    except ValueError as e:
+        print(f"[!] {e}", file=sys.stderr)
+        sys.exit(1)
+    dt_ms = (time.perf_counter() - t0) * 1000.0
+
+    print(f"{args.stat}({args.metric}) = {result}  [n={len(vals)}, {dt_ms:.1f} ms]")
+
+
+if __name__ == "__main__":
+    main()
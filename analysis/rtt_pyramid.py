@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution (decimated) RTT series for fast long-range plotting.
+
+A week of 1 Hz gateway pings is ~600k samples; plotting them directly is
+slow and unreadable. For each baseline run we precompute a pyramid of
+bucketed summaries at LEVELS_S resolutions (1 s, 10 s, 1 min, 10 min):
+
+    t0, count, min, max, mean, p50, p95, p99   (per bucket)
+
+The pyramid is built once, streaming over the samples in chunks (memory
+is bounded by one chunk plus one coarse bucket), and stored next to the
+run as one .npy per level so a plot only memory-maps the level it needs.
+
+Inputs (in RUN_DIR):
+  - gateway_ping_samples.csv  (timestamp_epoch,seq,rtt_ms or seq,rtt_ms)
+  - gw_ping_samples.csv       (active runs, seq,rtt_ms)
+  - run_metadata.txt          (start_ts / timestamp_utc, used without timestamps)
+
+Outputs:
+  - rtt_pyramid_<width>s.npy  (one structured array per level)
+
+Usage:
+  python3 rtt_pyramid.py <run_dir> [out.png] [width_px]
+"""
+
+import csv
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+LEVELS_S = (1, 10, 60, 600)
+PERCENTILES = (50, 95, 99)
+CHUNK_ROWS = 1 << 16
+
+# A level is fine enough for a plot when it has at most this many buckets
+# per horizontal pixel; beyond that matplotlib just overdraws.
+MAX_BUCKETS_PER_PX = 2
+
+PYRAMID_DTYPE = np.dtype(
+    [
+        ("t0", "f8"),
+        ("count", "i4"),
+        ("min", "f4"),
+        ("max", "f4"),
+        ("mean", "f4"),
+        ("p50", "f4"),
+        ("p95", "f4"),
+        ("p99", "f4"),
+    ]
+)
+
+SAMPLE_FILES = ("gateway_ping_samples.csv", "gw_ping_samples.csv")
+
+
+def level_path(run_dir, width_s):
+    return os.path.join(run_dir, f"rtt_pyramid_{width_s}s.npy")
+
+
+def _read_meta(run_dir):
+    meta = {}
+    path = os.path.join(run_dir, "run_metadata.txt")
+    if not os.path.isfile(path):
+        return meta
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if "=" in line:
+                k, v = line.split("=", 1)
+                meta[k.strip()] = v.strip()
+    return meta
+
+
+def _start_epoch(meta):
+    """
+    Capture start time from run_metadata.txt (baseline: start_ts epoch,
+    active runs: timestamp_utc ISO). Returns None if unknown.
+    """
+    if meta.get("start_ts"):
+        try:
+            return float(meta["start_ts"])
+        except ValueError:
+            pass
+    if meta.get("timestamp_utc"):
+        try:
+            dt = datetime.fromisoformat(meta["timestamp_utc"])
+            return dt.replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    return None
+
+
+def iter_sample_chunks(samples_csv, start_ts=0.0, interval_s=1.0):
+    """
+    Yield (t, rtt) float64 arrays of at most CHUNK_ROWS samples.
+
+    Without a timestamp_epoch column, t = start_ts + (seq - 1) * interval_s.
+    """
+    with open(samples_csv, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        col = {name: i for i, name in enumerate(header)}
+        i_rtt = col["rtt_ms"]
+        i_ts = col.get("timestamp_epoch")
+        i_seq = col.get("seq")
+        if i_ts is None and i_seq is None:
+            return
+
+        ts = []
+        rtts = []
+        for row in reader:
+            try:
+                rtt = float(row[i_rtt])
+                if i_ts is not None:
+                    t = float(row[i_ts])
+                else:
+                    t = start_ts + (int(row[i_seq]) - 1) * interval_s
+            except (ValueError, IndexError):
+                continue
+            ts.append(t)
+            rtts.append(rtt)
+            if len(ts) >= CHUNK_ROWS:
+                yield np.asarray(ts), np.asarray(rtts)
+                ts = []
+                rtts = []
+        if ts:
+            yield np.asarray(ts), np.asarray(rtts)
+
+
+def _bucket_stats(t, rtt, width_s):
+    """
+    Summarize (t, rtt) into buckets of width_s seconds (vectorized).
+    """
+    out = np.zeros(0, dtype=PYRAMID_DTYPE)
+    if t.size == 0:
+        return out
+
+    bucket = np.floor(t / width_s).astype(np.int64)
+    order = np.lexsort((rtt, bucket))
+    bucket = bucket[order]
+    vals = rtt[order]
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, bucket.size])
+
+    out = np.zeros(starts.size, dtype=PYRAMID_DTYPE)
+    out["t0"] = bucket[starts] * float(width_s)
+    out["count"] = counts
+    out["min"] = vals[starts]
+    out["max"] = vals[starts + counts - 1]
+    out["mean"] = np.add.reduceat(vals, starts) / counts
+
+    # Linear-interpolated percentiles within each (sorted) bucket
+    for p in PERCENTILES:
+        k = (counts - 1) * (p / 100.0)
+        f = np.floor(k).astype(np.int64)
+        c = np.ceil(k).astype(np.int64)
+        lo = vals[starts + f]
+        hi = vals[starts + c]
+        out[f"p{p}"] = lo + (hi - lo) * (k - f)
+    return out
+
+
+def build_pyramid(run_dir, interval_s=1.0):
+    """
+    Stream the run's RTT samples once and write rtt_pyramid_<w>s.npy for
+    every level in LEVELS_S. Returns {width_s: n_buckets} or None if the
+    run has no samples or no way to place them in time.
+
+    Samples are assumed to be roughly time-ordered; reordering up to one
+    coarse bucket (10 min) is tolerated, later stragglers are dropped.
+    """
+    samples_csv = None
+    for name in SAMPLE_FILES:
+        path = os.path.join(run_dir, name)
+        if os.path.isfile(path):
+            samples_csv = path
+            break
+    if samples_csv is None:
+        return None
+
+    start_ts = _start_epoch(_read_meta(run_dir))
+    if start_ts is None:
+        with open(samples_csv, "r", newline="") as f:
+            header = next(csv.reader(f), [])
+        if "timestamp_epoch" not in header:
+            print(f"[!] RTT pyramid: skipping {run_dir} (no timestamp_epoch and no start time in metadata)")
+            return None
+    coarse = LEVELS_S[-1]
+
+    parts = {w: [] for w in LEVELS_S}
+    carry_t = np.zeros(0)
+    carry_rtt = np.zeros(0)
+    flushed_upto = None  # coarse buckets < this are final
+    dropped = 0
+
+    for t, rtt in iter_sample_chunks(samples_csv, start_ts, interval_s):
+        t = np.concatenate((carry_t, t))
+        rtt = np.concatenate((carry_rtt, rtt))
+
+        cb = np.floor(t / coarse).astype(np.int64)
+        if flushed_upto is not None:
+            late = cb < flushed_upto
+            dropped += int(late.sum())
+            t, rtt, cb = t[~late], rtt[~late], cb[~late]
+        if t.size == 0:
+            carry_t, carry_rtt = t, rtt
+            continue
+
+        # Keep the newest two coarse buckets open for late samples
+        cut = int(cb.max()) - 1
+        done = cb < cut
+        for w in LEVELS_S:
+            parts[w].append(_bucket_stats(t[done], rtt[done], w))
+        carry_t, carry_rtt = t[~done], rtt[~done]
+        flushed_upto = cut if flushed_upto is None else max(flushed_upto, cut)
+
+    if flushed_upto is None and carry_t.size == 0:
+        return None
+
+    built = {}
+    for w in LEVELS_S:
+        parts[w].append(_bucket_stats(carry_t, carry_rtt, w))
+        level = np.concatenate(parts[w])
+        np.save(level_path(run_dir, w), level)
+        built[w] = int(level.size)
+
+    if dropped:
+        print(f"[!] {run_dir}: dropped {dropped} samples >{coarse}s out of order")
+    return built
+
+
+def load_level(run_dir, width_s):
+    path = level_path(run_dir, width_s)
+    if not os.path.isfile(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def pick_level(t_start, t_end, width_px, levels=LEVELS_S):
+    """
+    Finest level whose bucket count over [t_start, t_end] fits the pixel
+    budget (coarsest level if none does).
+    """
+    span = max(t_end - t_start, 0.0)
+    budget = max(int(width_px), 1) * MAX_BUCKETS_PER_PX
+    for w in sorted(levels):
+        if span / w <= budget:
+            return w
+    return max(levels)
+
+
+def pyramid_slice(run_dir, t_start=None, t_end=None, width_px=1200):
+    """
+    Return (width_s, buckets) for the requested range, reading only the
+    chosen level. t_start/t_end default to the full capture.
+    """
+    coarsest = load_level(run_dir, LEVELS_S[-1])
+    if coarsest is None or coarsest.size == 0:
+        return None, None
+    if t_start is None:
+        t_start = float(coarsest["t0"][0])
+    if t_end is None:
+        t_end = float(coarsest["t0"][-1]) + LEVELS_S[-1]
+
+    width_s = pick_level(t_start, t_end, width_px)
+    level = load_level(run_dir, width_s)
+    t0 = level["t0"]
+    i0 = int(np.searchsorted(t0, t_start - width_s, side="left"))
+    i1 = int(np.searchsorted(t0, t_end, side="right"))
+    return width_s, np.asarray(level[i0:i1])
+
+
+def plot_rtt_timeseries(run_dir, ax, t_start=None, t_end=None, width_px=None):
+    """
+    Draw min-max band, p95 and mean RTT over time on `ax`, using the
+    pyramid level that matches the range and the axes pixel width.
+    Gaps longer than one bucket are left blank.
+    """
+    if width_px is None:
+        fig = ax.get_figure()
+        width_px = int(ax.get_position().width * fig.get_figwidth() * fig.dpi)
+
+    width_s, b = pyramid_slice(run_dir, t_start, t_end, width_px)
+    if b is None or b.size == 0:
+        return None
+
+    x = b["t0"].astype("f8")
+    cols = {k: b[k].astype("f8") for k in ("min", "max", "mean", "p95")}
+
+    # Break lines across missing buckets (outages / capture gaps)
+    gap = np.flatnonzero(np.diff(x) > width_s * 1.5) + 1
+    x = np.insert(x, gap, np.nan)
+    for k in cols:
+        cols[k] = np.insert(cols[k], gap, np.nan)
+
+    # matplotlib date numbers are days since the Unix epoch
+    xt = x / 86400.0
+    ax.fill_between(xt, cols["min"], cols["max"], alpha=0.25, linewidth=0, label="min-max")
+    ax.plot(xt, cols["p95"], linewidth=0.8, label="p95")
+    ax.plot(xt, cols["mean"], linewidth=0.8, label="mean")
+    ax.xaxis_date()
+    ax.set_ylabel("RTT (ms)")
+    ax.set_title(f"Gateway RTT ({width_s}s buckets)")
+    ax.grid(True)
+    ax.legend(loc="upper right")
+    return width_s
+
+
+def pyramid_is_stale(run_dir):
+    src = [
+        os.path.join(run_dir, n)
+        for n in SAMPLE_FILES
+        if os.path.isfile(os.path.join(run_dir, n))
+    ]
+    if not src:
+        return False
+    src_mtime = max(os.path.getmtime(p) for p in src)
+    for w in LEVELS_S:
+        p = level_path(run_dir, w)
+        if not os.path.isfile(p) or os.path.getmtime(p) < src_mtime:
+            return True
+    return False
+
+
+def main():
+    if len(sys.argv) not in (2, 3, 4):
+        print(f"Usage: {sys.argv[0]} <run_dir> [out.png] [width_px]", file=sys.stderr)
+        sys.exit(1)
+
+    run_dir = sys.argv[1]
+    if pyramid_is_stale(run_dir):
+        built = build_pyramid(run_dir)
+        print(f"[*] Built RTT pyramid in {run_dir}: {built}")
+
+    if len(sys.argv) >= 3:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        width_px = int(sys.argv[3]) if len(sys.argv) == 4 else None
+        fig, ax = plt.subplots(figsize=(12, 4))
+        width_s = plot_rtt_timeseries(run_dir, ax, width_px=width_px)
+        if width_s is None:
+            print(f"[!] No RTT pyramid for {run_dir}")
+            plt.close(fig)
+            return
+        fig.autofmt_xdate()
+        fig.tight_layout()
+        fig.savefig(sys.argv[2], dpi=100)
+        plt.close(fig)
+        print(f"[*] Saved {sys.argv[2]} ({width_s}s level)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Append-only, time-partitioned store of every gateway RTT sample.
+
+Each run keeps its own gw_ping_samples.csv (results_starlink) or
+gateway_ping_samples.csv (results_gateway), so a cross-run time query
+("all gateway RTT between 18:00 and 22:00 last month") used to mean
+opening thousands of files. This store ingests them once into
+~/analysis/rtt_store/:
+
+  part=<YYYY-MM-DD>[T<HH>]/c<chunk_id>.{t,rtt,run}.npy
+      columnar chunks: t (epoch s, f8, sorted), rtt_ms (f4) and the
+      run key (u4) of every sample; one partition per UTC day (or hour,
+      chosen when the store is created)
+  index.sqlite
+      rtt_chunks      chunk_id, part, t_min, t_max, n
+      rtt_chunk_runs  chunk_id, run_key, n, t_min, t_max (run-id tags)
+      rtt_runs        run_key, kind, run_id, source size/mtime, t range
+
+Chunks are written once and never modified: an ingest batch appends one
+chunk per partition it touches, and when a partition collects more than
+MAX_CHUNKS_PER_PART chunks they are merged into one new chunk and the
+old files unlinked (readers holding a memmap keep a valid view). A run
+whose sample file changed is re-ingested the same way: the chunks that
+held it are rewritten without it first.
+
+scan() looks up the chunks overlapping [t_start, t_end) in the index,
+skips those without the requested runs, memory-maps only the columns it
+needs and streams (t, rtt_ms, run_key) arrays of at most batch_rows
+samples, so memory is bounded by one batch whatever the range. Batches
+are time-ordered within a chunk, not across chunks.
+
+Sample times come from timestamp_epoch when the CSV has it, else from
+run_metadata.txt (start_ts / timestamp_utc) + (seq - 1) * the ping
+interval (from `ping -D` timestamps in the raw log, else 1 s), as in
+rtt_pyramid.py. Runs with neither are skipped (with a warning) rather
+than stored at 1970. analyze_starlink_run.py and analyze_gateway_ping.py call
+safe_ingest_run() after each run.
+
+Usage:
+  python3 rtt_store.py ingest [--partition day|hour] [--kind active|gateway]
+  python3 rtt_store.py scan --start 2026-09-01 --end 2026-10-01
+                            [--tod 18-22 --utc-offset 2] [--kind gateway]
+                            [--run RUN_ID ...]
+  python3 rtt_store.py info
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from ping_gaps import estimate_interval, parse_ping_log
+from rtt_pyramid import _read_meta, _start_epoch, iter_sample_chunks
+
+BASE_DIR = Path.home() / "analysis"
+STORE_DIR = BASE_DIR / "rtt_store"
+
+# (results dir, samples CSV, raw ping log) per catalog kind
+SOURCES = {
+    "active": (BASE_DIR / "results_starlink", "gw_ping_samples.csv", "ping_gw_raw.log"),
+    "gateway": (BASE_DIR / "results_gateway", "gateway_ping_samples.csv", "ping_gateway_raw.log"),
+}
+
+PARTITIONS = {"day": 86400, "hour": 3600}
+# Staged samples are flushed to chunks past this many rows
+FLUSH_ROWS = 1 << 21
+MAX_CHUNKS_PER_PART = 8
+BATCH_ROWS = 1 << 16
+
+COLUMNS = {"t": np.float64, "rtt": np.float32, "run": np.uint32}
+
+# Histogram for scan statistics: 0.1 ms bins, everything above is clipped
+HIST_BIN_MS = 0.1
+HIST_MAX_MS = 10000.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rtt_store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS rtt_runs (
+    run_key        INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind           TEXT NOT NULL,
+    run_id         TEXT NOT NULL,
+    src_size       INTEGER,
+    src_mtime_ns   INTEGER,
+    n              INTEGER,
+    t_min          REAL,
+    t_max          REAL,
+    ingested_epoch REAL,
+    UNIQUE (kind, run_id)
+);
+CREATE TABLE IF NOT EXISTS rtt_chunks (
+    chunk_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    part          TEXT NOT NULL,
+    t_min         REAL NOT NULL,
+    t_max         REAL NOT NULL,
+    n             INTEGER NOT NULL,
+    created_epoch REAL
+);
+CREATE INDEX IF NOT EXISTS idx_rtt_chunks_t ON rtt_chunks (t_min, t_max);
+CREATE INDEX IF NOT EXISTS idx_rtt_chunks_part ON rtt_chunks (part);
+CREATE TABLE IF NOT EXISTS rtt_chunk_runs (
+    chunk_id INTEGER NOT NULL,
+    run_key  INTEGER NOT NULL,
+    n        INTEGER NOT NULL,
+    t_min    REAL,
+    t_max    REAL,
+    PRIMARY KEY (chunk_id, run_key)
+);
+CREATE INDEX IF NOT EXISTS idx_rtt_chunk_runs_run ON rtt_chunk_runs (run_key);
+"""
+
+
+def connect(store_dir=STORE_DIR, partition=None):
+    """
+    Open (and create if needed) the store index in WAL mode. The
+    partition width is fixed by the first open (default: day).
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # Autocommit; multi-statement updates use explicit BEGIN IMMEDIATE
+    conn = sqlite3.connect(str(store_dir / "index.sqlite"), timeout=30.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    conn.execute(
+        "INSERT OR IGNORE INTO rtt_store_meta (key, value) VALUES ('partition', ?)",
+        (partition or "day",),
+    )
+    stored = partition_of(conn)
+    if partition and partition != stored:
+        conn.close()
+        raise ValueError(f"store {store_dir} is partitioned by {stored}, not {partition}")
+    return conn
+
+
+def partition_of(conn):
+    return conn.execute("SELECT value FROM rtt_store_meta WHERE key = 'partition'").fetchone()[0]
+
+
+def part_name(part_idx, width_s):
+    dt = datetime.fromtimestamp(int(part_idx) * width_s, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%d") if width_s == 86400 else dt.strftime("%Y-%m-%dT%H")
+
+
+def chunk_paths(store_dir, part, chunk_id):
+    d = Path(store_dir) / f"part={part}"
+    return {c: d / f"c{chunk_id}.{c}.npy" for c in COLUMNS}
+
+
+def _load_chunk(store_dir, part, chunk_id, cols=COLUMNS, mmap=True):
+    paths = chunk_paths(store_dir, part, chunk_id)
+    return {c: np.load(paths[c], mmap_mode="r" if mmap else None) for c in cols}
+
+
+def _write_chunk(conn, store_dir, part, t, rtt, run):
+    """
+    Sort one partition's samples by time, write them as a new chunk and
+    index it. Runs inside the caller's transaction; returns chunk_id.
+    """
+    order = np.argsort(t, kind="stable")
+    arrays = {
+        "t": t[order].astype(np.float64),
+        "rtt": rtt[order].astype(np.float32),
+        "run": run[order].astype(np.uint32),
+    }
+    cur = conn.execute(
+        "INSERT INTO rtt_chunks (part, t_min, t_max, n, created_epoch) VALUES (?, ?, ?, ?, ?)",
+        (part, float(arrays["t"][0]), float(arrays["t"][-1]), int(t.size), time.time()),
+    )
+    chunk_id = cur.lastrowid
+    paths = chunk_paths(store_dir, part, chunk_id)
+    paths["t"].parent.mkdir(parents=True, exist_ok=True)
+    for c, path in paths.items():
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arrays[c])
+        os.replace(tmp, path)
+
+    # Run-id tags: a stable sort by run keeps each run's times sorted
+    by_run = np.argsort(arrays["run"], kind="stable")
+    r = arrays["run"][by_run]
+    tr = arrays["t"][by_run]
+    starts = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+    ends = np.r_[starts[1:], r.size]
+    conn.executemany(
+        "INSERT INTO rtt_chunk_runs (chunk_id, run_key, n, t_min, t_max) VALUES (?, ?, ?, ?, ?)",
+        [
+            (chunk_id, int(r[a]), int(b - a), float(tr[a]), float(tr[b - 1]))
+            for a, b in zip(starts.tolist(), ends.tolist())
+        ],
+    )
+    return chunk_id
+
+
+def _drop_chunks(conn, chunk_ids):
+    """
+    Remove chunks from the index (caller's transaction); returns their
+    file paths for unlinking after commit.
+    """
+    paths = []
+    for cid in chunk_ids:
+        row = conn.execute("SELECT part FROM rtt_chunks WHERE chunk_id = ?", (cid,)).fetchone()
+        if row is None:
+            continue
+        paths.extend(chunk_paths(_store_dir(conn), row[0], cid).values())
+        conn.execute("DELETE FROM rtt_chunks WHERE chunk_id = ?", (cid,))
+        conn.execute("DELETE FROM rtt_chunk_runs WHERE chunk_id = ?", (cid,))
+    return paths
+
+
+def _store_dir(conn):
+    return Path(conn.execute("PRAGMA database_list").fetchone()[2]).parent
+
+
+def _unlink(paths):
+    for p in paths:
+        try:
+            os.unlink(p)
+        except FileNotFoundError:
+            pass
+
+
+def _rewrite_part(conn, part, chunk_ids, drop_run=None):
+    """
+    Replace chunk_ids of one partition with a single merged chunk,
+    optionally without the samples of run drop_run.
+    """
+    store_dir = _store_dir(conn)
+    parts = [_load_chunk(store_dir, part, cid, mmap=False) for cid in chunk_ids]
+    t = np.concatenate([p["t"] for p in parts])
+    rtt = np.concatenate([p["rtt"] for p in parts])
+    run = np.concatenate([p["run"] for p in parts])
+    if drop_run is not None:
+        keep = run != drop_run
+        t, rtt, run = t[keep], rtt[keep], run[keep]
+    old = _drop_chunks(conn, chunk_ids)
+    if t.size:
+        _write_chunk(conn, store_dir, part, t, rtt, run)
+    return old
+
+
+def compact(conn, parts=None, max_chunks=MAX_CHUNKS_PER_PART):
+    """
+    Merge the chunks of every partition (or of `parts`) holding more than
+    max_chunks of them. Returns the number of partitions merged.
+    """
+    sql = "SELECT part, group_concat(chunk_id) FROM rtt_chunks"
+    args = []
+    if parts is not None:
+        parts = sorted(parts)
+        if not parts:
+            return 0
+        sql += f" WHERE part IN ({', '.join('?' for _ in parts)})"
+        args = parts
+    sql += " GROUP BY part HAVING count(*) > ?"
+    merged = 0
+    for part, ids in conn.execute(sql, args + [max_chunks]).fetchall():
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [int(i) for i in ids.split(",")]
+            # Another process may have merged this partition meanwhile
+            live = conn.execute(
+                f"SELECT count(*) FROM rtt_chunks WHERE chunk_id IN ({', '.join('?' for _ in ids)})", ids
+            ).fetchone()[0]
+            if live != len(ids):
+                conn.rollback()
+                continue
+            old = _rewrite_part(conn, part, ids)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        _unlink(old)
+        merged += 1
+    return merged
+
+
+def _drop_run(conn, run_key):
+    """
+    Rewrite every chunk holding run_key without it (re-ingest of a run
+    whose samples changed).
+    """
+    rows = conn.execute(
+        "SELECT c.part, c.chunk_id FROM rtt_chunk_runs r JOIN rtt_chunks c USING (chunk_id) "
+        "WHERE r.run_key = ?",
+        (run_key,),
+    ).fetchall()
+    by_part = {}
+    for part, cid in rows:
+        by_part.setdefault(part, []).append(cid)
+    old = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for part, ids in by_part.items():
+            old += _rewrite_part(conn, part, ids, drop_run=run_key)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    _unlink(old)
+
+
+def _csv_header(path):
+    with open(path, "r", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def _run_samples(run_dir, samples_name, raw_name, start_ts):
+    """
+    Yield (t, rtt) chunks for one run (see module docstring for times).
+    """
+    samples_csv = os.path.join(run_dir, samples_name)
+    interval_s = 1.0
+    raw = os.path.join(run_dir, raw_name)
+    if os.path.isfile(raw):
+        parsed = parse_ping_log(raw)
+        interval_s = estimate_interval(parsed["seq"], parsed["ts"])
+    yield from iter_sample_chunks(samples_csv, start_ts, interval_s)
+
+
+class _Stager:
+    """
+    Samples of the current ingest batch, grouped by partition index.
+    """
+
+    def __init__(self, conn, width_s):
+        self.conn = conn
+        self.width_s = width_s
+        self.parts = {}
+        self.rows = 0
+        self.touched = set()
+        # rtt_runs updates committed with the chunks holding the samples
+        self.done_runs = []
+
+    def add(self, t, rtt, run_key):
+        idx = np.floor(t / self.width_s).astype(np.int64)
+        order = np.argsort(idx, kind="stable")
+        idx, t, rtt = idx[order], t[order], rtt[order]
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        ends = np.r_[starts[1:], idx.size]
+        for s, e in zip(starts.tolist(), ends.tolist()):
+            self.parts.setdefault(int(idx[s]), []).append(
+                (t[s:e], rtt[s:e], np.full(e - s, run_key, dtype=np.uint32))
+            )
+        self.rows += t.size
+        if self.rows >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.parts and not self.done_runs:
+            return
+        store_dir = _store_dir(self.conn)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for idx, pieces in sorted(self.parts.items()):
+                part = part_name(idx, self.width_s)
+                _write_chunk(
+                    self.conn,
+                    store_dir,
+                    part,
+                    np.concatenate([p[0] for p in pieces]),
+                    np.concatenate([p[1] for p in pieces]),
+                    np.concatenate([p[2] for p in pieces]),
+                )
+                self.touched.add(part)
+            self.conn.executemany(
+                "UPDATE rtt_runs SET src_size = ?, src_mtime_ns = ?, n = ?, t_min = ?, t_max = ?, "
+                "ingested_epoch = ? WHERE run_key = ?",
+                self.done_runs,
+            )
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.parts = {}
+        self.rows = 0
+        self.done_runs = []
+
+
+def ingest_runs(run_dirs, kind, conn):
+    """
+    Ingest the samples of run_dirs (one kind) in one batch. Runs already
+    in the store with an unchanged samples file are skipped. A run only
+    counts as ingested (src_size/src_mtime_ns set) in the transaction
+    that writes its last samples, so an interrupted ingest is redone.
+    Returns (runs ingested, samples ingested).
+    """
+    _, samples_name, raw_name = SOURCES[kind]
+    stager = _Stager(conn, PARTITIONS[partition_of(conn)])
+    n_runs = n_samples = 0
+    for run_dir in run_dirs:
+        run_dir = Path(run_dir)
+        src = run_dir / samples_name
+        if not src.is_file():
+            continue
+        st = src.stat()
+        run_id = run_dir.name
+        header = _csv_header(src)
+        if "rtt_ms" not in header:
+            print(f"[!] RTT store: skipping {run_id} (no rtt_ms column in {samples_name})")
+            continue
+        start_ts = _start_epoch(_read_meta(run_dir))
+        if start_ts is None and "timestamp_epoch" not in header:
+            print(f"[!] RTT store: skipping {run_id} (no timestamp_epoch and no start time in metadata)")
+            continue
+        row = conn.execute(
+            "SELECT run_key, src_size, src_mtime_ns FROM rtt_runs WHERE kind = ? AND run_id = ?",
+            (kind, run_id),
+        ).fetchone()
+        if row is not None:
+            if (row[1], row[2]) == (st.st_size, st.st_mtime_ns):
+                continue
+            _drop_run(conn, row[0])
+            run_key = row[0]
+        else:
+            cur = conn.execute(
+                "INSERT INTO rtt_runs (kind, run_id) VALUES (?, ?)", (kind, run_id)
+            )
+            run_key = cur.lastrowid
+
+        n, t_min, t_max = 0, None, None
+        for t, rtt in _run_samples(run_dir, samples_name, raw_name, start_ts):
+            ok = np.isfinite(t) & np.isfinite(rtt)
+            t, rtt = t[ok], rtt[ok]
+            if t.size == 0:
+                continue
+            stager.add(t, rtt, run_key)
+            n += t.size
+            t_min = float(t.min()) if t_min is None else min(t_min, float(t.min()))
+            t_max = float(t.max()) if t_max is None else max(t_max, float(t.max()))
+        stager.done_runs.append((st.st_size, st.st_mtime_ns, n, t_min, t_max, time.time(), run_key))
+        n_runs += 1
+        n_samples += n
+    stager.flush()
+    compact(conn, stager.touched)
+    return n_runs, n_samples
+
+
+def ingest(kinds=tuple(SOURCES), store_dir=STORE_DIR, partition=None):
+    """
+    Ingest every new or changed run under the results directories.
+    """
+    conn = connect(store_dir, partition)
+    try:
+        total = (0, 0)
+        for kind in kinds:
+            root = SOURCES[kind][0]
+            if not root.is_dir():
+                continue
+            dirs = sorted(p for p in root.iterdir() if p.is_dir())
+            r, s = ingest_runs(dirs, kind, conn)
+            total = (total[0] + r, total[1] + s)
+        return total
+    finally:
+        conn.close()
+
+
+def safe_ingest_run(run_dir, kind, store_dir=STORE_DIR):
+    """
+    ingest_runs() for analyzers: a store problem must never fail a run.
+    """
+    try:
+        conn = connect(store_dir)
+        try:
+            return ingest_runs([run_dir], kind, conn)
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        print(f"[!] RTT store ingest failed ({run_dir}): {e}")
+        return (0, 0)
+
+
+def run_keys(conn, run_ids=None, kinds=None):
+    """
+    {run_key: (kind, run_id)} for the selected runs (all by default).
+    """
+    sql = "SELECT run_key, kind, run_id FROM rtt_runs WHERE 1 = 1"
+    args = []
+    if run_ids:
+        sql += f" AND run_id IN ({', '.join('?' for _ in run_ids)})"
+        args += list(run_ids)
+    if kinds:
+        sql += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+        args += list(kinds)
+    return {k: (kind, rid) for k, kind, rid in conn.execute(sql, args)}
+
+
+def _tod_mask(t, tod_hours, utc_offset_h):
+    """
+    Samples whose local hour-of-day (UTC + offset) is in [h0, h1); the
+    window may wrap midnight (22-2).
+    """
+    h0, h1 = tod_hours
+    sec = np.mod(t + utc_offset_h * 3600.0, 86400.0)
+    lo, hi = h0 * 3600.0, h1 * 3600.0
+    if lo <= hi:
+        return (sec >= lo) & (sec < hi)
+    return (sec >= lo) | (sec < hi)
+
+
+def scan(t_start, t_end, run_ids=None, kinds=None, tod_hours=None, utc_offset_h=0,
+         batch_rows=BATCH_ROWS, store_dir=STORE_DIR):
+    """
+    Stream (t, rtt_ms, run_key) arrays for samples in [t_start, t_end),
+    optionally restricted to runs (ids), kinds and a time-of-day window.
+    Only chunks overlapping the range (and holding a selected run) are
+    opened; each yielded batch has at most batch_rows samples.
+    """
+    conn = connect(store_dir)
+    try:
+        keys = None
+        if run_ids or kinds:
+            keys = np.fromiter(run_keys(conn, run_ids, kinds), dtype=np.uint32)
+            if keys.size == 0:
+                return
+        sql = "SELECT chunk_id, part FROM rtt_chunks c WHERE t_max >= ? AND t_min < ?"
+        args = [t_start, t_end]
+        if keys is not None:
+            sql += (
+                " AND EXISTS (SELECT 1 FROM rtt_chunk_runs r WHERE r.chunk_id = c.chunk_id"
+                f" AND r.run_key IN ({', '.join('?' for _ in keys)})"
+                " AND r.t_max >= ? AND r.t_min < ?)"
+            )
+            args += keys.tolist() + [t_start, t_end]
+        chunks = conn.execute(sql + " ORDER BY t_min, chunk_id", args).fetchall()
+    finally:
+        conn.close()
+
+    for chunk_id, part in chunks:
+        try:
+            cols = _load_chunk(store_dir, part, chunk_id)
+        except FileNotFoundError:
+            # Merged away by a concurrent compaction after the lookup
+            continue
+        t = cols["t"]
+        i0 = int(np.searchsorted(t, t_start, side="left"))
+        i1 = int(np.searchsorted(t, t_end, side="left"))
+        for s in range(i0, i1, batch_rows):
+            e = min(s + batch_rows, i1)
+            bt = np.asarray(t[s:e])
+            brtt = np.asarray(cols["rtt"][s:e])
+            brun = np.asarray(cols["run"][s:e])
+            mask = None
+            if keys is not None:
+                mask = np.isin(brun, keys)
+            if tod_hours is not None:
+                m = _tod_mask(bt, tod_hours, utc_offset_h)
+                mask = m if mask is None else mask & m
+            if mask is not None:
+                bt, brtt, brun = bt[mask], brtt[mask], brun[mask]
+            if bt.size:
+                yield bt, brtt, brun
+
+
+def scan_stats(batches, percentiles=(50, 95, 99)):
+    """
+    count/min/mean/max and histogram percentiles (HIST_BIN_MS resolution)
+    over a scan, in constant memory.
+    """
+    n_bins = int(HIST_MAX_MS / HIST_BIN_MS) + 1
+    hist = np.zeros(n_bins, dtype=np.int64)
+    n, total, lo, hi = 0, 0.0, np.inf, -np.inf
+    runs = set()
+    for _, rtt, run in batches:
+        n += rtt.size
+        total += float(rtt.sum(dtype=np.float64))
+        lo = min(lo, float(rtt.min()))
+        hi = max(hi, float(rtt.max()))
+        hist += np.bincount(
+            np.clip((rtt / HIST_BIN_MS).astype(np.int64), 0, n_bins - 1), minlength=n_bins
+        )
+        runs.update(np.unique(run).tolist())
+    out = {"n": n, "runs": len(runs)}
+    if n == 0:
+        return out
+    out.update({"min_ms": lo, "mean_ms": total / n, "max_ms": hi})
+    cdf = np.cumsum(hist)
+    for p in percentiles:
+        b = int(np.searchsorted(cdf, p / 100.0 * n, side="left"))
+        out[f"p{p}_ms"] = (b + 0.5) * HIST_BIN_MS
+    return out
+
+
+def _parse_time(s):
+    """
+    Epoch seconds, or an ISO date/datetime (UTC unless it has an offset).
+    """
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time-partitioned store of all gateway RTT samples")
+    ap.add_argument("--store", default=str(STORE_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ingest", help="ingest new or changed runs")
+    p.add_argument("--partition", choices=sorted(PARTITIONS), help="only when creating the store")
+    p.add_argument("--kind", choices=sorted(SOURCES), action="append")
+    p = sub.add_parser("scan", help="statistics over a time range")
+    p.add_argument("--start", required=True, help="epoch or ISO date/time (UTC)")
+    p.add_argument("--end", required=True)
+    p.add_argument("--kind", choices=sorted(SOURCES), action="append")
+    p.add_argument("--run", action="append", help="run id (repeatable)")
+    p.add_argument("--tod", help="hour-of-day window H0-H1, e.g. 18-22")
+    p.add_argument("--utc-offset", type=int, default=0, help="whole hours added to UTC for --tod")
+    sub.add_parser("info", help="partitions, chunks and runs in the store")
+    sub.add_parser("compact", help="merge partitions with too many chunks")
+    args = ap.parse_args()
+    store_dir = Path(args.store)
+
+    if args.cmd == "ingest":
+        t0 = time.perf_counter()
+        try:
+            runs, samples = ingest(args.kind or tuple(SOURCES), store_dir, args.partition)
+        except ValueError as e:
+            print(f"[!] {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"[*] Ingested {runs} runs, {samples} samples ({time.perf_counter() - t0:.1f} s)")
+        return
+
+    if args.cmd == "compact":
+        conn = connect(store_dir)
+        n = compact(conn)
+        conn.close()
+        print(f"[*] Merged {n} partitions")
+        return
+
+    if args.cmd == "info":
+        conn = connect(store_dir)
+        n_parts, n_chunks, n = conn.execute(
+            "SELECT count(DISTINCT part), count(*), coalesce(sum(n), 0) FROM rtt_chunks"
+        ).fetchone()
+        t_min, t_max = conn.execute("SELECT min(t_min), max(t_max) FROM rtt_chunks").fetchone()
+        print(f"partition={partition_of(conn)} partitions={n_parts} chunks={n_chunks} samples={n}")
+        for kind, runs in conn.execute("SELECT kind, count(*) FROM rtt_runs GROUP BY kind"):
+            print(f"runs_{kind}={runs}")
+        if t_min is not None:
+            fmt = "%Y-%m-%dT%H:%M:%SZ"
+            print(
+                f"range={datetime.fromtimestamp(t_min, tz=timezone.utc).strftime(fmt)}"
+                f"..{datetime.fromtimestamp(t_max, tz=timezone.utc).strftime(fmt)}"
+            )
+        conn.close()
+        return
+
+    tod = None
+    if args.tod:
+        h0, _, h1 = args.tod.partition("-")
+        tod = (int(h0), int(h1))
+    t0 = time.perf_counter()
+    stats = scan_stats(
+        scan(_parse_time(args.start), _parse_time(args.end), args.run, args.kind, tod, args.utc_offset,
+             store_dir=store_dir)
+    )
+    for k, v in stats.items():
+        print(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}")
+    print(f"[{(time.perf_counter() - t0) * 1000:.1f} ms]")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,28 @@
 #!/usr/bin/env python3
-import csv
-import os
 from collections import defaultdict
 from datetime import datetime, timezone
 from pathlib import Path
 
+from metrics_export import count_pending_runs, set_queue_depth, stage_timer
+from metrics_union import UnionTable
+
 BASE_DIR = Path.home() / "analysis"
 RESULTS_DIR = BASE_DIR / "results_starlink"
 OUT_ALL = BASE_DIR / "all_starlink_runs.csv"
+OUT_COVERAGE = BASE_DIR / "all_starlink_runs_coverage.csv"
 
 
 def load_all_runs():
-    rows = []
-    header = None
+    """
+    Merge every results_starlink/*/metrics_run.csv into one UnionTable.
+    Runs written by older analyzer versions are null-filled for columns
+    they don't have, instead of being skipped.
+    """
+    table = UnionTable()
 
     if not RESULTS_DIR.exists():
         print(f"[!] Results dir not found: {RESULTS_DIR}")
-        return header, rows
+        return table
 
     for run_dir in sorted(RESULTS_DIR.iterdir()):
         if not run_dir.is_dir():
@@ -24,38 +30,21 @@ def load_all_runs():
         metrics_file = run_dir / "metrics_run.csv"
         if not metrics_file.exists():
             continue
+        table.add_csv(metrics_file)
 
-        with metrics_file.open("r", newline="") as f:
-            reader = csv.reader(f)
-            this_header = next(reader, None)
-            this_row = next(reader, None)
-
-        if this_header is None or this_row is None:
-            continue
-
-        if header is None:
-            header = this_header
-        else:
-            # basic sanity: same header?
-            if this_header != header:
-                print(f"[!] Header mismatch in {metrics_file}, skipping")
-                continue
-
-        rows.append(this_row)
+    return table
 
-    return header, rows
 
-
-def write_all_csv(header, rows):
-    if header is None:
+def write_all_csv(table):
+    if table.n_rows == 0:
         print("[!] No runs found, nothing to write.")
         return
 
-    with OUT_ALL.open("w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(rows)
-    print(f"[*] Wrote {len(rows)} rows to {OUT_ALL}")
+    table.write_csv(OUT_ALL)
+    table.write_coverage_csv(OUT_COVERAGE)
+    print(
+        f"[*] Wrote {table.n_rows} rows x {len(table.columns)} columns to {OUT_ALL}"
+    )
 
 
 def float_or_none(x):
@@ -65,19 +54,27 @@ def float_or_none(x):
         return None
 
 
-def summarize_by_key(header, rows):
-    # Map header -> index
-    idx = {name: i for i, name in enumerate(header)}
+def summarize_by_key(table):
+    # Group row indices by (proto, port, tos, mode)
+    cols = {
+        c: table.column(c)
+        for c in (
+            "proto",
+            "port",
+            "tos",
+            "mode",
+            "iperf_avg_throughput_Mbps",
+            "gw_rtt_avg_ms",
+        )
+    }
+
+    def key_str(v):
+        return "" if v is None else str(v)
 
-    # Group by (proto, port, tos, mode)
     groups = defaultdict(list)
-    for r in rows:
-        proto = r[idx["proto"]]
-        port = r[idx["port"]]
-        tos = r[idx["tos"]]
-        mode = r[idx["mode"]]
-        key = (proto, port, tos, mode)
-        groups[key].append(r)
+    for i in range(table.n_rows):
+        key = tuple(key_str(cols[c][i]) for c in ("proto", "port", "tos", "mode"))
+        groups[key].append(i)
 
     print("\n=== Aggregate summary by (proto, port, tos, mode) ===")
     print(
@@ -88,9 +85,9 @@ def summarize_by_key(header, rows):
     for key, rs in sorted(groups.items()):
         thr_vals = []
         rtt_vals = []
-        for r in rs:
-            thr = float_or_none(r[idx["iperf_avg_throughput_Mbps"]])
-            rtt = float_or_none(r[idx["gw_rtt_avg_ms"]])
+        for i in rs:
+            thr = float_or_none(cols["iperf_avg_throughput_Mbps"][i])
+            rtt = float_or_none(cols["gw_rtt_avg_ms"][i])
             if thr is not None:
                 thr_vals.append(thr)
             if rtt is not None:
@@ -127,9 +124,12 @@ def summarize_by_key(header, rows):
 
 if __name__ == "__main__":
     print(f"[*] Aggregating results under: {RESULTS_DIR}")
-    header, rows = load_all_runs()
-    write_all_csv(header, rows)
-    summarize_by_key(header, rows)
+    with stage_timer("summarize_starlink_metrics"):
+        table = load_all_runs()
+        write_all_csv(table)
+        table.print_coverage(only_partial=True)
+        summarize_by_key(table)
+    set_queue_depth("unanalyzed_runs", count_pending_runs(BASE_DIR))
 
     now = datetime.now(timezone.utc).isoformat()
     print(f"[*] Summary done at {now}")
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Time-of-day OLAP cube over the results catalog.
+
+"How does RTT/throughput vary by hour-of-day and weekday per
+mode/port/DSCP?" used to mean re-grouping all_starlink_runs.csv and the
+gateway metrics from scratch. This module keeps a materialized cube in
+the catalog database (results_catalog.sqlite):
+
+  tod_cube(kind, weekday, hour, tech, plan, mode, proto, port, dscp,
+           n_runs, <metric>_n/_sum/_sumsq/_min/_max for CUBE_METRICS)
+
+weekday is 0=Monday, hour is 0-23, both UTC (run ids are UTC, see
+client/common.sh); --utc-offset shifts the 168-hour week for local-time
+views. Missing keys are stored as '' / -1 so every cell has one row.
+
+Every cell holds mergeable aggregates (count, sum, sum of squares, min,
+max), so any slice or roll-up is a SUM/MIN/MAX over at most
+168 x scenarios rows, and a heatmap is one GROUP BY (milliseconds).
+
+Maintenance is incremental: tod_members mirrors the catalog rows already
+in the cube (kind, run_id -> cell, metric values). refresh() takes the
+catalog rows with updated_epoch past the stored watermark, replaces
+their member rows and recomputes only the cells they left or entered.
+results_catalog.safe_upsert() calls refresh() after every analyzer
+upsert, so the cube follows new metrics_run.csv / metrics_gateway.csv /
+QoE rows without a rebuild.
+
+Usage:
+  python3 tod_cube.py refresh | rebuild
+  python3 tod_cube.py query --metric rtt_p95_ms --by hour --mode vpn [--stat mean]
+  python3 tod_cube.py heatmap --metric throughput_mbps --kind active --port 443 [--out x.png]
+"""
+
+import argparse
+import math
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from results_catalog import CATALOG_DB, KINDS, connect
+
+CUBE_DIMS = ["kind", "weekday", "hour", "tech", "plan", "mode", "proto", "port", "dscp"]
+SCENARIO_DIMS = ["tech", "plan", "mode", "proto", "port", "dscp"]
+_INT_DIMS = {"weekday", "hour", "port", "dscp"}
+
+CUBE_METRICS = [
+    "throughput_mbps",
+    "rtt_p50_ms",
+    "rtt_p95_ms",
+    "rtt_p99_ms",
+    "loss_pct",
+    "jitter_ms",
+    "time_total_s",
+]
+STATS = ("count", "mean", "std", "min", "max")
+
+# SQLite expressions mapping a catalog row to its cell
+_DIM_EXPR = {
+    "kind": "kind",
+    "weekday": "(CAST(strftime('%w', ts_epoch, 'unixepoch') AS INTEGER) + 6) % 7",
+    "hour": "CAST(strftime('%H', ts_epoch, 'unixepoch') AS INTEGER)",
+    "tech": "COALESCE(tech, '')",
+    "plan": "COALESCE(plan, '')",
+    "mode": "COALESCE(mode, '')",
+    "proto": "COALESCE(proto, '')",
+    "port": "COALESCE(port, -1)",
+    "dscp": "COALESCE(dscp, -1)",
+}
+
+
+# Rows written by a concurrent analyzer can commit with an updated_epoch
+# slightly below the watermark; re-applying rows is idempotent
+WATERMARK_SLACK_S = 5.0
+
+
+def _dim_cols(dims):
+    return ", ".join(f"{d} {'INTEGER' if d in _INT_DIMS else 'TEXT'} NOT NULL" for d in dims)
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tod_members (
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    {_dim_cols(CUBE_DIMS[1:])},
+    {", ".join(f"{m} REAL" for m in CUBE_METRICS)},
+    PRIMARY KEY (kind, run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tod_members_cell ON tod_members ({", ".join(CUBE_DIMS)});
+CREATE TABLE IF NOT EXISTS tod_cube (
+    {_dim_cols(CUBE_DIMS)},
+    n_runs INTEGER NOT NULL,
+    {", ".join(f"{m}_n INTEGER, {m}_sum REAL, {m}_sumsq REAL, {m}_min REAL, {m}_max REAL" for m in CUBE_METRICS)},
+    PRIMARY KEY ({", ".join(CUBE_DIMS)})
+);
+CREATE TABLE IF NOT EXISTS tod_state (key TEXT PRIMARY KEY, value REAL);
+CREATE INDEX IF NOT EXISTS idx_runs_updated ON runs (updated_epoch);
+"""
+
+_CELL_AGG = ", ".join(
+    f"COUNT({m}), SUM({m}), SUM({m} * {m}), MIN({m}), MAX({m})" for m in CUBE_METRICS
+)
+_CELL_MATCH = " AND ".join(f"m.{d} = a.{d}" for d in CUBE_DIMS)
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def _watermark(conn):
+    row = conn.execute("SELECT value FROM tod_state WHERE key = 'watermark'").fetchone()
+    return row[0] if row else None
+
+
+def refresh(db_path=CATALOG_DB, full=False):
+    """
+    Bring the cube up to date with the catalog. Returns the number of
+    catalog rows (re)applied.
+    """
+    conn = connect(db_path)
+    try:
+        ensure_schema(conn)
+        with conn:
+            wm = None if full else _watermark(conn)
+            if full:
+                conn.execute("DELETE FROM tod_members")
+                conn.execute("DELETE FROM tod_cube")
+            where = "ts_epoch IS NOT NULL"
+            args = []
+            if wm is not None:
+                where += " AND updated_epoch > ?"
+                args.append(wm - WATERMARK_SLACK_S)
+            changed = conn.execute(
+                f"SELECT kind, run_id, {', '.join(_DIM_EXPR[d] for d in CUBE_DIMS[1:])}, "
+                f"{', '.join(CUBE_METRICS)}, updated_epoch FROM runs WHERE {where}",
+                args,
+            ).fetchall()
+            if not changed:
+                return 0
+            # An active run always has a mode and port; without them it lands
+            # in the ''/-1 cell and drops out of every per-scenario view
+            i_mode, i_port = CUBE_DIMS.index("mode") + 1, CUBE_DIMS.index("port") + 1
+            unkeyed = [r[1] for r in changed if r[0] == "active" and (r[i_mode] == "" or r[i_port] == -1)]
+            if unkeyed:
+                print(
+                    f"[!] Time-of-day cube: {len(unkeyed)} active run(s) without mode/port "
+                    f"(e.g. {unkeyed[0]}); re-ingest the catalog"
+                )
+
+            n_dims = len(CUBE_DIMS)
+            conn.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS tod_affected AS "
+                f"SELECT {', '.join(CUBE_DIMS)} FROM tod_cube WHERE 0"
+            )
+            conn.execute("DELETE FROM tod_affected")
+
+            # Cells the changed runs leave ...
+            conn.executemany(
+                f"INSERT INTO tod_affected SELECT {', '.join(CUBE_DIMS)} FROM tod_members "
+                "WHERE kind = ? AND run_id = ?",
+                [(r[0], r[1]) for r in changed],
+            )
+            member_rows = [tuple(r[:-1]) for r in changed]
+            cols = ["kind", "run_id"] + CUBE_DIMS[1:] + CUBE_METRICS
+            conn.executemany(
+                f"INSERT OR REPLACE INTO tod_members ({', '.join(cols)}) "
+                f"VALUES ({', '.join('?' for _ in cols)})",
+                member_rows,
+            )
+            # ... and the cells they enter
+            conn.executemany(
+                f"INSERT INTO tod_affected VALUES ({', '.join('?' for _ in CUBE_DIMS)})",
+                [(r[0],) + tuple(r[2 : n_dims + 1]) for r in changed],
+            )
+
+            conn.execute(
+                f"DELETE FROM tod_cube WHERE ({', '.join(CUBE_DIMS)}) IN "
+                f"(SELECT {', '.join(CUBE_DIMS)} FROM tod_affected)"
+            )
+            conn.execute(
+                f"INSERT INTO tod_cube SELECT {', '.join('m.' + d for d in CUBE_DIMS)}, COUNT(*), {_CELL_AGG} "
+                f"FROM (SELECT DISTINCT * FROM tod_affected) a JOIN tod_members m ON {_CELL_MATCH} "
+                f"GROUP BY {', '.join('m.' + d for d in CUBE_DIMS)}"
+            )
+            stamps = [r[-1] for r in changed if r[-1] is not None]
+            new_wm = max(stamps + ([wm] if wm is not None else [])) if stamps else wm
+            conn.execute(
+                "INSERT OR REPLACE INTO tod_state (key, value) VALUES ('watermark', ?)", (new_wm,)
+            )
+            return len(changed)
+    finally:
+        conn.close()
+
+
+def safe_refresh(db_path=CATALOG_DB):
+    """
+    refresh() for analyzers: a cube problem must never fail a run.
+    """
+    try:
+        return refresh(db_path)
+    except sqlite3.Error as e:
+        print(f"[!] Time-of-day cube refresh failed ({db_path}): {e}")
+        return 0
+
+
+def _dim_sql(dim, utc_offset_h):
+    """
+    Dimension expression over tod_cube, shifted by a whole-hour offset.
+    """
+    off = int(utc_offset_h or 0)
+    if not off or dim not in ("weekday", "hour"):
+        return dim
+    how = f"((weekday * 24 + hour + {off % 168}) % 168)"
+    return f"({how} / 24)" if dim == "weekday" else f"({how} % 24)"
+
+
+def query(metric, by=(), where=None, db_path=CATALOG_DB, utc_offset_h=0):
+    """
+    Roll the cube up to `by` (dims) for rows matching `where` ({dim: value}).
+    Returns a list of dicts: by-dims + n_runs, count, mean, std, min, max.
+    """
+    if metric not in CUBE_METRICS:
+        raise ValueError(f"Unknown cube metric: {metric} (one of {', '.join(CUBE_METRICS)})")
+    for d in list(by) + list(where or {}):
+        if d not in CUBE_DIMS:
+            raise ValueError(f"Unknown cube dimension: {d}")
+
+    conds = []
+    args = []
+    for d, v in (where or {}).items():
+        conds.append(f"{_dim_sql(d, utc_offset_h)} = ?")
+        args.append(int(v) if d in _INT_DIMS else str(v))
+    by_sql = [_dim_sql(d, utc_offset_h) for d in by]
+    sql = (
+        f"SELECT {''.join(s + ', ' for s in by_sql)}SUM(n_runs), SUM({metric}_n), "
+        f"SUM({metric}_sum), SUM({metric}_sumsq), MIN({metric}_min), MAX({metric}_max) FROM tod_cube"
+    )
+    if conds:
+        sql += " WHERE " + " AND ".join(conds)
+    if by_sql:
+        sql += " GROUP BY " + ", ".join(by_sql) + " ORDER BY " + ", ".join(by_sql)
+
+    conn = connect(db_path)
+    try:
+        ensure_schema(conn)
+        rows = conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+    out = []
+    k = len(by)
+    for r in rows:
+        n_runs, n, s, ss, mn, mx = r[k:]
+        rec = dict(zip(by, r[:k]))
+        rec["n_runs"] = n_runs or 0
+        rec["count"] = n or 0
+        rec["mean"] = s / n if n else None
+        rec["std"] = math.sqrt(max(ss - s * s / n, 0.0) / (n - 1)) if n and n > 1 else (0.0 if n else None)
+        rec["min"] = mn
+        rec["max"] = mx
+        out.append(rec)
+    return out
+
+
+def heatmap(metric, stat="mean", where=None, db_path=CATALOG_DB, utc_offset_h=0):
+    """
+    7 x 24 array (weekday x hour) of `stat`; NaN where there is no data.
+    """
+    grid = np.full((7, 24), np.nan)
+    for r in query(metric, ("weekday", "hour"), where, db_path, utc_offset_h):
+        v = r[stat]
+        if v is not None:
+            grid[r["weekday"], r["hour"]] = v
+    return grid
+
+
+def plot_heatmap(grid, title, out_path):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 3.6))
+    im = ax.imshow(np.ma.masked_invalid(grid), aspect="auto", cmap="viridis")
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+    ax.set_xticks(range(0, 24, 2))
+    ax.set_xlabel("Hour of day")
+    ax.set_title(title)
+    fig.colorbar(im, ax=ax)
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150)
+    plt.close(fig)
+
+
+def _fmt(v):
+    if v is None:
+        return ""
+    return f"{v:.3f}" if isinstance(v, float) else str(v)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time-of-day OLAP cube over the results catalog")
+    ap.add_argument("--db", default=str(CATALOG_DB))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("refresh", help="apply catalog rows changed since the last refresh")
+    sub.add_parser("rebuild", help="recompute the whole cube")
+
+    for name in ("query", "heatmap"):
+        p = sub.add_parser(name)
+        p.add_argument("--metric", default="rtt_p95_ms", choices=CUBE_METRICS)
+        p.add_argument("--kind", choices=KINDS)
+        for d in SCENARIO_DIMS + ["weekday", "hour"]:
+            p.add_argument("--" + d, dest=d)
+        p.add_argument("--utc-offset", type=int, default=0, help="whole hours added to UTC")
+        p.add_argument("--stat", default="mean", choices=STATS)
+        if name == "query":
+            p.add_argument("--by", default="hour", help="comma-separated dims (e.g. hour,mode)")
+        else:
+            p.add_argument("--out", help="write a PNG instead of printing the grid")
+
+    args = ap.parse_args()
+    db_path = Path(args.db)
+
+    if args.cmd in ("refresh", "rebuild"):
+        t0 = time.perf_counter()
+        n = refresh(db_path, full=args.cmd == "rebuild")
+        print(f"[*] Applied {n} catalog rows to the cube ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        return
+
+    where = {d: getattr(args, d) for d in ["kind"] + SCENARIO_DIMS + ["weekday", "hour"] if getattr(args, d)}
+    t0 = time.perf_counter()
+    try:
+        if args.cmd == "query":
+            by = [d for d in args.by.split(",") if d]
+            rows = query(args.metric, by, where, db_path, args.utc_offset)
+        else:
+            grid = heatmap(args.metric, args.stat, where, db_path, args.utc_offset)
+    except ValueError as e:
+        print(f"[!] {e}", file=sys.stderr)
+        sys.exit(1)
+    dt_ms = (time.perf_counter() - t0) * 1000.0
+
+    if args.cmd == "query":
+        print(",".join(by + ["n_runs", args.stat]))
+        for r in rows:
+            print(",".join(_fmt(r[d]) for d in by) + f",{r['n_runs']},{_fmt(r[args.stat])}")
+        print(f"[{len(rows)} groups, {dt_ms:.1f} ms]")
+        return
+
+    if args.out:
+        title = f"{args.stat}({args.metric}) " + " ".join(f"{k}={v}" for k, v in where.items())
+        plot_heatmap(grid, title, args.out)
+        print(f"[*] Saved {args.out} ({dt_ms:.1f} ms query)")
+        return
+    print("      " + " ".join(f"{h:>6d}" for h in range(24)))
+    for wd, name in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+        print(f"{name:<5} " + " ".join(f"{v:>6.1f}" if not np.isnan(v) else "     -" for v in grid[wd]))
+    print(f"[{dt_ms:.1f} ms]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Asyncio HTTP content server for the RQ3 QoE assets.
+
+Replaces `python3 -m http.server 8080` on the anchor:
+
+  - file bodies go out with loop.sendfile() (os.sendfile zero-copy on
+    Linux), never through Python buffers
+  - single-range `Range: bytes=...` requests (206 / 416)
+  - HTTP/1.1 keep-alive, many concurrent clients on one event loop
+  - GET and HEAD only; directories serve index.html if present
+  - virtual synthetic objects (`/synthetic/size=250M/seed=7.bin`, plus
+    the old test_*.bin / seg_*.bin names when not on disk) generated on
+    the fly by synthetic_assets.py
+
+Every request is appended to a compact CSV log:
+
+    ts_epoch,client_ip,client_port,conn_req,method,path,status,
+    range_start,bytes_sent,t_first_byte_s,t_complete_s,run_id
+
+t_first_byte_s / t_complete_s are seconds from the end of the request
+headers until the response headers / last body byte were handed to the
+kernel. run_id is the client's `X-Run-Id` header; the client QoE scripts
+send the basename of the run directory, so the log joins with each
+web_timing.csv on run_id == basename(run_dir). status 499 means the
+client closed the connection mid-body.
+
+Usage:
+  python3 anchor_content_server.py [--root DIR] [--host H] [--port P] [--log CSV]
+"""
+
+import argparse
+import asyncio
+import csv
+import mimetypes
+import os
+import socket
+import sys
+import time
+from email.utils import formatdate
+from urllib.parse import unquote, urlsplit
+
+import synthetic_assets
+
+BASE_DIR = os.path.expanduser("~/analysis")
+DEFAULT_ROOT = os.path.join(BASE_DIR, "web_qoe_assets")
+DEFAULT_PORT = 8080
+DEFAULT_LOG = os.path.join(BASE_DIR, "http_server_8080_requests.csv")
+
+IDLE_TIMEOUT_S = 30.0
+MAX_HEADER_BYTES = 16 * 1024
+LISTEN_BACKLOG = 1024
+
+SERVER_NAME = "starlink-qoe-anchor"
+
+LOG_FIELDS = [
+    "ts_epoch",
+    "client_ip",
+    "client_port",
+    "conn_req",
+    "method",
+    "path",
+    "status",
+    "range_start",
+    "bytes_sent",
+    "t_first_byte_s",
+    "t_complete_s",
+    "run_id",
+]
+
+REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+# Sentinel for a syntactically valid but unsatisfiable range
+UNSATISFIABLE = object()
+
+
+def parse_request_head(raw):
+    """
+    Parse request line + headers. Returns (method, target, version,
+    {lower-case name: value}) or None if malformed.
+    """
+    try:
+        text = raw.decode("latin-1")
+    except UnicodeDecodeError:
+        return None
+    lines = text.split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            return None
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], parts[2], headers
+
+
+def parse_range(value, size):
+    """
+    Single byte range -> (start, end) inclusive, None to serve the whole
+    body (no header, multi-range, or unknown unit), or UNSATISFIABLE.
+    """
+    if not value:
+        return None
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first == "":
+            # Suffix range: last N bytes
+            n = int(last)
+            if n <= 0:
+                return UNSATISFIABLE
+            return max(size - n, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return UNSATISFIABLE
+    return start, min(end, size - 1)
+
+
+def keep_alive_requested(version, headers):
+    conn = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return conn == "keep-alive"
+    return conn != "close"
+
+
+class ContentServer:
+    def __init__(self, root, log_path):
+        self.root = os.path.realpath(root)
+        self.log_path = log_path
+        self._log_file = None
+        self._log = None
+
+    def open_log(self):
+        new = not os.path.isfile(self.log_path) or os.path.getsize(self.log_path) == 0
+        self._log_file = open(self.log_path, "a", newline="", buffering=1)
+        self._log = csv.writer(self._log_file)
+        if new:
+            self._log.writerow(LOG_FIELDS)
+
+    def close_log(self):
+        if self._log_file is not None:
+            self._log_file.close()
+
+    def log_request(self, **row):
+        if self._log is None:
+            return
+        self._log.writerow([row.get(k, "") for k in LOG_FIELDS])
+
+    def resolve(self, path):
+        """
+        Map a decoded URL path to a regular file under root, or None.
+        """
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        if full != self.root and not full.startswith(self.root + os.sep):
+            return None
+        if os.path.isdir(full):
+            full = os.path.join(full, "index.html")
+        if not os.path.isfile(full):
+            return None
+        return full
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername") or ("", 0)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+
+        conn_req = 0
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_S
+                    )
+                except (
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                    asyncio.TimeoutError,
+                    ConnectionError,
+                ):
+                    break
+                t0 = time.perf_counter()
+                conn_req += 1
+                keep = await self.respond(raw, writer, peer, conn_req, t0)
+                if not keep:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def respond(self, raw, writer, peer, conn_req, t0):
+        """
+        Serve one request. Returns True if the connection stays open.
+        """
+        row = {
+            "ts_epoch": f"{time.time():.6f}",
+            "client_ip": peer[0],
+            "client_port": peer[1],
+            "conn_req": conn_req,
+        }
+
+        req = parse_request_head(raw)
+        if req is None:
+            await self.send_error(writer, 400, t0, row, keep=False)
+            return False
+        method, target, version, headers = req
+        row.update(method=method, path=target, run_id=headers.get("x-run-id", ""))
+        keep = keep_alive_requested(version, headers)
+
+        if method not in ("GET", "HEAD"):
+            await self.send_error(writer, 405, t0, row, keep=False, extra={"Allow": "GET, HEAD"})
+            return False
+
+        url_path = unquote(urlsplit(target).path)
+        path = self.resolve(url_path)
+        virt = None
+        if path is None:
+            # Real files win; anything else may be a virtual object
+            virt = synthetic_assets.parse_path(url_path, legacy=True)
+            if virt is None:
+                await self.send_error(writer, 404, t0, row, keep)
+                return keep
+
+        hdrs = {"Accept-Ranges": "bytes"}
+        if virt is not None:
+            size, seed = virt
+            hdrs["Content-Type"] = "application/octet-stream"
+            hdrs["ETag"] = f'"synthetic-{size}-{seed}"'
+        else:
+            st = os.stat(path)
+            size = st.st_size
+            hdrs["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            hdrs["Last-Modified"] = formatdate(st.st_mtime, usegmt=True)
+
+        rng = parse_range(headers.get("range"), size)
+        if rng is UNSATISFIABLE:
+            await self.send_error(
+                writer, 416, t0, row, keep, extra={"Content-Range": f"bytes */{size}"}
+            )
+            return keep
+
+        if rng is None:
+            status, start, count = 200, 0, size
+        else:
+            status, start, count = 206, rng[0], rng[1] - rng[0] + 1
+            hdrs["Content-Range"] = f"bytes {rng[0]}-{rng[1]}/{size}"
+        hdrs["Content-Length"] = str(count)
+
+        row.update(status=status, range_start=start)
+        writer.write(self.response_head(status, hdrs, keep))
+        try:
+            await writer.drain()
+            t_fb = time.perf_counter() - t0
+            sent = 0
+            if method == "GET" and count > 0 and virt is not None:
+                sent = await self.send_synthetic(writer, seed, start, count)
+            elif method == "GET" and count > 0:
+                with open(path, "rb") as f:
+                    sent = await asyncio.get_running_loop().sendfile(
+                        writer.transport, f, offset=start, count=count
+                    )
+                await writer.drain()
+        except (ConnectionError, OSError):
+            row.update(status=499, t_complete_s=f"{time.perf_counter() - t0:.6f}")
+            self.log_request(**row)
+            return False
+
+        row.update(
+            bytes_sent=sent,
+            t_first_byte_s=f"{t_fb:.6f}",
+            t_complete_s=f"{time.perf_counter() - t0:.6f}",
+        )
+        self.log_request(**row)
+        return keep
+
+    async def send_synthetic(self, writer, seed, start, count):
+        """
+        Write a virtual object body block by block. Chunks are views into
+        the cached pool; drain() after each keeps the transport buffer at
+        about one block.
+        """
+        sent = 0
+        for chunk in synthetic_assets.iter_range(seed, start, count):
+            writer.write(chunk)
+            sent += len(chunk)
+            if writer.transport.get_write_buffer_size() >= synthetic_assets.BLOCK_BYTES:
+                await writer.drain()
+        return sent
+
+    def response_head(self, status, headers, keep):
+        lines = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            f"Date: {formatdate(usegmt=True)}",
+            f"Server: {SERVER_NAME}",
+            f"Connection: {'keep-alive' if keep else 'close'}",
+        ]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_error(self, writer, status, t0, row, keep, extra=None):
+        body = f"{status} {REASONS[status]}\n".encode()
+        hdrs = {"Content-Type": "text/plain", "Content-Length": str(len(body))}
+        if extra:
+            hdrs.update(extra)
+        writer.write(self.response_head(status, hdrs, keep) + body)
+        try:
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        t = f"{time.perf_counter() - t0:.6f}"
+        row.update(status=status, bytes_sent=len(body), t_first_byte_s=t, t_complete_s=t)
+        self.log_request(**row)
+
+
+async def serve(server, host, port):
+    srv = await asyncio.start_server(
+        server.handle,
+        host,
+        port,
+        backlog=LISTEN_BACKLOG,
+        reuse_address=True,
+        limit=MAX_HEADER_BYTES,
+    )
+    addrs = ", ".join(str(s.getsockname()) for s in srv.sockets)
+    print(f"[*] Serving {server.root} on {addrs}")
+    print(f"[*] Request log: {server.log_path}")
+    async with srv:
+        await srv.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Zero-copy asyncio content server for RQ3 assets")
+    ap.add_argument("--root", default=DEFAULT_ROOT, help="directory to serve")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--log", default=DEFAULT_LOG, help="per-request CSV log")
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"[!] WARNING: {args.root} does not exist yet.", file=sys.stderr)
+
+    server = ContentServer(args.root, args.log)
+    server.open_log()
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close_log()
+
+
+if __name__ == "__main__":
+    main()
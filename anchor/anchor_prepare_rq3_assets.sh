@@ -3,13 +3,16 @@
 #
 # Prepare assets for RQ3 HTTP QoE:
 #   ~/analysis/web_qoe_assets/
-#     synthetic/test_5M.bin
-#     synthetic/test_20M.bin
 #     synthetic/video_30s_1080p.mp4
 #     synthetic/audio_60s.mp3
 #     real/video/*.mp4        (optional: copy your real video here)
 #     real/audio/*.mp3        (optional: copy your real audio here)
 #
+# Binary blobs (synthetic/test_5M.bin, synthetic/test_20M.bin, any
+# /synthetic/size=<N>[K|M|G]/seed=<n>.bin) are no longer written to disk:
+# anchor_content_server.py generates them on the fly (synthetic_assets.py).
+# Set MATERIALIZE_BLOBS=1 to still dd them, e.g. for another HTTP server.
+#
 # You can later run a manifest builder (qoe_manifest.py) if you want.
 
 set -euo pipefail
@@ -17,6 +20,8 @@ set -euo pipefail
 BASE_DIR="${HOME}/analysis"
 WEB_DIR="${BASE_DIR}/web_qoe_assets"
 
+MATERIALIZE_BLOBS="${MATERIALIZE_BLOBS:-0}"
+
 SYN_DIR="${WEB_DIR}/synthetic"
 REAL_VIDEO_DIR="${WEB_DIR}/real/video"
 REAL_AUDIO_DIR="${WEB_DIR}/real/audio"
@@ -25,15 +30,19 @@ mkdir -p "${SYN_DIR}" "${REAL_VIDEO_DIR}" "${REAL_AUDIO_DIR}"
 
 echo "[*] Preparing synthetic assets under: ${SYN_DIR}"
 
-# 1) Binary blobs for "web" tests
-if [ ! -f "${SYN_DIR}/test_5M.bin" ]; then
-  echo "  - Creating test_5M.bin"
-  dd if=/dev/urandom of="${SYN_DIR}/test_5M.bin" bs=1M count=5 status=progress
-fi
+# 1) Binary blobs for "web" tests (virtual unless MATERIALIZE_BLOBS=1)
+if [ "${MATERIALIZE_BLOBS}" = "1" ]; then
+  if [ ! -f "${SYN_DIR}/test_5M.bin" ]; then
+    echo "  - Creating test_5M.bin"
+    dd if=/dev/urandom of="${SYN_DIR}/test_5M.bin" bs=1M count=5 status=progress
+  fi
 
-if [ ! -f "${SYN_DIR}/test_20M.bin" ]; then
-  echo "  - Creating test_20M.bin"
-  dd if=/dev/urandom of="${SYN_DIR}/test_20M.bin" bs=1M count=20 status=progress
+  if [ ! -f "${SYN_DIR}/test_20M.bin" ]; then
+    echo "  - Creating test_20M.bin"
+    dd if=/dev/urandom of="${SYN_DIR}/test_20M.bin" bs=1M count=20 status=progress
+  fi
+else
+  echo "  - test_*.bin blobs are served virtually by anchor_content_server.py"
 fi
 
 # 2) Synthetic video (30s, 1080p, H.264)
@@ -3,11 +3,23 @@
 #
 # Legacy synthetic generator (kept for reproducibility).
 # Newer RQ3 flow uses anchor_prepare_rq3_assets.sh.
+#
+# anchor_content_server.py serves test_<size>.bin and
+# video_segments_1M/seg_<n>.bin virtually (synthetic_assets.py), so this
+# only writes files when MATERIALIZE_BLOBS=1.
 
 set -euo pipefail
 
 BASE_DIR="${HOME}/analysis"
 WWW_DIR="${BASE_DIR}/starlink_www"
+MATERIALIZE_BLOBS="${MATERIALIZE_BLOBS:-0}"
+
+if [ "${MATERIALIZE_BLOBS}" != "1" ]; then
+  echo "[*] Legacy blobs are served virtually by anchor_content_server.py, e.g."
+  echo "    /test_100M.bin, /video_segments_1M/seg_01.bin"
+  echo "    Set MATERIALIZE_BLOBS=1 to write them to ${WWW_DIR} anyway."
+  exit 0
+fi
 
 mkdir -p "${WWW_DIR}"
 cd "${WWW_DIR}"
@@ -3,12 +3,14 @@
 #
 # Start anchor-side services:
 #   - iperf3 TCP/UDP servers on ports 80, 443, 6881, 5201
-#   - HTTP static server on port 8080 serving ~/analysis/web_qoe_assets
+#   - HTTP content server on port 8080 serving ~/analysis/web_qoe_assets
+#     (anchor_content_server.py: sendfile, Range, keep-alive, per-request log)
 
 set -euo pipefail
 
 BASE_DIR="${HOME}/analysis"
 WEB_DIR="${BASE_DIR}/web_qoe_assets"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 mkdir -p "${BASE_DIR}"
 
@@ -23,19 +25,21 @@ for port in 80 443 6881 5201; do
   nohup iperf3 -s -p "${port}" > "${log}" 2>&1 &
 done
 
-echo "[*] Starting HTTP server on port 8080 from ${WEB_DIR}"
+echo "[*] Starting HTTP content server on port 8080 from ${WEB_DIR}"
 
 if [ ! -d "${WEB_DIR}" ]; then
   echo "[!] WARNING: ${WEB_DIR} does not exist yet. Run anchor_prepare_rq3_assets.sh."
 fi
 
-# Kill any old python http.server
+# Kill any old content server (and the legacy python http.server)
+pkill -f "anchor_content_server.py" || true
 pkill -f "python3 -m http.server 8080" || true
 
-(
-  cd "${WEB_DIR}"
-  nohup python3 -m http.server 8080 > "${BASE_DIR}/http_server_8080.log" 2>&1 &
-)
+nohup python3 "${SCRIPT_DIR}/anchor_content_server.py" \
+  --root "${WEB_DIR}" \
+  --port 8080 \
+  --log "${BASE_DIR}/http_server_8080_requests.csv" \
+  > "${BASE_DIR}/http_server_8080.log" 2>&1 &
 
 echo "[*] Anchor services started."
 echo "    Check logs under: ${BASE_DIR}"
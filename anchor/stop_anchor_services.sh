@@ -9,6 +9,7 @@ echo "[*] Stopping iperf3 servers..."
 pkill -f "iperf3 -s" || true
 
 echo "[*] Stopping HTTP server on port 8080..."
+pkill -f "anchor_content_server.py" || true
 pkill -f "python3 -m http.server 8080" || true
 
 echo "[*] Anchor services stopped."
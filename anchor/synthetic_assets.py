@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Deterministic virtual synthetic objects for the anchor content server.
+
+Instead of dd-ing test_*.bin blobs from /dev/urandom, the content server
+generates synthetic bodies on the fly from a URL such as
+
+    /synthetic/size=250M/seed=7.bin
+
+Sizes use dd's binary suffixes (K/M/G = KiB/MiB/GiB), so size=20M is the
+same length as the old test_20M.bin. Older asset names keep working when
+no real file exists on disk:
+
+    .../test_<size>.bin                  -> size, seed 0
+    .../video_segments_<size>/seg_<n>.bin -> size, seed n
+
+Byte layout (identical on anchor and client, no shared state needed):
+
+  - pool(seed) = SHAKE-128("starlink-qoe-synthetic:<seed>"), POOL_BYTES
+    plus one block long, computed once per seed and cached
+  - the object is a sequence of BLOCK_BYTES blocks; block k is a 16-byte
+    stamp (seed, k as little-endian u64) followed by the pool slice at
+    slot (k * SLOT_STRIDE mod n_slots), so no two blocks are identical
+  - the body is that sequence truncated to `size`
+
+Generating a block is one small pack plus a memoryview slice of the
+cached pool, so the server only pays for the socket writes.
+
+Usage (client side, after a download):
+  python3 synthetic_assets.py verify <downloaded_file> <url_path> [range_start]
+"""
+
+import functools
+import hashlib
+import re
+import struct
+import sys
+
+BLOCK_BYTES = 1 << 20
+POOL_BYTES = 8 << 20
+SLOT_BYTES = 4096
+N_SLOTS = POOL_BYTES // SLOT_BYTES
+SLOT_STRIDE = 1031  # odd, so k -> slot is a permutation of the slots
+STAMP = struct.Struct("<QQ")
+
+MAX_SIZE = 64 << 30
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+_SIZE = r"(\d+[KMG]?)"
+PATH_PATTERNS = (
+    re.compile(r"/synthetic/size=" + _SIZE + r"/seed=(\d+)\.bin$"),
+)
+# Legacy names, only used when the file is not on disk
+LEGACY_PATTERNS = (
+    re.compile(r"/test_" + _SIZE + r"\.bin$"),
+    re.compile(r"/video_segments_" + _SIZE + r"/seg_(\d+)\.bin$"),
+)
+
+
+def parse_size(text):
+    m = re.fullmatch(r"(\d+)([KMG]?)", text.strip().upper())
+    if not m:
+        raise ValueError(f"bad size: {text!r}")
+    return int(m.group(1)) * SIZE_UNITS[m.group(2)]
+
+
+def _match(patterns, url_path):
+    for pat in patterns:
+        m = pat.search(url_path)
+        if m:
+            size = parse_size(m.group(1))
+            seed = int(m.group(2)) if m.lastindex >= 2 else 0
+            if 0 <= size <= MAX_SIZE:
+                return size, seed
+    return None
+
+
+def parse_path(url_path, legacy=False):
+    """
+    (size, seed) for a virtual object URL path, else None. With
+    legacy=True the old test_*.bin / seg_*.bin names match too.
+    """
+    virt = _match(PATH_PATTERNS, url_path)
+    if virt is None and legacy:
+        virt = _match(LEGACY_PATTERNS, url_path)
+    return virt
+
+
+@functools.lru_cache(maxsize=8)
+def pool(seed):
+    # One extra block so every slot slice is contiguous
+    label = f"starlink-qoe-synthetic:{seed}".encode()
+    return memoryview(hashlib.shake_128(label).digest(POOL_BYTES + BLOCK_BYTES))
+
+
+def block_parts(seed, k):
+    """
+    (stamp, body) of block k; stamp + body is BLOCK_BYTES long.
+    """
+    off = ((k * SLOT_STRIDE) % N_SLOTS) * SLOT_BYTES
+    return STAMP.pack(seed, k), pool(seed)[off : off + BLOCK_BYTES - STAMP.size]
+
+
+def iter_range(seed, start, count):
+    """
+    Yield bytes-like chunks covering bytes [start, start + count) of the
+    object for `seed` (each chunk at most one block).
+    """
+    pos = start
+    end = start + count
+    while pos < end:
+        k, within = divmod(pos, BLOCK_BYTES)
+        stamp, body = block_parts(seed, k)
+        take = min(BLOCK_BYTES - within, end - pos)
+        if within < STAMP.size:
+            head = stamp[within : within + take]
+            yield head
+            rest = take - len(head)
+            if rest:
+                yield body[:rest]
+        else:
+            b0 = within - STAMP.size
+            yield body[b0 : b0 + take]
+        pos += take
+
+
+def verify_file(path, seed, start=0, expected_len=None):
+    """
+    Stream-compare a downloaded body with the generator. Returns
+    (ok, n_bytes, first_bad_offset or None).
+    """
+    n = 0
+    with open(path, "rb") as f:
+        total = f.seek(0, 2)
+        f.seek(0)
+        for chunk in iter_range(seed, start, total):
+            got = f.read(len(chunk))
+            if got != chunk:
+                i = next(i for i in range(len(got)) if got[i] != chunk[i])
+                return False, total, start + n + i
+            n += len(got)
+    if expected_len is not None and total != expected_len:
+        return False, total, start + min(total, expected_len)
+    return True, total, None
+
+
+def main():
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "verify":
+        print(
+            f"Usage: {sys.argv[0]} verify <downloaded_file> <url_path> [range_start]",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    path, url_path = sys.argv[2], sys.argv[3]
+    start = int(sys.argv[4]) if len(sys.argv) == 5 else 0
+    virt = parse_path("/" + url_path.lstrip("/"), legacy=True)
+    if virt is None:
+        print(f"[!] Not a synthetic object path: {url_path}", file=sys.stderr)
+        sys.exit(2)
+    size, seed = virt
+
+    # A full download must be exactly `size` bytes; a range body only has
+    # to match where it is
+    expected = size if len(sys.argv) == 4 else None
+    ok, n, bad = verify_file(path, seed, start, expected)
+    if ok:
+        print(f"synthetic_verify=ok bytes={n} size={size} seed={seed}")
+        return
+    print(f"synthetic_verify=FAIL bytes={n} size={size} seed={seed} first_bad_offset={bad}")
+    sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Adaptive repetition controller for run_starlink_matrix.sh (ADAPTIVE=1).
+
+The fixed matrix runs REPS of every cell (TCP port, UDP rate, DSCP):
+stable cells waste dish time while noisy ones stay underpowered. Here the
+matrix asks this controller which cell to run next, after every finished
+run:
+
+  1. every cell first gets --min-reps runs, round-robin (so the cells
+     also share the same hours of the day)
+  2. then, reading the campaign's metrics_run.csv files, the controller
+     picks the cell furthest from its stopping rule:
+       ci        the t-based CI half-width of every --metric is within
+                 --target of its mean (relative precision)
+       baseline  the cell vs --baseline cell, per metric: Welch CI of the
+                 difference excludes 0 (the cell differs) or is narrower
+                 than --margin x the baseline mean (practically equal);
+                 the baseline cell itself uses the ci rule, and gets the
+                 run instead when its variance dominates the comparison
+  3. it stops when every cell has converged or hit --max-reps, or when
+     the next run would not fit in --budget-s (run time is estimated
+     from the campaign so far, sleeps included)
+
+Runs that produced no metrics (iperf3 or analyzer failure) still count
+towards --max-reps. Cells are "mode:proto:port:udp_rate:tos" (udp_rate
+"-" for TCP); a finished run belongs to a cell when its run_metadata.txt
+(written by run_starlink_scenario.sh; metrics_run.csv columns as a
+fallback) matches these keys and its metrics_run.csv was written after
+`init`.
+
+The state file only holds the parameters and how many runs each cell
+was given; the estimates are recomputed from the run directories every
+time, so re-analyzing a run or resuming after a crash needs no repair.
+
+Usage:
+  python3 adaptive_reps.py init --state F [--min-reps 3] [--max-reps 10]
+                                [--target 0.1] [--confidence 0.95]
+                                [--metric iperf_avg_throughput_Mbps ...]
+                                [--budget-s 0] [--rule ci|baseline]
+                                [--baseline CELL] [--margin 0.05]
+  python3 adaptive_reps.py next --state F CELL...
+      prints "mode proto port udp_rate tos run_idx pending", or exits 3
+      (EXIT_DONE) when the campaign is over; any other non-zero exit is
+      an error
+  python3 adaptive_reps.py report --state F CELL...
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from statistics import NormalDist
+
+RESULTS_STARLINK = Path.home() / "analysis" / "results_starlink"
+
+DEFAULT_METRICS = ["iperf_avg_throughput_Mbps", "gw_rtt_p95_ms"]
+CELL_COLUMNS = ["mode", "proto", "port", "udp_rate", "tos"]
+
+# `next` exit status once the campaign is over (argparse errors exit 2,
+# tracebacks 1)
+EXIT_DONE = 3
+
+
+def t_quantile(p, df):
+    """
+    Student t quantile without scipy: exact for df 1 and 2, a 4-term
+    Cornish-Fisher expansion otherwise (within 0.1% from df 3 up).
+    """
+    if df <= 0:
+        return math.inf
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) * math.sqrt(2.0 / (4 * p * (1 - p)))
+    z = NormalDist().inv_cdf(p)
+    v = float(df)
+    return (
+        z
+        + (z**3 + z) / (4 * v)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3)
+        + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * v**4)
+    )
+
+
+def mean_var(xs):
+    n = len(xs)
+    m = sum(xs) / n
+    var = sum((x - m) ** 2 for x in xs) / (n - 1) if n > 1 else math.inf
+    return m, var
+
+
+def ci_score(xs, confidence, target):
+    """
+    Relative CI half-width over target (<= 1 means converged).
+    """
+    if len(xs) < 2:
+        return math.inf
+    m, var = mean_var(xs)
+    half = t_quantile(0.5 + confidence / 2, len(xs) - 1) * math.sqrt(var / len(xs))
+    if half == 0:
+        return 0.0
+    return half / max(abs(m), 1e-9) / target
+
+
+def baseline_score(xs, base, confidence, margin):
+    """
+    Welch comparison with the baseline runs: <= 1 once the difference
+    is significant or its CI is within margin x baseline mean.
+    """
+    if len(xs) < 2 or len(base) < 2:
+        return math.inf
+    m1, v1 = mean_var(xs)
+    m0, v0 = mean_var(base)
+    a, b = v1 / len(xs), v0 / len(base)
+    se2 = a + b
+    if se2 == 0:
+        return 0.0
+    df = se2**2 / (a**2 / (len(xs) - 1) + b**2 / (len(base) - 1))
+    half = t_quantile(0.5 + confidence / 2, max(1, int(df))) * math.sqrt(se2)
+    diff = abs(m1 - m0)
+    differs = half / diff if diff > 0 else math.inf
+    equal = half / (margin * abs(m0)) if m0 else math.inf
+    return min(differs, equal)
+
+
+def baseline_dominates(cell_samples, base_samples, metrics):
+    """
+    True when, for most metrics, the baseline's var/n is the larger part
+    of the Welch standard error.
+    """
+    votes = 0
+    for m in metrics:
+        xs, base = cell_samples[m], base_samples[m]
+        if len(xs) < 2 or len(base) < 2:
+            continue
+        votes += 1 if mean_var(base)[1] / len(base) > mean_var(xs)[1] / len(xs) else -1
+    return votes > 0
+
+
+def parse_cell(s):
+    parts = s.split(":")
+    if len(parts) != len(CELL_COLUMNS):
+        raise ValueError(f"bad cell {s!r}, expected mode:proto:port:udp_rate:tos")
+    return s
+
+
+def _read_kv(path):
+    kv = {}
+    if path.is_file():
+        with path.open() as f:
+            for line in f:
+                k, sep, v = line.strip().partition("=")
+                if sep:
+                    kv[k.strip()] = v.strip()
+    return kv
+
+
+def _row_cell(row):
+    rate = row.get("udp_rate") or "-"
+    return ":".join([row.get("mode", ""), row.get("proto", ""), row.get("port", ""), rate, row.get("tos") or "0"])
+
+
+def load_samples(state, cells, results_dir=RESULTS_STARLINK):
+    """
+    {cell: {metric: [values]}} from metrics_run.csv files written since
+    the campaign started.
+    """
+    out = {c: {m: [] for m in state["metrics"]} for c in cells}
+    if not results_dir.is_dir():
+        return out
+    for path in results_dir.glob("*/metrics_run.csv"):
+        if path.stat().st_mtime < state["started_epoch"]:
+            continue
+        meta = _read_kv(path.parent / "run_metadata.txt")
+        with path.open(newline="") as f:
+            for row in csv.DictReader(f):
+                cell = _row_cell({**row, **{k: meta[k] for k in CELL_COLUMNS if meta.get(k)}})
+                if cell not in out:
+                    continue
+                for m in state["metrics"]:
+                    try:
+                        v = float(row.get(m, ""))
+                    except ValueError:
+                        continue
+                    if math.isfinite(v):
+                        out[cell][m].append(v)
+    return out
+
+
+def scores(state, cells, samples):
+    """
+    {cell: score}; the max over metrics of the rule's score.
+    """
+    out = {}
+    base = state.get("baseline")
+    for c in cells:
+        per_metric = []
+        for m in state["metrics"]:
+            xs = samples[c][m]
+            if state["rule"] == "baseline" and base and c != base:
+                per_metric.append(baseline_score(xs, samples[base][m], state["confidence"], state["margin"]))
+            else:
+                per_metric.append(ci_score(xs, state["confidence"], state["target"]))
+        out[c] = max(per_metric) if per_metric else math.inf
+    return out
+
+
+def load_state(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def pick_next(state, cells, samples):
+    """
+    (cell, reason) to run next, or (None, reason) when the campaign is
+    done.
+    """
+    given = state["given"]
+    n_given = sum(given.get(c, 0) for c in cells)
+    if state["budget_s"] > 0 and n_given:
+        elapsed = time.time() - state["started_epoch"]
+        per_run = elapsed / n_given
+        if elapsed + per_run > state["budget_s"]:
+            return None, f"budget: {elapsed:.0f}s used, next run ~{per_run:.0f}s"
+
+    under = [c for c in cells if given.get(c, 0) < state["min_reps"]]
+    if under:
+        # Round-robin: fewest runs first, matrix order on ties
+        return min(under, key=lambda c: given.get(c, 0)), "min_reps"
+
+    sc = scores(state, cells, samples)
+    open_cells = [c for c in cells if sc[c] > 1 and given.get(c, 0) < state["max_reps"]]
+    if not open_cells:
+        return None, "converged" if all(sc[c] <= 1 for c in cells) else "max_reps"
+    c = max(open_cells, key=lambda c: sc[c])
+    base = state.get("baseline")
+    if state["rule"] == "baseline" and c != base and given.get(base, 0) < state["max_reps"]:
+        # More baseline runs help every comparison whose standard error
+        # is mostly the baseline's
+        if baseline_dominates(samples[c], samples[base], state["metrics"]):
+            return base, f"baseline for {c} (score {sc[c]:.2f})"
+    return c, f"score {sc[c]:.2f}"
+
+
+def pending_upper_bound(state, cells, samples):
+    """
+    Runs still possible: min_reps shortfall, plus max_reps headroom of
+    cells that have not converged.
+    """
+    sc = scores(state, cells, samples)
+    n = 0
+    for c in cells:
+        g = state["given"].get(c, 0)
+        n += state["max_reps"] - g if sc[c] > 1 else max(0, state["min_reps"] - g)
+    return n
+
+
+def report(state, cells, samples):
+    sc = scores(state, cells, samples)
+    lines = [f"{'cell':<34} {'given':>5} {'done':>5} {'score':>7}  " + "  ".join(state["metrics"])]
+    for c in cells:
+        done = max((len(v) for v in samples[c].values()), default=0)
+        ms = []
+        for m in state["metrics"]:
+            xs = samples[c][m]
+            ms.append(f"{sum(xs) / len(xs):.2f}" if xs else "-")
+        status = "ok" if sc[c] <= 1 else ("max" if state["given"].get(c, 0) >= state["max_reps"] else "open")
+        lines.append(
+            f"{c:<34} {state['given'].get(c, 0):>5} {done:>5} {min(sc[c], 999.99):>7.2f}  "
+            + "  ".join(ms)
+            + f"  {status}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Adaptive repetition controller for the scenario matrix")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("init", help="start a campaign")
+    p.add_argument("--state", required=True)
+    p.add_argument("--min-reps", type=int, default=3)
+    p.add_argument("--max-reps", type=int, default=10)
+    p.add_argument("--target", type=float, default=0.1, help="relative CI half-width")
+    p.add_argument("--confidence", type=float, default=0.95)
+    p.add_argument("--metric", action="append", help=f"metrics_run.csv column (default {DEFAULT_METRICS})")
+    p.add_argument("--budget-s", type=float, default=0.0, help="campaign wall time, 0 = unlimited")
+    p.add_argument("--rule", choices=("ci", "baseline"), default="ci")
+    p.add_argument("--baseline", help="baseline cell for --rule baseline")
+    p.add_argument("--margin", type=float, default=0.05, help="equivalence margin (fraction of baseline mean)")
+    for name in ("next", "report"):
+        p = sub.add_parser(name)
+        p.add_argument("--state", required=True)
+        p.add_argument("cells", nargs="+")
+    args = ap.parse_args()
+
+    if args.cmd == "init":
+        if args.min_reps < 2 or args.max_reps < args.min_reps:
+            ap.error("need 2 <= --min-reps <= --max-reps")
+        if args.rule == "baseline" and not args.baseline:
+            ap.error("--rule baseline needs --baseline CELL")
+        state = {
+            "started_epoch": time.time(),
+            "min_reps": args.min_reps,
+            "max_reps": args.max_reps,
+            "target": args.target,
+            "confidence": args.confidence,
+            "metrics": args.metric or DEFAULT_METRICS,
+            "budget_s": args.budget_s,
+            "rule": args.rule,
+            "baseline": parse_cell(args.baseline) if args.baseline else None,
+            "margin": args.margin,
+            "given": {},
+        }
+        save_state(args.state, state)
+        return
+
+    state = load_state(args.state)
+    try:
+        # Same scenario listed twice (e.g. TCP 443 CS0 in the port and DSCP
+        # blocks) is one cell
+        cells = list(dict.fromkeys(parse_cell(c) for c in args.cells))
+    except ValueError as e:
+        ap.error(str(e))
+    if state.get("baseline") and state["baseline"] not in cells:
+        ap.error(f"baseline cell {state['baseline']} is not in the matrix")
+    samples = load_samples(state, cells)
+
+    if args.cmd == "report":
+        print(report(state, cells, samples))
+        return
+
+    cell, reason = pick_next(state, cells, samples)
+    if cell is None:
+        print(f"[*] Adaptive matrix done ({reason})", file=sys.stderr)
+        print(report(state, cells, samples), file=sys.stderr)
+        sys.exit(EXIT_DONE)
+    state["given"][cell] = state["given"].get(cell, 0) + 1
+    save_state(args.state, state)
+    pending = pending_upper_bound(state, cells, samples)
+    print(f"[*] Next: {cell} run {state['given'][cell]} ({reason})", file=sys.stderr)
+    print(" ".join(cell.split(":") + [str(state["given"][cell]), str(pending)]))
+
+
+if __name__ == "__main__":
+    main()
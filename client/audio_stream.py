@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Real-time paced audio streaming with a simulated jitter buffer.
+
+run_starlink_audio_qoe.sh bulk-downloads audio_60s.mp3, which measures
+capacity. This instead consumes the asset at its encoded bitrate, the way
+a live/streaming player does, and asks whether every chunk is there when
+the player needs it:
+
+  - the body is read in chunks of --chunk-ms of audio; chunk k is read
+    once the source would have produced it (t_first_byte + (k+1) * chunk)
+  - a small SO_RCVBUF (--rcvbuf-kb, set before connect so the window
+    scale stays small) keeps TCP from running far ahead, so the anchor is
+    paced by flow control instead of bulk-sending the file
+  - lateness_k = completion time of chunk k minus its production time
+    (0 when the bytes were already waiting in the socket buffer)
+  - the jitter buffer starts playout --buffer-ms after the first chunk is
+    due; a chunk completing after its playout deadline is an underrun
+    (playout pauses until it arrives, like a player that rebuffers)
+  - required_buffer_ms = max lateness: the smallest buffer that would
+    have had no underruns on this run
+
+The encoded bitrate is --bitrate-kbps if given, else size / --duration-s,
+else read from the first MPEG audio frame header (after any ID3v2 tag)
+that is followed by a second one at its frame length.
+
+All --streams streams share one asyncio loop with raw non-blocking
+sockets: each stream reads with sock_recv_into into one preallocated
+buffer and sleeps on a single timer per chunk, so hundreds of concurrent
+paced streams run from one client process.
+
+Outputs (in RUN_DIR):
+  - audio_timing.csv   one row per stream: web_timing.csv schema (whole
+                       stream, time_total ~ the audio duration) + stream_id
+                       + STREAM_FIELDS
+  - audio_chunks.csv   stream_id,chunk_idx,t_due,lateness_ms (compact
+                       per-chunk log, seconds from the stream's first byte)
+
+analyze_rq3_qoe.py keeps paced rows (chunk_ms set) out of the bulk-audio
+CDFs and summarizes them in rq3_audio_paced.csv.
+
+Usage:
+  python3 audio_stream.py --host H --port P --file F --run-dir DIR
+                          [--streams 1] [--chunk-ms 100] [--buffer-ms 500]
+                          [--bitrate-kbps K | --duration-s S]
+                          [--rcvbuf-kb 4]
+                          [--slot S --tech T --plan P --mode M
+                           --app-kind K --run-idx R]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from web_multiflow import TIMING_FIELDS, _content_length, _fmt, asset_name
+
+TIMEOUT_S = 600.0
+HEAD_MAX_BYTES = 64 * 1024
+# Bytes read past any ID3v2 tag to find the first MPEG frame header
+PROBE_BYTES = 16 * 1024
+# Scheduler noise below this does not make a chunk late
+LATE_EPS_S = 0.001
+
+CHUNK_LOG = "audio_chunks.csv"
+
+STREAM_FIELDS = [
+    "stream_id",
+    "bitrate_kbps",
+    "chunk_ms",
+    "buffer_ms",
+    "n_chunks",
+    "chunks_late",
+    "late_p50_ms",
+    "late_p95_ms",
+    "late_p99_ms",
+    "late_max_ms",
+    "underruns",
+    "underrun_total_s",
+    "required_buffer_ms",
+]
+AUDIO_FIELDS = TIMING_FIELDS[:-1] + STREAM_FIELDS
+
+# MPEG audio bitrate tables (kbps) by (version, layer); index 0 = free format
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_BITRATES[(2, 3)] = _BITRATES[(2, 2)]
+# Sample rates (Hz) by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _id3_size(buf):
+    if buf[:3] == b"ID3" and len(buf) >= 10:
+        return 10 + ((buf[6] << 21) | (buf[7] << 14) | (buf[8] << 7) | buf[9])
+    return 0
+
+
+def _frame_header(buf, pos):
+    """
+    (version_bits, layer_bits, sample_rate_bits, kbps, frame_len) of the
+    MPEG audio frame header at buf[pos], or None if there is none.
+    """
+    if pos + 3 >= len(buf) or buf[pos] != 0xFF or buf[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (buf[pos + 1] >> 3) & 0x03
+    layer_bits = (buf[pos + 1] >> 1) & 0x03
+    index = buf[pos + 2] >> 4
+    sr_bits = (buf[pos + 2] >> 2) & 0x03
+    if version_bits == 1 or not layer_bits or not 0 < index < 15 or sr_bits == 3:
+        return None
+    version = 1 if version_bits == 3 else 2
+    layer = 4 - layer_bits
+    kbps = _BITRATES[(version, layer)][index]
+    sample_rate = _SAMPLE_RATES[version_bits][sr_bits]
+    padding = (buf[pos + 2] >> 1) & 0x01
+    if layer == 1:
+        frame_len = (12000 * kbps // sample_rate + padding) * 4
+    else:
+        per_frame = 72000 if (layer == 3 and version == 2) else 144000
+        frame_len = per_frame * kbps // sample_rate + padding
+    return version_bits, layer_bits, sr_bits, kbps, frame_len
+
+
+def mpeg_bitrate_kbps(buf):
+    """
+    Bitrate of the first MPEG audio frame in buf (skipping an ID3v2 tag),
+    or None. A header only counts if the next frame, one frame length
+    later, has a header of the same version/layer/sample rate; a lone
+    0xFFE sync in non-MPEG data would otherwise pass. For VBR files this
+    is the first frame only; pass --duration-s for those.
+    """
+    pos = _id3_size(buf)
+    end = len(buf) - 3
+    while pos < end:
+        h = _frame_header(buf, pos)
+        if h is not None:
+            nxt = _frame_header(buf, pos + h[4])
+            if nxt is not None and nxt[:3] == h[:3]:
+                return h[3]
+        pos += 1
+    return None
+
+
+class JitterBuffer:
+    """
+    Playout model: chunk k is due for playout at
+    t_first + (k + 1) * chunk + buffer + underrun time so far, i.e.
+    buffer + underrun time after it was produced.
+    """
+
+    def __init__(self, buffer_s):
+        self.buffer_s = buffer_s
+        self.underruns = 0
+        self.underrun_total_s = 0.0
+
+    def arrive(self, lateness_s):
+        slack = self.buffer_s + self.underrun_total_s
+        if lateness_s > slack:
+            self.underruns += 1
+            self.underrun_total_s += lateness_s - slack
+
+
+async def _recv_head(loop, sock, buf):
+    """
+    Read the response head into buf; returns (head bytes, body bytes
+    already read).
+    """
+    view = memoryview(buf)
+    got = 0
+    while True:
+        n = await loop.sock_recv_into(sock, view[got:])
+        if n == 0:
+            raise ConnectionError("connection closed inside response headers")
+        got += n
+        end = buf.find(b"\r\n\r\n", 0, got)
+        if end >= 0:
+            return bytes(buf[:end + 4]), bytes(buf[end + 4:got])
+        if got >= len(buf):
+            raise ConnectionError("response headers too large")
+
+
+async def stream(host, port, path, run_id, args):
+    """
+    One paced stream. Returns (result dict, per-chunk (t_due, lateness)
+    array).
+    """
+    loop = asyncio.get_running_loop()
+    res = {"size_download": 0}
+    chunks = np.empty((0, 2))
+    t0 = time.perf_counter()
+    sock = None
+    try:
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        res["time_namelookup"] = time.perf_counter() - t0
+
+        family, _, _, _, addr = infos[0]
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.rcvbuf_kb * 1024)
+        await loop.sock_connect(sock, addr)
+        res["time_connect"] = time.perf_counter() - t0
+        res["time_appconnect"] = 0.0
+
+        request = (
+            f"GET /{path.lstrip('/')} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            f"User-Agent: starlink-qoe-audio-paced\r\n"
+            f"X-Run-Id: {run_id}\r\n"
+            f"Connection: close\r\n\r\n"
+        ).encode()
+        res["time_pretransfer"] = time.perf_counter() - t0
+        await loop.sock_sendall(sock, request)
+
+        buf = bytearray(HEAD_MAX_BYTES)
+        head, body = await _recv_head(loop, sock, buf)
+        t_first = time.perf_counter()
+        res["time_starttransfer"] = t_first - t0
+        status = int(head.split(b" ", 2)[1])
+        if status != 200:
+            raise ConnectionError(f"HTTP {status}")
+        length = _content_length(head)
+        got = len(body)
+        view = memoryview(buf)
+
+        kbps = args.bitrate_kbps
+        if not kbps and args.duration_s and length:
+            kbps = length * 8.0 / args.duration_s / 1000.0
+        if not kbps:
+            probe = bytearray(body)
+            while len(probe) < _id3_size(probe) + PROBE_BYTES and (length is None or got < length):
+                n = await loop.sock_recv_into(sock, view)
+                if n == 0:
+                    break
+                probe += view[:n]
+                got += n
+            kbps = mpeg_bitrate_kbps(probe)
+        if not kbps:
+            raise ValueError("cannot tell the bitrate: pass --bitrate-kbps or --duration-s")
+        res["bitrate_kbps"] = kbps
+
+        chunk_s = args.chunk_ms / 1000.0
+        chunk_bytes = max(1, int(round(kbps * 1000.0 / 8.0 * chunk_s)))
+        total = length if length is not None else float("inf")
+        n_chunks = -(-length // chunk_bytes) if length is not None else None
+        jb = JitterBuffer(args.buffer_ms / 1000.0)
+        due_s, late_s = [], []
+
+        # Bytes read ahead of a chunk's due time count as already there
+        k = 0
+        while k * chunk_bytes < total:
+            due = t_first + (k + 1) * chunk_s
+            wait = due - time.perf_counter()
+            t_wake = due
+            if wait > 0:
+                await asyncio.sleep(wait)
+                # Timer overshoot is client load, not network lateness
+                t_wake = max(due, time.perf_counter())
+            need = min((k + 1) * chunk_bytes, total)
+            while got < need:
+                n = await loop.sock_recv_into(sock, view)
+                if n == 0:
+                    break
+                got += n
+            if got < need:
+                # EOF: a short body ends here, an unsized one plays its tail
+                if length is not None or got <= k * chunk_bytes:
+                    break
+                total = got
+            lateness = time.perf_counter() - t_wake
+            if lateness < LATE_EPS_S:
+                lateness = 0.0
+            jb.arrive(lateness)
+            due_s.append(due - t_first)
+            late_s.append(lateness)
+            k += 1
+
+        t_total = time.perf_counter() - t0
+        res["time_total"] = t_total
+        res["size_download"] = got
+        res["speed_download"] = got / t_total if t_total > 0 else 0.0
+        res["n_chunks"] = n_chunks if n_chunks is not None else k
+        res["underruns"] = jb.underruns
+        res["underrun_total_s"] = jb.underrun_total_s
+        chunks = np.column_stack([due_s, late_s]) if late_s else chunks
+        if length is not None and got < length:
+            res["error"] = f"short body {got}/{length}"
+            # The missing tail never plays
+            res["underruns"] += 1
+    except (OSError, ValueError, IndexError) as e:
+        res["error"] = str(e) or e.__class__.__name__
+    finally:
+        if sock is not None:
+            sock.close()
+    return res, chunks
+
+
+def chunk_stats(res, chunks, args):
+    out = {
+        "chunk_ms": args.chunk_ms,
+        "buffer_ms": args.buffer_ms,
+        "chunks_late": 0,
+    }
+    for k in ("late_p50_ms", "late_p95_ms", "late_p99_ms", "late_max_ms", "required_buffer_ms"):
+        out[k] = float("nan")
+    if chunks.size:
+        late_ms = chunks[:, 1] * 1000.0
+        out["chunks_late"] = int(np.count_nonzero(late_ms > 0))
+        out["late_p50_ms"], out["late_p95_ms"], out["late_p99_ms"] = (
+            float(v) for v in np.percentile(late_ms, [50, 95, 99])
+        )
+        out["late_max_ms"] = float(late_ms.max())
+        out["required_buffer_ms"] = out["late_max_ms"]
+    return out
+
+
+async def run_streams(host, port, path, run_id, args):
+    tasks = [
+        asyncio.wait_for(stream(host, port, path, run_id, args), TIMEOUT_S)
+        for _ in range(args.streams)
+    ]
+    out = await asyncio.gather(*tasks, return_exceptions=True)
+    return [
+        r if isinstance(r, tuple) else ({"size_download": 0, "error": repr(r)}, np.empty((0, 2)))
+        for r in out
+    ]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Paced real-time audio streaming QoE")
+    ap.add_argument("--host", required=True)
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--file", required=True)
+    ap.add_argument("--run-dir", required=True)
+    ap.add_argument("--streams", type=int, default=1)
+    ap.add_argument("--chunk-ms", type=float, default=100.0)
+    ap.add_argument("--buffer-ms", type=float, default=500.0)
+    ap.add_argument("--bitrate-kbps", type=float, default=None)
+    ap.add_argument("--duration-s", type=float, default=None)
+    ap.add_argument("--rcvbuf-kb", type=int, default=4)
+    ap.add_argument("--slot", default="slot1")
+    ap.add_argument("--tech", default="starlink")
+    ap.add_argument("--plan", default="residential")
+    ap.add_argument("--mode", default="direct")
+    ap.add_argument("--app-kind", default="synthetic")
+    ap.add_argument("--run-idx", default="1")
+    args = ap.parse_args()
+
+    if args.streams < 1 or args.chunk_ms <= 0 or args.buffer_ms < 0 or args.rcvbuf_kb < 1:
+        ap.error("need --streams >= 1, --chunk-ms > 0, --buffer-ms >= 0, --rcvbuf-kb >= 1")
+
+    os.makedirs(args.run_dir, exist_ok=True)
+    run_id = os.path.basename(os.path.normpath(args.run_dir))
+    ts_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    results = asyncio.run(run_streams(args.host, args.port, args.file, run_id, args))
+
+    failed = 0
+    with open(os.path.join(args.run_dir, "audio_timing.csv"), "w", newline="") as f_t, \
+            open(os.path.join(args.run_dir, CHUNK_LOG), "w", newline="") as f_c:
+        timing = csv.writer(f_t)
+        timing.writerow(AUDIO_FIELDS)
+        log = csv.writer(f_c)
+        log.writerow(["stream_id", "chunk_idx", "t_due", "lateness_ms"])
+        for stream_id, (res, chunks) in enumerate(results, start=1):
+            row = {
+                "timestamp": ts_utc,
+                "slot": args.slot,
+                "tech": args.tech,
+                "plan": args.plan,
+                "mode": args.mode,
+                "app_class": "audio",
+                "app_kind": args.app_kind,
+                "asset_name": asset_name(args.file),
+                "anchor_host": args.host,
+                "anchor_port": args.port,
+                "run_idx": args.run_idx,
+                "url": f"http://{args.host}:{args.port}/{args.file.lstrip('/')}",
+                "stream_id": stream_id,
+                **{k: res.get(k) for k in TIMING_FIELDS[12:20]},
+                **{k: res.get(k) for k in ("bitrate_kbps", "n_chunks", "underruns", "underrun_total_s")},
+                **chunk_stats(res, chunks, args),
+            }
+            timing.writerow([_fmt(row.get(k)) for k in AUDIO_FIELDS])
+            for idx, (due, late) in enumerate(chunks.tolist()):
+                log.writerow([stream_id, idx, f"{due:.3f}", f"{late * 1000.0:.1f}"])
+            if "error" in res:
+                failed += 1
+                print(f"[!] Stream {stream_id} failed: {res['error']}", file=sys.stderr)
+
+    ok = [res for res, _ in results if "error" not in res]
+    underruns = sum(res.get("underruns", 0) for res, _ in results)
+    worst = max((chunk_stats(r, c, args)["late_max_ms"] for r, c in results if c.size), default=float("nan"))
+    print(
+        f"[*] {len(ok)}/{len(results)} paced streams at "
+        f"{results[0][0].get('bitrate_kbps') or float('nan'):.0f} kbps: "
+        f"{underruns} underruns with a {args.buffer_ms:.0f} ms buffer, "
+        f"worst chunk {worst:.1f} ms late"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,3 +27,11 @@ timestamp_utc() {
 timestamp_id() {
   date -u +"%Y%m%d-%H%M%S"
 }
+
+# Update the Prometheus textfile via ../analysis/metrics_export.py relative
+# to the calling script (the repo layout; resolves to ~/analysis itself when
+# deployed flat there); never fails the calling script.
+# Usage: export_metric queue --name X --depth N
+export_metric() {
+  python3 "$(dirname "$0")/../analysis/metrics_export.py" "$@" > /dev/null 2>&1 || true
+}
@@ -15,7 +15,7 @@ sudo apt-get install -y \
   jq \
   bc \
   gawk \
-  python3 python3-pip \
+  python3 python3-pip python3-numpy \
   gstreamer1.0-tools \
   gstreamer1.0-plugins-base \
   gstreamer1.0-plugins-good \
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Run iperf3 with --json-stream and stop it early once the result is known.
+
+run_starlink_scenario.sh normally runs iperf3 -J for the full -d duration
+and only parses iperf3_raw.json afterwards. With LIVE=1 it runs the same
+command through this wrapper, which reads the per-interval events as they
+arrive and keeps running estimates of throughput and retransmits:
+
+  converged  TCP only: the interval throughputs after --warmup-s are
+             grouped into --batch-s batches (batch means, since 1 s
+             intervals are strongly autocorrelated); once at least
+             --min-s have run, the run stops when the t-based CI
+             half-width of the batch mean is within --target of the mean
+  link_down  --down-s consecutive seconds without a byte sent
+
+Stopping sends SIGINT, the way an interactive iperf3 is stopped. The
+output file is still a complete iperf3 -J record ("start", "intervals",
+"end") that analyze_starlink_run.py's parse_iperf3 reads as before: the
+"end" sums are rebuilt from the intervals received, since iperf3's own
+summary after an interrupt comes with an "interrupt" error. The record
+also gets an "early_stop" block (reason, seconds run, planned seconds,
+estimate, relative CI, retransmits). Runs that finish on their own keep
+iperf3's "end" unchanged.
+
+UDP runs are never stopped for convergence: the client only sees its own
+send rate, and jitter/loss arrive from the server in the final summary.
+iperf3 older than 3.17 (no --json-stream) runs with -J as before.
+
+Usage:
+  python3 iperf_live.py --out iperf3_raw.json [--target 0.05]
+                        [--confidence 0.95] [--min-s 20] [--warmup-s 2]
+                        [--batch-s 5] [--down-s 10]
+                        -- iperf3 -c HOST -p PORT -t 60 [...]
+"""
+
+import argparse
+import json
+import math
+import re
+import signal
+import subprocess
+import sys
+import threading
+
+from adaptive_reps import ci_score
+
+JSON_STREAM_MIN_VERSION = (3, 17)
+KILL_AFTER_S = 10.0
+
+
+def supports_json_stream(iperf_bin):
+    try:
+        out = subprocess.run([iperf_bin, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return False
+    m = re.search(r"iperf (\d+)\.(\d+)", out)
+    return bool(m) and (int(m.group(1)), int(m.group(2))) >= JSON_STREAM_MIN_VERSION
+
+
+class LiveEstimate:
+    """
+    Running throughput / retransmit estimate over iperf3 interval events.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.t = 0.0
+        self.bytes = 0
+        self.retransmits = 0
+        self.zero_s = 0.0
+        self.batches = []
+        self._batch_bytes = 0
+        self._batch_s = 0.0
+
+    def add(self, sum_):
+        if sum_.get("omitted"):
+            return
+        seconds = sum_.get("seconds", 0.0)
+        nbytes = sum_.get("bytes", 0)
+        self.t = sum_.get("end", self.t + seconds)
+        self.bytes += nbytes
+        self.retransmits += sum_.get("retransmits", 0) or 0
+        self.zero_s = self.zero_s + seconds if nbytes == 0 else 0.0
+        if self.t <= self.args.warmup_s:
+            return
+        self._batch_bytes += nbytes
+        self._batch_s += seconds
+        if self._batch_s >= self.args.batch_s:
+            self.batches.append(self._batch_bytes * 8 / self._batch_s / 1e6)
+            self._batch_bytes = 0
+            self._batch_s = 0.0
+
+    def mbps(self):
+        return self.bytes * 8 / self.t / 1e6 if self.t > 0 else 0.0
+
+    def rel_ci(self):
+        """
+        Relative CI half-width of the batch-mean throughput (inf until
+        there are two batches).
+        """
+        return ci_score(self.batches, self.args.confidence, 1.0)
+
+    def stop_reason(self, tcp):
+        if self.zero_s >= self.args.down_s:
+            return "link_down"
+        if tcp and self.t >= self.args.min_s and self.rel_ci() <= self.args.target:
+            return "converged"
+        return None
+
+
+def rebuild_end(intervals, tcp):
+    """
+    iperf3 -J "end" sums (sender side) from the interval events.
+    """
+    streams = {}
+    for iv in intervals:
+        for s in iv.get("streams", []):
+            if s.get("omitted"):
+                continue
+            st = streams.setdefault(s.get("socket"), {"bytes": 0, "retransmits": 0, "packets": 0, "end": 0.0})
+            st["bytes"] += s.get("bytes", 0)
+            st["retransmits"] += s.get("retransmits", 0) or 0
+            st["packets"] += s.get("packets", 0) or 0
+            st["end"] = max(st["end"], s.get("end", 0.0))
+
+    def summary(nbytes, end, retransmits, packets, socket=None):
+        d = {} if socket is None else {"socket": socket}
+        d.update(
+            {
+                "start": 0,
+                "end": end,
+                "seconds": end,
+                "bytes": nbytes,
+                "bits_per_second": nbytes * 8 / end if end > 0 else 0.0,
+            }
+        )
+        if tcp:
+            d["retransmits"] = retransmits
+        else:
+            d["packets"] = packets
+        d["sender"] = True
+        return d
+
+    end_t = max((st["end"] for st in streams.values()), default=0.0)
+    total = summary(
+        sum(st["bytes"] for st in streams.values()),
+        end_t,
+        sum(st["retransmits"] for st in streams.values()),
+        sum(st["packets"] for st in streams.values()),
+    )
+    per_stream = [
+        {"sender" if tcp else "udp": summary(st["bytes"], st["end"], st["retransmits"], st["packets"], sock)}
+        for sock, st in streams.items()
+    ]
+    if tcp:
+        return {"streams": per_stream, "sum_sent": total}
+    return {"streams": per_stream, "sum": total}
+
+
+def run_live(args, cmd):
+    record = {"start": {}, "intervals": []}
+    est = LiveEstimate(args)
+    tcp = True
+    stopped = None
+    watchdog = None
+
+    proc = subprocess.Popen(cmd + ["--json-stream"], stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        try:
+            ev = json.loads(line)
+        except ValueError:
+            continue
+        kind, data = ev.get("event"), ev.get("data")
+        if kind == "start":
+            record["start"] = data
+            tcp = data.get("test_start", {}).get("protocol", "TCP") == "TCP"
+        elif kind == "interval":
+            # A last partial interval may still arrive after the SIGINT
+            record["intervals"].append(data)
+            est.add(data.get("sum", {}))
+            if stopped is None:
+                reason = est.stop_reason(tcp)
+                if reason:
+                    stopped = reason
+                    proc.send_signal(signal.SIGINT)
+                    watchdog = threading.Timer(KILL_AFTER_S, proc.kill)
+                    watchdog.start()
+        elif stopped is None and kind == "end":
+            record["end"] = data
+        elif stopped is None and kind == "error":
+            record["error"] = data
+    rc = proc.wait()
+    if watchdog is not None:
+        watchdog.cancel()
+
+    planned_s = record["start"].get("test_start", {}).get("duration")
+    if stopped is not None:
+        record["end"] = rebuild_end(record["intervals"], tcp)
+        rel = est.rel_ci()
+        record["early_stop"] = {
+            "reason": stopped,
+            "seconds": est.t,
+            "planned_seconds": planned_s,
+            "throughput_mbps": est.mbps(),
+            "rel_ci": None if math.isinf(rel) else rel,
+            "batches": len(est.batches),
+            "retransmits": est.retransmits if tcp else None,
+        }
+        print(
+            f"[*] iperf3 stopped at {est.t:.0f}s of {planned_s}s ({stopped}): "
+            f"{est.mbps():.2f} Mbps, {est.retransmits} retransmits"
+            + ("" if math.isinf(rel) else f", CI +/-{100 * rel:.1f}%")
+        )
+        rc = 0
+    elif "end" not in record and "error" not in record:
+        record["error"] = f"iperf3 exited ({rc}) without a summary"
+
+    with open(args.out, "w") as f:
+        json.dump(record, f, indent=2)
+    return rc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="iperf3 --json-stream with convergence-based early stop")
+    ap.add_argument("--out", required=True, help="iperf3 -J compatible JSON output")
+    ap.add_argument("--target", type=float, default=0.05, help="relative CI half-width to stop at")
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--min-s", type=float, default=20.0, help="never stop for convergence before this")
+    ap.add_argument("--warmup-s", type=float, default=2.0, help="slow start, left out of the estimate")
+    ap.add_argument("--batch-s", type=float, default=5.0, help="batch length for the batch-means CI")
+    ap.add_argument("--down-s", type=float, default=10.0, help="seconds without a byte sent = link down")
+    ap.add_argument("cmd", nargs=argparse.REMAINDER, help="-- iperf3 command (without -J)")
+    args = ap.parse_args()
+
+    cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+    if not cmd:
+        ap.error("missing iperf3 command")
+
+    if not supports_json_stream(cmd[0]):
+        print("[!] iperf3 has no --json-stream (needs 3.17+); running the full test with -J", file=sys.stderr)
+        with open(args.out, "w") as f:
+            sys.exit(subprocess.run(cmd + ["-J"], stdout=f).returncode)
+
+    sys.exit(run_live(args, cmd))
+
+
+if __name__ == "__main__":
+    main()
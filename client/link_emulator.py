@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Trace-driven link emulator: a local TCP proxy that replays recorded
+Starlink conditions for offline QoE runs.
+
+    QoE script --> 127.0.0.1:LISTEN --[emulated link]--> TARGET (anchor)
+
+The trace comes from a results_starlink run directory (or separate files):
+
+    rate     per-interval throughput from iperf3_raw.json intervals
+    rtt      gateway ping RTT from ping_gw_raw.log (or gw_ping_samples.csv)
+    outages  runs of >= OUTAGE_MIN_LOST consecutive lost pings: the link
+             carries nothing until the next reply. A single lost ping
+             adds one extra RTT in that step (a TCP retransmission).
+
+and is resampled to one row per STEP_S (rate_mbps, rtt_ms, up). It can
+also be written/read as CSV (--dump-trace / --trace), so a measured hour
+can be replayed exactly, edited, or used to compare policies.
+
+Emulation, server -> client: every chunk read from the target reserves
+time on one bottleneck shared by all connections (token bucket at the
+trace rate of the step it is sent in; zero during outages), then sits in
+a per-connection FIFO delay queue for RTT/2 before it is written to the
+client. Client -> server gets the same RTT/2 delay, no shaping. Reading
+stops while a connection has more than QUEUE_LIMIT_BYTES queued, so TCP
+backpressure reaches the target like a bottleneck buffer. The work per
+chunk is O(1), so one core sustains several hundred Mbps.
+
+The trace clock starts at proxy start, or at the first connection with
+--clock first-conn (deterministic replays of short scripts); past its
+end the trace loops (--loop) or holds the last step.
+
+Usage:
+  python3 link_emulator.py --run-dir ~/analysis/results_starlink/<run> \\
+      --listen 127.0.0.1:9080 --target 135.116.56.45:8080
+  ANCHOR_HTTP=127.0.0.1 HTTP_PORT=9080 ./run_starlink_web_qoe.sh ...
+
+  python3 link_emulator.py --run-dir <run> --dump-trace trace.csv
+  python3 link_emulator.py --trace trace.csv --target 127.0.0.1:8080
+"""
+
+import argparse
+import asyncio
+import collections
+import csv
+import json
+import math
+import os
+import re
+import sys
+
+STEP_S = 0.1
+CHUNK_BYTES = 64 * 1024
+QUEUE_LIMIT_BYTES = 4 * 1024 * 1024
+OUTAGE_MIN_LOST = 2
+DEFAULT_PING_INTERVAL_S = 1.0
+DEFAULT_RATE_MBPS = 100.0
+DEFAULT_RTT_MS = 40.0
+
+_seq_re = re.compile(r"icmp_seq[=\s](\d+)")
+_time_re = re.compile(r"time[=<]([\d\.]+)\s*ms")
+_ts_re = re.compile(r"^\[(\d+(?:\.\d+)?)\]")
+
+
+class Trace:
+    """
+    Per-step link conditions: rate (bit/s), one-way delay (s), up flag.
+    """
+
+    def __init__(self, rate_bps, rtt_ms, up, step_s=STEP_S, loop=False):
+        self.rate = list(rate_bps)
+        self.rtt_ms = list(rtt_ms)
+        self.up = list(up)
+        self.step = step_s
+        self.loop = loop
+        self.n = len(self.rate)
+        # Rate held past the end of a non-looping trace: the last step,
+        # unless that step is 0 bit/s (an outage interval)
+        positive = [r for r in self.rate if r > 0]
+        if not positive:
+            raise ValueError("trace has no positive rate")
+        if loop and not any(r > 0 and u for r, u in zip(self.rate, self.up)):
+            raise ValueError("looping trace is never up with a positive rate")
+        self.hold_rate = positive[-1]
+
+    @property
+    def duration_s(self):
+        return self.n * self.step
+
+    def _wrap(self, k):
+        if k < self.n:
+            return max(k, 0)
+        return k % self.n if self.loop else self.n - 1
+
+    def rate_at(self, k):
+        """
+        Rate of step k; when holding the last step the link stays up
+        (at hold_rate if the last step has no rate).
+        """
+        i = self._wrap(k)
+        if k >= self.n and not self.loop:
+            return self.rate[i] if self.rate[i] > 0 else self.hold_rate
+        if self.up[i]:
+            return self.rate[i]
+        return 0.0
+
+    def owd_s(self, t):
+        return self.rtt_ms[self._wrap(int(t / self.step))] / 2000.0
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["t_s", "rate_mbps", "rtt_ms", "up"])
+            for i in range(self.n):
+                w.writerow(
+                    [f"{i * self.step:.3f}", f"{self.rate[i] / 1e6:.3f}", f"{self.rtt_ms[i]:.3f}", int(self.up[i])]
+                )
+
+    @classmethod
+    def read_csv(cls, path, loop=False):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            raise ValueError(f"empty trace: {path}")
+        step = float(rows[1]["t_s"]) - float(rows[0]["t_s"]) if len(rows) > 1 else STEP_S
+        return cls(
+            [float(r["rate_mbps"]) * 1e6 for r in rows],
+            [float(r["rtt_ms"]) for r in rows],
+            [r["up"] not in ("0", "") for r in rows],
+            step_s=step,
+            loop=loop,
+        )
+
+
+def iperf_rate_series(json_path):
+    """
+    (start_s, end_s, bits_per_second) per iperf3 interval.
+    """
+    with open(json_path) as f:
+        data = json.load(f)
+    out = []
+    for iv in data.get("intervals", []):
+        s = iv.get("sum", {})
+        if "bits_per_second" in s:
+            out.append((float(s["start"]), float(s["end"]), float(s["bits_per_second"])))
+    return out
+
+
+def ping_series(path, interval_s=None):
+    """
+    (t_s, rtt_ms or None for a lost seq) on the icmp_seq timeline, from a
+    raw ping log (ping -D timestamps give the interval) or a
+    seq,rtt_ms samples CSV.
+    """
+    replies = {}
+    stamps = []
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    replies[int(row["seq"])] = float(row["rtt_ms"])
+                except (KeyError, ValueError):
+                    continue
+    else:
+        with open(path, errors="replace") as f:
+            for line in f:
+                m_seq = _seq_re.search(line)
+                m_time = _time_re.search(line)
+                if not m_seq or not m_time or "DUP!" in line:
+                    continue
+                seq = int(m_seq.group(1))
+                replies[seq] = float(m_time.group(1))
+                m_ts = _ts_re.match(line)
+                if m_ts:
+                    stamps.append((seq, float(m_ts.group(1))))
+    if not replies:
+        return [], interval_s or DEFAULT_PING_INTERVAL_S
+
+    if interval_s is None:
+        interval_s = DEFAULT_PING_INTERVAL_S
+        if len(stamps) >= 2 and stamps[-1][0] > stamps[0][0]:
+            interval_s = (stamps[-1][1] - stamps[0][1]) / (stamps[-1][0] - stamps[0][0])
+    first = min(replies)
+    last = max(replies)
+    return [((s - first) * interval_s, replies.get(s)) for s in range(first, last + 1)], interval_s
+
+
+def build_trace(iperf_json=None, ping_path=None, ping_interval_s=None, step_s=STEP_S, loop=False, rate_scale=1.0):
+    rates = iperf_rate_series(iperf_json) if iperf_json and os.path.isfile(iperf_json) else []
+    pings, interval_s = ping_series(ping_path, ping_interval_s) if ping_path and os.path.isfile(ping_path) else ([], None)
+    if not rates and not pings:
+        raise ValueError("no usable iperf3 intervals or ping samples")
+
+    duration = max([e for _, e, _ in rates] + [t + interval_s for t, _ in pings] + [step_s])
+    n = int(math.ceil(duration / step_s))
+
+    mean_rate = sum(r for _, _, r in rates) / len(rates) if rates else DEFAULT_RATE_MBPS * 1e6
+    rate = [mean_rate] * n
+    for start, end, bps in rates:
+        for i in range(int(start / step_s), min(n, int(math.ceil(end / step_s)))):
+            rate[i] = bps
+    rate = [r * rate_scale for r in rate]
+
+    rtt = [DEFAULT_RTT_MS] * n
+    up = [True] * n
+    replies = [(t, r) for t, r in pings if r is not None]
+    if replies:
+        # RTT holds from one reply to the next
+        bounds = [0.0] + [t for t, _ in replies[1:]] + [duration]
+        for (_, r), t_a, t_b in zip(replies, bounds, bounds[1:]):
+            for i in range(int(t_a / step_s), min(n, int(math.ceil(t_b / step_s)))):
+                rtt[i] = r
+
+        lost_run = []
+        for t, r in pings + [(duration, 0.0)]:
+            if r is None:
+                lost_run.append(t)
+                continue
+            if lost_run:
+                i0 = int(lost_run[0] / step_s)
+                i1 = min(n, int(math.ceil((lost_run[-1] + interval_s) / step_s)))
+                for i in range(i0, i1):
+                    if len(lost_run) >= OUTAGE_MIN_LOST:
+                        up[i] = False
+                    else:
+                        rtt[i] *= 2
+                lost_run = []
+    return Trace(rate, rtt, up, step_s=step_s, loop=loop)
+
+
+class Link:
+    """
+    Shared bottleneck: virtual-time token bucket over the trace rate.
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.t0 = None
+        self.free_at = 0.0
+        self.bytes = 0
+
+    def start(self, now):
+        if self.t0 is None:
+            self.t0 = now
+            self.free_at = now
+
+    def reserve(self, nbytes, now):
+        """
+        Serialize nbytes after everything already queued; returns the
+        (loop-clock) time the last bit leaves the bottleneck.
+        """
+        tr = self.trace
+        t = max(now, self.free_at) - self.t0
+        k = int(t / tr.step)
+        bits = nbytes * 8.0
+        while bits > 0:
+            slot_end = (k + 1) * tr.step
+            r = tr.rate_at(k)
+            if slot_end <= t or r <= 0:
+                k += 1
+                t = max(t, slot_end)
+                continue
+            cap = (slot_end - t) * r
+            if bits <= cap:
+                t += bits / r
+                bits = 0
+            else:
+                bits -= cap
+                t = slot_end
+                k += 1
+        self.free_at = t + self.t0
+        self.bytes += nbytes
+        return self.free_at
+
+
+async def pipe(reader, writer, link, trace_clock, shape):
+    """
+    Copy reader -> writer through the delay queue (and the shared
+    bottleneck when `shape`).
+    """
+    loop = asyncio.get_running_loop()
+    queue = collections.deque()
+    queued = [0]
+    have_data = asyncio.Event()
+    room = asyncio.Event()
+    room.set()
+
+    async def feed():
+        last = 0.0
+        while True:
+            data = await reader.read(CHUNK_BYTES)
+            now = loop.time()
+            if not data:
+                queue.append((last, b""))
+                have_data.set()
+                return
+            sent = link.reserve(len(data), now) if shape else now
+            # FIFO: a late chunk delays everything behind it
+            last = max(last, sent + link.trace.owd_s(sent - trace_clock()))
+            queue.append((last, data))
+            queued[0] += len(data)
+            have_data.set()
+            if queued[0] > QUEUE_LIMIT_BYTES:
+                room.clear()
+                await room.wait()
+
+    async def drain():
+        while True:
+            if not queue:
+                have_data.clear()
+                await have_data.wait()
+                continue
+            at, data = queue.popleft()
+            delay = at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not data:
+                if writer.can_write_eof():
+                    writer.write_eof()
+                return
+            writer.write(data)
+            queued[0] -= len(data)
+            if queued[0] <= QUEUE_LIMIT_BYTES // 2:
+                room.set()
+            await writer.drain()
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        await drain()
+    finally:
+        feeder.cancel()
+
+
+class Proxy:
+    def __init__(self, target_host, target_port, trace):
+        self.target = (target_host, target_port)
+        self.link = Link(trace)
+        self.conn_id = 0
+
+    def trace_clock(self):
+        return self.link.t0
+
+    async def handle(self, c_reader, c_writer):
+        loop = asyncio.get_running_loop()
+        self.link.start(loop.time())
+        self.conn_id += 1
+        cid = self.conn_id
+        t_open = loop.time()
+        try:
+            s_reader, s_writer = await asyncio.open_connection(*self.target)
+        except OSError as e:
+            print(f"[!] conn {cid}: upstream {self.target[0]}:{self.target[1]} failed: {e}", file=sys.stderr)
+            c_writer.close()
+            return
+        bytes_before = self.link.bytes
+        try:
+            await asyncio.gather(
+                pipe(c_reader, s_writer, self.link, self.trace_clock, shape=False),
+                pipe(s_reader, c_writer, self.link, self.trace_clock, shape=True),
+            )
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            for w in (c_writer, s_writer):
+                w.close()
+        dt = loop.time() - t_open
+        print(
+            f"[*] conn {cid}: {dt:.2f}s, link carried {(self.link.bytes - bytes_before) / 1e6:.2f} MB "
+            f"since open (t={loop.time() - self.link.t0:.1f}s into trace)"
+        )
+
+
+def _host_port(s, default_host="127.0.0.1"):
+    host, _, port = s.rpartition(":")
+    return host or default_host, int(port)
+
+
+async def serve(args, trace):
+    host, port = _host_port(args.listen)
+    t_host, t_port = _host_port(args.target)
+    proxy = Proxy(t_host, t_port, trace)
+    if args.clock == "start":
+        proxy.link.start(asyncio.get_running_loop().time())
+    server = await asyncio.start_server(proxy.handle, host, port)
+    print(
+        f"[*] Emulating {trace.duration_s:.1f}s trace ({'loop' if trace.loop else 'hold last'}) "
+        f"on {host}:{port} -> {t_host}:{t_port}"
+    )
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Trace-driven link emulator proxy")
+    ap.add_argument("--run-dir", help="results_starlink run dir (iperf3_raw.json + ping_gw_raw.log)")
+    ap.add_argument("--iperf", help="iperf3 JSON for the rate trace")
+    ap.add_argument("--ping", help="ping log or seq,rtt_ms CSV for RTT/outages")
+    ap.add_argument("--ping-interval", type=float, default=None, help="seconds (default: from ping -D stamps, else 1)")
+    ap.add_argument("--trace", help="trace CSV written by --dump-trace")
+    ap.add_argument("--step", type=float, default=STEP_S)
+    ap.add_argument("--rate-scale", type=float, default=1.0, help="multiply trace rates (policy what-ifs)")
+    ap.add_argument("--loop", action="store_true", help="loop the trace instead of holding the last step")
+    ap.add_argument("--clock", choices=("start", "first-conn"), default="start")
+    ap.add_argument("--listen", default="127.0.0.1:9080")
+    ap.add_argument("--target", default="127.0.0.1:8080")
+    ap.add_argument("--dump-trace", help="write the resampled trace CSV and exit")
+    args = ap.parse_args()
+    if args.rate_scale <= 0:
+        ap.error("--rate-scale must be > 0")
+
+    try:
+        if args.trace:
+            trace = Trace.read_csv(args.trace, loop=args.loop)
+        else:
+            iperf = args.iperf or (os.path.join(args.run_dir, "iperf3_raw.json") if args.run_dir else None)
+            ping = args.ping or (os.path.join(args.run_dir, "ping_gw_raw.log") if args.run_dir else None)
+            trace = build_trace(iperf, ping, args.ping_interval, args.step, args.loop, args.rate_scale)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[!] Cannot build trace: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.dump_trace:
+        trace.write_csv(args.dump_trace)
+        down = sum(1 for u in trace.up if not u) * trace.step
+        print(f"[*] Wrote {trace.n} steps ({trace.duration_s:.1f}s, {down:.1f}s down) to {args.dump_trace}")
+        return
+
+    try:
+        asyncio.run(serve(args, trace))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,14 @@
 #
 # "Audio" QoE via HTTP download of .mp3 asset.
 # Same metrics as web/video, stored in audio_timing.csv.
+#
+# PACED=1 streams the asset at its encoded bitrate instead (audio_stream.py):
+#   STREAMS                  concurrent paced streams per rep (default 1)
+#   CHUNK_MS                 audio per read (default 100)
+#   BUFFER_MS                simulated jitter buffer (default 500)
+#   BITRATE_KBPS             optional, else read from the MP3 frame header
+# Per-chunk lateness goes to audio_chunks.csv; underruns and the required
+# buffer depth are extra audio_timing.csv columns (one row per stream).
 
 set -euo pipefail
 source "$(dirname "$0")/common.sh"
@@ -16,12 +24,34 @@ TECH="${TECH:-starlink}"
 PLAN="${PLAN:-residential}"
 MODE="${MODE:-direct}"
 SLOT="${SLOT:-slot1}"
+PACED="${PACED:-0}"
+STREAMS="${STREAMS:-1}"
+CHUNK_MS="${CHUNK_MS:-100}"
+BUFFER_MS="${BUFFER_MS:-500}"
+BITRATE_KBPS="${BITRATE_KBPS:-}"
 
 OUT_DIR="${RESULTS_APPS_AUDIO}"
 mkdir -p "${OUT_DIR}"
 
 for r in $(seq 1 "${REPS}"); do
   TS_ID="$(timestamp_id)"
+
+  if [ "${PACED}" = "1" ]; then
+    RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_audio_${APP_KIND}_$(basename "${HTTP_FILE}")_paced${STREAMS}_${MODE}_${SLOT}_r${r}"
+    echo "[*] Audio QoE run ${r}/${REPS}: ${STREAMS} paced stream(s), ${BUFFER_MS} ms buffer"
+    echo "    RUN_DIR: ${RUN_DIR}"
+    python3 "$(dirname "$0")/audio_stream.py" \
+      --host "${ANCHOR_HTTP}" --port "${HTTP_PORT}" \
+      --file "${HTTP_FILE}" --streams "${STREAMS}" \
+      --chunk-ms "${CHUNK_MS}" --buffer-ms "${BUFFER_MS}" \
+      ${BITRATE_KBPS:+--bitrate-kbps "${BITRATE_KBPS}"} \
+      --run-dir "${RUN_DIR}" \
+      --slot "${SLOT}" --tech "${TECH}" --plan "${PLAN}" --mode "${MODE}" \
+      --app-kind "${APP_KIND}" --run-idx "${r}" \
+      || echo "[!] Some paced streams failed in ${RUN_DIR}"
+    continue
+  fi
+
   RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_audio_${APP_KIND}_$(basename "${HTTP_FILE}")_${MODE}_${SLOT}_r${r}"
   mkdir -p "${RUN_DIR}"
 
@@ -39,7 +69,8 @@ for r in $(seq 1 "${REPS}"); do
   tmp_out="${RUN_DIR}/curl_body.tmp"
   tmp_metrics="${RUN_DIR}/curl_metrics.txt"
 
-  curl -sS -o "${tmp_out}" -w \
+  # X-Run-Id lets the anchor's per-request log join with this run
+  curl -sS -o "${tmp_out}" -H "X-Run-Id: $(basename "${RUN_DIR}")" -w \
     "time_namelookup=%{time_namelookup}\n\
 time_connect=%{time_connect}\n\
 time_appconnect=%{time_appconnect}\n\
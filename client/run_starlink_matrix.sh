@@ -8,6 +8,14 @@
 #
 # Usage:
 #   REPS=3 DURATION=60 SLEEP_BETWEEN=15 MODES="direct" ./run_starlink_matrix.sh
+#
+# Adaptive repetitions (see adaptive_reps.py): instead of REPS runs per
+# cell, run each cell MIN_REPS times, then keep running whichever cell's
+# metrics are least settled until all converge, hit MAX_REPS or BUDGET_S
+# runs out:
+#   ADAPTIVE=1 MIN_REPS=3 MAX_REPS=10 TARGET_REL_CI=0.1 BUDGET_S=14400 \
+#     ./run_starlink_matrix.sh
+#   ADAPTIVE=1 RULE=baseline BASELINE_CELL=direct:tcp:5201:-:0 ./run_starlink_matrix.sh
 
 set -euo pipefail
 
@@ -27,11 +35,122 @@ PLAN="residential"
 : "${SLEEP_BETWEEN:=15}"
 : "${MODES:=direct}"   # later: "direct vpn"
 
+TCP_PORTS=(80 443 6881 5201)
+UDP_RATES=("1M" "5M" "10M")
+TOS_VALUES=(0 104 184)  # CS0, AF31, EF-ish
+
+: "${ADAPTIVE:=0}"
+: "${MIN_REPS:=3}"
+: "${MAX_REPS:=10}"
+: "${TARGET_REL_CI:=0.1}"
+: "${BUDGET_S:=0}"        # 0 = no time budget
+: "${RULE:=ci}"           # ci | baseline
+: "${BASELINE_CELL:=direct:tcp:5201:-:0}"
+ADAPTIVE_STATE="${BASE_DIR}/adaptive_reps_state.json"
+
 if [ ! -x "${SCENARIO_SCRIPT}" ]; then
   echo "[!] Scenario script not found or not executable: ${SCENARIO_SCRIPT}"
   exit 1
 fi
 
+# run_cell MODE PROTO PORT UDP_RATE TOS RUN_IDX  (UDP_RATE "-" for TCP)
+run_cell() {
+  local mode="$1" proto="$2" port="$3" rate="$4" tos="$5" r="$6"
+  local anchor="${ANCHOR_DIRECT}"
+  local rate_args=()
+  if [ "${mode}" != "direct" ]; then
+    anchor="${ANCHOR_VPN}"
+  fi
+  if [ "${proto}" = "udp" ]; then
+    rate_args=(-R "${rate}")
+  fi
+  "${SCENARIO_SCRIPT}" \
+    -a "${anchor}" \
+    -g "${GATEWAY}" \
+    -M "${mode}" \
+    -P "${proto}" \
+    -p "${port}" \
+    "${rate_args[@]}" \
+    -t "${TECH}" \
+    -L "${PLAN}" \
+    -D uplink \
+    -d "${DURATION}" \
+    -n "${r}" \
+    -T "${tos}"
+}
+
+if [ "${ADAPTIVE}" = "1" ]; then
+  ADAPTIVE_PY="$(dirname "$0")/adaptive_reps.py"
+  CELLS=()
+  for mode in ${MODES}; do
+    for port in "${TCP_PORTS[@]}"; do
+      CELLS+=("${mode}:tcp:${port}:-:0")
+    done
+    for rate in "${UDP_RATES[@]}"; do
+      CELLS+=("${mode}:udp:5201:${rate}:0")
+    done
+  done
+  for tos in "${TOS_VALUES[@]}"; do
+    CELLS+=("direct:tcp:443:-:${tos}")
+  done
+
+  echo "[*] Running adaptive Starlink scenario matrix (${#CELLS[@]} cells)..."
+  echo "    MIN_REPS      = ${MIN_REPS}"
+  echo "    MAX_REPS      = ${MAX_REPS}"
+  echo "    TARGET_REL_CI = ${TARGET_REL_CI}"
+  echo "    BUDGET_S      = ${BUDGET_S}"
+  echo "    RULE          = ${RULE}"
+  echo "    DURATION      = ${DURATION}s"
+  echo "    SLEEP_BETWEEN = ${SLEEP_BETWEEN}s"
+
+  baseline_args=()
+  if [ "${RULE}" = "baseline" ]; then
+    baseline_args=(--baseline "${BASELINE_CELL}")
+  fi
+  python3 "${ADAPTIVE_PY}" init --state "${ADAPTIVE_STATE}" \
+    --min-reps "${MIN_REPS}" --max-reps "${MAX_REPS}" \
+    --target "${TARGET_REL_CI}" --budget-s "${BUDGET_S}" \
+    --rule "${RULE}" "${baseline_args[@]}"
+
+  # matrix_pending is the controller's upper bound (MAX_REPS for open cells).
+  # `next` exits 3 once the campaign is done; anything else is an error.
+  while true; do
+    rc=0
+    line=$(python3 "${ADAPTIVE_PY}" next --state "${ADAPTIVE_STATE}" "${CELLS[@]}") || rc=$?
+    if [ "${rc}" -eq 3 ]; then
+      break
+    elif [ "${rc}" -ne 0 ]; then
+      echo "[!] adaptive_reps.py next failed (exit ${rc}); stopping the matrix"
+      exit 1
+    fi
+    read -r mode proto port rate tos r pending <<< "${line}"
+    export_metric queue --name matrix_pending --depth "${pending}"
+    echo
+    echo "[*] Adaptive scenario: mode=${mode} proto=${proto} port=${port} rate=${rate} tos=${tos} run=${r}"
+    run_cell "${mode}" "${proto}" "${port}" "${rate}" "${tos}" "${r}" || \
+      echo "[!] Scenario failed, counted towards MAX_REPS"
+
+    echo "[*] Sleeping ${SLEEP_BETWEEN}s..."
+    sleep "${SLEEP_BETWEEN}"
+  done
+  export_metric queue --name matrix_pending --depth 0
+  export_metric scan
+
+  echo
+  echo "[*] Adaptive matrix complete. Results under: ${RESULTS_STARLINK}"
+  exit 0
+fi
+
+# Remaining scenarios, exported as starlink_queue_depth{queue="matrix_pending"}
+n_modes=$(wc -w <<< "${MODES}")
+pending=$(( (n_modes * (${#TCP_PORTS[@]} + ${#UDP_RATES[@]}) + ${#TOS_VALUES[@]}) * REPS ))
+export_metric queue --name matrix_pending --depth "${pending}"
+
+scenario_done() {
+  pending=$(( pending - 1 ))
+  export_metric queue --name matrix_pending --depth "${pending}"
+}
+
 echo "[*] Running Starlink scenario matrix..."
 echo "    ANCHOR_DIRECT = ${ANCHOR_DIRECT}"
 echo "    ANCHOR_VPN    = ${ANCHOR_VPN}"
@@ -45,31 +164,13 @@ echo "    MODES         = ${MODES}"
 
 # --- 1. TCP ports (RQ1) --------------------------------------------
 
-TCP_PORTS=(80 443 6881 5201)
-
 for mode in ${MODES}; do
-  if [ "${mode}" = "direct" ]; then
-    anchor="${ANCHOR_DIRECT}"
-  else
-    anchor="${ANCHOR_VPN}"
-  fi
-
   for port in "${TCP_PORTS[@]}"; do
     for r in $(seq 1 "${REPS}"); do
       echo
       echo "[*] TCP scenario: mode=${mode} port=${port} run=${r}"
-      "${SCENARIO_SCRIPT}" \
-        -a "${anchor}" \
-        -g "${GATEWAY}" \
-        -M "${mode}" \
-        -P tcp \
-        -p "${port}" \
-        -t "${TECH}" \
-        -L "${PLAN}" \
-        -D uplink \
-        -d "${DURATION}" \
-        -n "${r}" \
-        -T 0
+      run_cell "${mode}" tcp "${port}" - 0 "${r}"
+      scenario_done
 
       echo "[*] Sleeping ${SLEEP_BETWEEN}s..."
       sleep "${SLEEP_BETWEEN}"
@@ -79,32 +180,13 @@ done
 
 # --- 2. UDP rates (RQ1) --------------------------------------------
 
-UDP_RATES=("1M" "5M" "10M")
-
 for mode in ${MODES}; do
-  if [ "${mode}" = "direct" ]; then
-    anchor="${ANCHOR_DIRECT}"
-  else
-    anchor="${ANCHOR_VPN}"
-  fi
-
   for rate in "${UDP_RATES[@]}"; do
     for r in $(seq 1 "${REPS}"); do
       echo
       echo "[*] UDP scenario: mode=${mode} rate=${rate} run=${r}"
-      "${SCENARIO_SCRIPT}" \
-        -a "${anchor}" \
-        -g "${GATEWAY}" \
-        -M "${mode}" \
-        -P udp \
-        -p 5201 \
-        -R "${rate}" \
-        -t "${TECH}" \
-        -L "${PLAN}" \
-        -D uplink \
-        -d "${DURATION}" \
-        -n "${r}" \
-        -T 0
+      run_cell "${mode}" udp 5201 "${rate}" 0 "${r}"
+      scenario_done
 
       echo "[*] Sleeping ${SLEEP_BETWEEN}s..."
       sleep "${SLEEP_BETWEEN}"
@@ -114,29 +196,19 @@ done
 
 # --- 3. DSCP subset (TOS) on port 443, direct mode -----------------
 
-TOS_VALUES=(0 104 184)  # CS0, AF31, EF-ish
-
 for tos in "${TOS_VALUES[@]}"; do
   for r in $(seq 1 "${REPS}"); do
     echo
     echo "[*] DSCP scenario: mode=direct port=443 tos=${tos} run=${r}"
-    "${SCENARIO_SCRIPT}" \
-      -a "${ANCHOR_DIRECT}" \
-      -g "${GATEWAY}" \
-      -M direct \
-      -P tcp \
-      -p 443 \
-      -t "${TECH}" \
-      -L "${PLAN}" \
-      -D uplink \
-      -d "${DURATION}" \
-      -n "${r}" \
-      -T "${tos}"
+    run_cell direct tcp 443 - "${tos}" "${r}"
+    scenario_done
 
     echo "[*] Sleeping ${SLEEP_BETWEEN}s..."
     sleep "${SLEEP_BETWEEN}"
   done
 done
 
+export_metric scan
+
 echo
 echo "[*] Matrix run complete. Results under: ${RESULTS_STARLINK}"
@@ -3,6 +3,10 @@
 #
 # Run an RQ3 "slot" campaign: web+video+audio, synthetic + real (if present).
 #
+# The web blobs (synthetic/test_20M.bin, synthetic/test_5M.bin) are served
+# virtually by the anchor and need not exist under web_qoe_assets/, so the
+# web runs always go ahead. Video/audio runs only use files found locally.
+#
 # Env:
 #   SLOT, REPS, ANCHOR_HTTP, HTTP_PORT, TECH, PLAN, MODE
 
@@ -51,23 +55,19 @@ pick_first() {
 
 echo "[*] Synthetic assets:"
 
-# 1) Web synthetic
+# 1) Web synthetic (served virtually by the anchor, no local file)
 SYN_WEB_FILE="synthetic/test_20M.bin"
-if [ -f "${ASSETS_BASE}/${SYN_WEB_FILE}" ]; then
-  echo "    - Web synthetic: ${SYN_WEB_FILE}"
-  ANCHOR_HTTP="${ANCHOR_HTTP}" \
-  HTTP_PORT="${HTTP_PORT}" \
-  HTTP_FILE="${SYN_WEB_FILE}" \
-  REPS="${REPS}" \
-  APP_KIND="synthetic" \
-  TECH="${TECH}" \
-  PLAN="${PLAN}" \
-  MODE="${MODE}" \
-  SLOT="${SLOT}" \
-  "${BASE_DIR}/run_starlink_web_qoe.sh"
-else
-  echo "    [!] Missing synthetic web file: ${SYN_WEB_FILE}"
-fi
+echo "    - Web synthetic: ${SYN_WEB_FILE}"
+ANCHOR_HTTP="${ANCHOR_HTTP}" \
+HTTP_PORT="${HTTP_PORT}" \
+HTTP_FILE="${SYN_WEB_FILE}" \
+REPS="${REPS}" \
+APP_KIND="synthetic" \
+TECH="${TECH}" \
+PLAN="${PLAN}" \
+MODE="${MODE}" \
+SLOT="${SLOT}" \
+"${BASE_DIR}/run_starlink_web_qoe.sh"
 
 # 2) Video synthetic
 SYN_VIDEO_FILE="synthetic/video_30s_1080p.mp4"
@@ -113,21 +113,19 @@ echo "[*] Real assets (if present):"
 REAL_VIDEO_NAME="$(pick_first "${ASSETS_BASE}/real/video/*.mp4")"
 REAL_AUDIO_NAME="$(pick_first "${ASSETS_BASE}/real/audio/*.mp3")"
 
-# 1) Web "real" placeholder: use test_5M.bin but mark as real
+# 1) Web "real" placeholder: use test_5M.bin (virtual) but mark as real
 REAL_WEB_FILE="synthetic/test_5M.bin"
-if [ -f "${ASSETS_BASE}/${REAL_WEB_FILE}" ]; then
-  echo "    - Web 'real' placeholder: ${REAL_WEB_FILE}"
-  ANCHOR_HTTP="${ANCHOR_HTTP}" \
-  HTTP_PORT="${HTTP_PORT}" \
-  HTTP_FILE="${REAL_WEB_FILE}" \
-  REPS="${REPS}" \
-  APP_KIND="real" \
-  TECH="${TECH}" \
-  PLAN="${PLAN}" \
-  MODE="${MODE}" \
-  SLOT="${SLOT}" \
-  "${BASE_DIR}/run_starlink_web_qoe.sh"
-fi
+echo "    - Web 'real' placeholder: ${REAL_WEB_FILE}"
+ANCHOR_HTTP="${ANCHOR_HTTP}" \
+HTTP_PORT="${HTTP_PORT}" \
+HTTP_FILE="${REAL_WEB_FILE}" \
+REPS="${REPS}" \
+APP_KIND="real" \
+TECH="${TECH}" \
+PLAN="${PLAN}" \
+MODE="${MODE}" \
+SLOT="${SLOT}" \
+"${BASE_DIR}/run_starlink_web_qoe.sh"
 
 # 2) Video real
 if [ -n "${REAL_VIDEO_NAME}" ]; then
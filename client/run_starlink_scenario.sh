@@ -17,6 +17,11 @@
 #   -d duration_sec (iperf runtime, default 60)
 #   -n run_idx
 #   -T tos (TOS byte / DSCP*4, default 0)
+#
+# LIVE=1 runs iperf3 through iperf_live.py (--json-stream): the test stops
+# once the TCP throughput estimate has converged (LIVE_TARGET_REL_CI,
+# not before LIVE_MIN_S) or nothing was sent for LIVE_DOWN_S; -d is then
+# the upper bound. iperf3_raw.json stays a complete -J style record.
 
 set -euo pipefail
 source "$(dirname "$0")/common.sh"
@@ -34,6 +39,11 @@ DURATION=60
 RUN_IDX=1
 TOS=0
 
+LIVE="${LIVE:-0}"
+LIVE_TARGET_REL_CI="${LIVE_TARGET_REL_CI:-0.05}"
+LIVE_MIN_S="${LIVE_MIN_S:-20}"
+LIVE_DOWN_S="${LIVE_DOWN_S:-10}"
+
 while getopts "a:g:M:P:p:R:t:L:D:d:n:T:" opt; do
   case "$opt" in
     a) ANCHOR="$OPTARG" ;;
@@ -88,19 +98,20 @@ META="${RUN_DIR}/run_metadata.txt"
   echo "direction=${DIRECTION}"
   echo "duration_sec=${DURATION}"
   echo "run_idx=${RUN_IDX}"
+  echo "live=${LIVE}"
 } > "${META}"
 
 IPERF_JSON="${RUN_DIR}/iperf3_raw.json"
 IPERF_LOG="${RUN_DIR}/iperf3_stderr.log"
 
-CMD=(iperf3 -c "${ANCHOR}" -p "${PORT}" -t "${DURATION}" -J)
+CMD=(iperf3 -c "${ANCHOR}" -p "${PORT}" -t "${DURATION}")
 
 if [ "${PROTO}" = "udp" ]; then
   if [ -z "${UDP_RATE}" ]; then
     echo "[!] UDP mode but no -R udp_rate specified"
     exit 1
   fi
-  CMD=(iperf3 -u -b "${UDP_RATE}" -c "${ANCHOR}" -p "${PORT}" -t "${DURATION}" -J)
+  CMD=(iperf3 -u -b "${UDP_RATE}" -c "${ANCHOR}" -p "${PORT}" -t "${DURATION}")
 fi
 
 # Apply TOS/DSCP if non-zero
@@ -108,8 +119,19 @@ if [ "${TOS}" -ne 0 ]; then
   CMD+=("--tos" "${TOS}")
 fi
 
-echo "[*] Running iperf3: ${CMD[*]}"
-"${CMD[@]}" > "${IPERF_JSON}" 2> "${IPERF_LOG}" || echo "[!] iperf3 returned non-zero; check ${IPERF_LOG}"
+if [ "${LIVE}" = "1" ]; then
+  echo "[*] Running iperf3 (live, early stop): ${CMD[*]}"
+  python3 "$(dirname "$0")/iperf_live.py" \
+    --out "${IPERF_JSON}" \
+    --target "${LIVE_TARGET_REL_CI}" \
+    --min-s "${LIVE_MIN_S}" \
+    --down-s "${LIVE_DOWN_S}" \
+    -- "${CMD[@]}" 2> "${IPERF_LOG}" || echo "[!] iperf3 returned non-zero; check ${IPERF_LOG}"
+else
+  CMD+=("-J")
+  echo "[*] Running iperf3: ${CMD[*]}"
+  "${CMD[@]}" > "${IPERF_JSON}" 2> "${IPERF_LOG}" || echo "[!] iperf3 returned non-zero; check ${IPERF_LOG}"
+fi
 
 ANALYZER="${BASE_DIR}/analyze_starlink_run.py"
 if [ -f "${ANALYZER}" ]; then
@@ -3,6 +3,16 @@
 #
 # "Video" QoE via HTTP download of .mp4 asset.
 # Same metrics as web_timing but stored as video_timing.csv.
+#
+# SEGMENTED=1 plays the DASH-style segment list instead (video_segments.py):
+#   SEG_TEMPLATE             e.g., video_segments_1M/seg_{:02d}.bin
+#   SEG_COUNT                e.g., 60
+#   SEG_DEPTH                requests in flight on the keep-alive connection
+#                            (1 = no pipelining)
+#   SEG_DURATION_S           media seconds per segment (default 1)
+#   SEG_MAX_BUFFER_S         buffer target, 0 = fetch as fast as possible
+# Per-segment timestamps go to video_segments.csv, startup delay / stalls /
+# per-segment percentiles are extra video_timing.csv columns.
 
 set -euo pipefail
 source "$(dirname "$0")/common.sh"
@@ -16,12 +26,36 @@ TECH="${TECH:-starlink}"
 PLAN="${PLAN:-residential}"
 MODE="${MODE:-direct}"
 SLOT="${SLOT:-slot1}"
+SEGMENTED="${SEGMENTED:-0}"
+SEG_TEMPLATE="${SEG_TEMPLATE:-video_segments_1M/seg_{:02d}.bin}"
+SEG_COUNT="${SEG_COUNT:-60}"
+SEG_DEPTH="${SEG_DEPTH:-1}"
+SEG_DURATION_S="${SEG_DURATION_S:-1}"
+SEG_MAX_BUFFER_S="${SEG_MAX_BUFFER_S:-0}"
 
 OUT_DIR="${RESULTS_APPS_VIDEO}"
 mkdir -p "${OUT_DIR}"
 
 for r in $(seq 1 "${REPS}"); do
   TS_ID="$(timestamp_id)"
+
+  if [ "${SEGMENTED}" = "1" ]; then
+    RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_video_${APP_KIND}_segments_d${SEG_DEPTH}_${MODE}_${SLOT}_r${r}"
+    echo "[*] Video QoE run ${r}/${REPS}: ${SEG_COUNT} segments, depth ${SEG_DEPTH}"
+    echo "    Segments: ${SEG_TEMPLATE}"
+    echo "    RUN_DIR: ${RUN_DIR}"
+    python3 "$(dirname "$0")/video_segments.py" \
+      --host "${ANCHOR_HTTP}" --port "${HTTP_PORT}" \
+      --template "${SEG_TEMPLATE}" --count "${SEG_COUNT}" \
+      --depth "${SEG_DEPTH}" --seg-duration-s "${SEG_DURATION_S}" \
+      --max-buffer-s "${SEG_MAX_BUFFER_S}" \
+      --run-dir "${RUN_DIR}" \
+      --slot "${SLOT}" --tech "${TECH}" --plan "${PLAN}" --mode "${MODE}" \
+      --app-kind "${APP_KIND}" --run-idx "${r}" \
+      || echo "[!] Segment fetch failed in ${RUN_DIR}"
+    continue
+  fi
+
   RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_video_${APP_KIND}_$(basename "${HTTP_FILE}")_${MODE}_${SLOT}_r${r}"
   mkdir -p "${RUN_DIR}"
 
@@ -39,7 +73,8 @@ for r in $(seq 1 "${REPS}"); do
   tmp_out="${RUN_DIR}/curl_body.tmp"
   tmp_metrics="${RUN_DIR}/curl_metrics.txt"
 
-  curl -sS -o "${tmp_out}" -w \
+  # X-Run-Id lets the anchor's per-request log join with this run
+  curl -sS -o "${tmp_out}" -H "X-Run-Id: $(basename "${RUN_DIR}")" -w \
     "time_namelookup=%{time_namelookup}\n\
 time_connect=%{time_connect}\n\
 time_appconnect=%{time_appconnect}\n\
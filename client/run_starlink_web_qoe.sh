@@ -9,7 +9,16 @@
 #   HTTP_FILE                e.g., synthetic/test_20M.bin
 #   REPS                     e.g., 5
 #   APP_KIND                 synthetic|real
+#   VERIFY_SYNTHETIC         1 = check virtual synthetic bodies byte-for-byte
+#                            (anchor/synthetic_assets.py), result in
+#                            synthetic_verify.txt
 #   TECH, PLAN, MODE, SLOT   labels
+#   FLOWS                    e.g., 4 (default 1). >1 = household contention
+#                            mode: FLOWS concurrent downloads per rep via
+#                            web_multiflow.py (per-flow rows with flow_id,
+#                            aggregate + Jain index in multiflow_summary.txt)
+#   HTTP_FILES               optional comma list of assets cycled over the
+#                            flows (default: HTTP_FILE)
 
 set -euo pipefail
 source "$(dirname "$0")/common.sh"
@@ -23,12 +32,32 @@ TECH="${TECH:-starlink}"
 PLAN="${PLAN:-residential}"
 MODE="${MODE:-direct}"
 SLOT="${SLOT:-slot1}"
+VERIFY_SYNTHETIC="${VERIFY_SYNTHETIC:-0}"
+FLOWS="${FLOWS:-1}"
+HTTP_FILES="${HTTP_FILES:-${HTTP_FILE}}"
+SYNTHETIC_PY="$(dirname "$0")/../anchor/synthetic_assets.py"
 
 OUT_DIR="${RESULTS_APPS_WEB}"
 mkdir -p "${OUT_DIR}"
 
 for r in $(seq 1 "${REPS}"); do
   TS_ID="$(timestamp_id)"
+
+  if [ "${FLOWS}" -gt 1 ]; then
+    RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_web_${APP_KIND}_multiflow${FLOWS}_${MODE}_${SLOT}_r${r}"
+    echo "[*] Web QoE run ${r}/${REPS}: ${FLOWS} concurrent flows"
+    echo "    Assets: ${HTTP_FILES}"
+    echo "    RUN_DIR: ${RUN_DIR}"
+    python3 "$(dirname "$0")/web_multiflow.py" \
+      --host "${ANCHOR_HTTP}" --port "${HTTP_PORT}" \
+      --files "${HTTP_FILES}" --flows "${FLOWS}" \
+      --run-dir "${RUN_DIR}" \
+      --slot "${SLOT}" --tech "${TECH}" --plan "${PLAN}" --mode "${MODE}" \
+      --app-kind "${APP_KIND}" --run-idx "${r}" \
+      || echo "[!] Some flows failed in ${RUN_DIR}"
+    continue
+  fi
+
   RUN_DIR="${OUT_DIR}/${TS_ID}_${TECH}_web_${APP_KIND}_$(basename "${HTTP_FILE}")_${MODE}_${SLOT}_r${r}"
   mkdir -p "${RUN_DIR}"
 
@@ -47,7 +76,8 @@ for r in $(seq 1 "${REPS}"); do
   tmp_out="${RUN_DIR}/curl_body.tmp"
   tmp_metrics="${RUN_DIR}/curl_metrics.txt"
 
-  curl -sS -o "${tmp_out}" -w \
+  # X-Run-Id lets the anchor's per-request log join with this run
+  curl -sS -o "${tmp_out}" -H "X-Run-Id: $(basename "${RUN_DIR}")" -w \
     "time_namelookup=%{time_namelookup}\n\
 time_connect=%{time_connect}\n\
 time_appconnect=%{time_appconnect}\n\
@@ -63,6 +93,12 @@ speed_download=%{speed_download}\n" \
 
   echo "${ts_utc},${SLOT},${TECH},${PLAN},${MODE},web,${APP_KIND},$(basename "${HTTP_FILE}"),${ANCHOR_HTTP},${HTTP_PORT},${r},${URL},${time_namelookup},${time_connect},${time_appconnect},${time_pretransfer},${time_starttransfer},${time_total},${size_download},${speed_download}" >> "${CSV}"
 
+  if [ "${VERIFY_SYNTHETIC}" = "1" ] && [ "${APP_KIND}" = "synthetic" ]; then
+    python3 "${SYNTHETIC_PY}" verify "${tmp_out}" "${HTTP_FILE}" \
+      > "${RUN_DIR}/synthetic_verify.txt" 2>&1 \
+      || echo "[!] Synthetic body check failed: ${RUN_DIR}/synthetic_verify.txt"
+  fi
+
   rm -f "${tmp_out}" "${tmp_metrics}"
 done
 
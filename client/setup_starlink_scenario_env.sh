@@ -21,7 +21,7 @@ mkdir -p \
   "${RESULTS_APPS_VIDEO}" \
   "${RESULTS_APPS_AUDIO}"
 
-for f in analyze_gateway_ping.py analyze_starlink_run.py summarize_starlink_metrics.py; do
+for f in analyze_gateway_ping.py analyze_starlink_run.py summarize_starlink_metrics.py multiflow.py; do
   if [ ! -f "${BASE_DIR}/${f}" ]; then
     echo "[!] WARNING: Missing ${BASE_DIR}/${f}. Copy it from the repo analysis/ directory."
   fi
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Segmented (DASH-style) video fetch over one persistent HTTP/1.1 connection.
+
+run_starlink_video_qoe.sh times one curl of a whole MP4, which says
+nothing about per-segment delivery. This plays through a segment list
+(video_segments_1M/seg_01..60.bin by default, generated virtually by the
+anchor) the way a player does:
+
+  - one keep-alive connection; up to --depth requests in flight
+    (depth 1 = request/response, >1 = HTTP/1.1 pipelining / prefetch)
+  - optional --max-buffer-s: no request is sent while the media already
+    requested ahead of the playhead exceeds the buffer target (the
+    player's steady-state ON/OFF pattern)
+  - playback starts once --startup-segments segments are complete; a
+    segment finishing after its play deadline is a stall (the deadline
+    moves by the stall, like a player that rebuffers)
+
+Per-segment timestamps (seconds from the session start, perf_counter)
+go to a compact per-run file:
+
+  video_segments.csv   seg_idx,bytes,t_request,t_first_byte,t_complete
+
+The session also gets one video_timing.csv row: the curl-like columns
+cover the whole session (time_starttransfer = first byte of the first
+segment, time_total = last byte of the last segment) followed by
+SEGMENT_FIELDS (startup delay, stalls, per-segment TTFB / download time
+percentiles), which analyze_rq3_qoe.py summarizes into
+rq3_video_segments.csv.
+
+Usage:
+  python3 video_segments.py --host H --port P --run-dir DIR
+                            [--template video_segments_1M/seg_{:02d}.bin]
+                            [--count 60] [--depth 1] [--seg-duration-s 1]
+                            [--max-buffer-s 0] [--startup-segments 1]
+                            [--slot S --tech T --plan P --mode M
+                             --app-kind K --run-idx R]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from web_multiflow import TIMING_FIELDS, _content_length, _fmt
+
+READ_BYTES = 256 * 1024
+TIMEOUT_S = 600.0
+
+SEGMENT_LOG = "video_segments.csv"
+SEGMENT_LOG_FIELDS = ["seg_idx", "bytes", "t_request", "t_first_byte", "t_complete"]
+
+# Appended to the video_timing.csv schema (TIMING_FIELDS minus flow_id)
+SEGMENT_FIELDS = [
+    "n_segments",
+    "segments_ok",
+    "pipeline_depth",
+    "seg_duration_s",
+    "max_buffer_s",
+    "startup_delay_s",
+    "stall_count",
+    "stall_total_s",
+    "seg_ttfb_p50_s",
+    "seg_ttfb_p95_s",
+    "seg_time_p50_s",
+    "seg_time_p95_s",
+    "seg_goodput_p05_mbps",
+]
+VIDEO_FIELDS = TIMING_FIELDS[:-1] + SEGMENT_FIELDS
+
+
+class Player:
+    """
+    Playback model: segment i (0-based) is due at
+    play_start + i * seg_duration + stalls so far.
+    """
+
+    def __init__(self, seg_duration_s, startup_segments):
+        self.seg_duration_s = seg_duration_s
+        self.startup_segments = startup_segments
+        self.n_complete = 0
+        self.play_start = None
+        self.stall_count = 0
+        self.stall_total_s = 0.0
+
+    def position(self, now):
+        """
+        Media time played out at `now` (s); frozen while stalled.
+        """
+        if self.play_start is None:
+            return 0.0
+        played = now - self.play_start - self.stall_total_s
+        return max(0.0, min(played, self.n_complete * self.seg_duration_s))
+
+    def complete(self, idx, now):
+        self.n_complete = idx + 1
+        if self.play_start is None:
+            if self.n_complete >= self.startup_segments:
+                self.play_start = now
+            return
+        due = self.play_start + idx * self.seg_duration_s + self.stall_total_s
+        if now > due:
+            self.stall_count += 1
+            self.stall_total_s += now - due
+
+
+async def _read_response(reader):
+    """
+    One response on a keep-alive connection. Returns (t_first_byte,
+    body_bytes); the body is read exactly so the next pipelined
+    response starts at the right byte.
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    t_first = time.perf_counter()
+    status = int(head.split(b" ", 2)[1])
+    if status != 200:
+        raise ConnectionError(f"HTTP {status}")
+    length = _content_length(head)
+    if length is None:
+        raise ConnectionError("response without Content-Length")
+    got = 0
+    while got < length:
+        chunk = await reader.read(min(READ_BYTES, length - got))
+        if not chunk:
+            raise ConnectionError(f"short body {got}/{length}")
+        got += len(chunk)
+    return t_first, got
+
+
+async def play(host, port, paths, run_id, depth, player, max_buffer_s):
+    """
+    Fetch all segments; returns (session dict, per-segment rows).
+    """
+    n = len(paths)
+    t_req = [None] * n
+    rows = []
+    res = {"size_download": 0}
+    t0 = time.perf_counter()
+    writer = None
+    try:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        res["time_namelookup"] = time.perf_counter() - t0
+
+        family, _, _, _, addr = infos[0]
+        reader, writer = await asyncio.open_connection(addr[0], port, family=family)
+        res["time_connect"] = time.perf_counter() - t0
+        res["time_appconnect"] = 0.0
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        res["time_pretransfer"] = time.perf_counter() - t0
+
+        slots = asyncio.Semaphore(depth)
+
+        async def send_all():
+            for i, path in enumerate(paths):
+                await slots.acquire()
+                while max_buffer_s > 0 and player.play_start is not None:
+                    ahead = i * player.seg_duration_s - player.position(time.perf_counter())
+                    if ahead <= max_buffer_s:
+                        break
+                    await asyncio.sleep(ahead - max_buffer_s)
+                writer.write(
+                    (
+                        f"GET /{path.lstrip('/')} HTTP/1.1\r\n"
+                        f"Host: {host}:{port}\r\n"
+                        f"User-Agent: starlink-qoe-segments\r\n"
+                        f"X-Run-Id: {run_id}\r\n"
+                        f"Connection: {'keep-alive' if i < n - 1 else 'close'}\r\n\r\n"
+                    ).encode()
+                )
+                t_req[i] = time.perf_counter()
+                await writer.drain()
+
+        sender = asyncio.create_task(send_all())
+        try:
+            for i in range(n):
+                t_first, got = await _read_response(reader)
+                now = time.perf_counter()
+                slots.release()
+                player.complete(i, now)
+                rows.append([i + 1, got, t_req[i] - t0, t_first - t0, now - t0])
+                res["size_download"] += got
+                if i == 0:
+                    res["time_starttransfer"] = t_first - t0
+            await sender
+        finally:
+            sender.cancel()
+
+        total = time.perf_counter() - t0
+        res["time_total"] = total
+        res["speed_download"] = res["size_download"] / total if total > 0 else 0.0
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+        res["error"] = str(e) or e.__class__.__name__
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+    return res, rows
+
+
+def summarize(rows, n_segments, depth, player, max_buffer_s):
+    nan = float("nan")
+    out = {
+        "n_segments": n_segments,
+        "segments_ok": len(rows),
+        "pipeline_depth": depth,
+        "seg_duration_s": player.seg_duration_s,
+        "max_buffer_s": max_buffer_s,
+        "startup_delay_s": nan,
+        "stall_count": player.stall_count,
+        "stall_total_s": player.stall_total_s,
+    }
+    if player.play_start is not None and rows:
+        out["startup_delay_s"] = rows[player.startup_segments - 1][4]
+    if not rows:
+        for k in SEGMENT_FIELDS[8:]:
+            out[k] = nan
+        return out
+
+    a = np.asarray(rows, dtype=np.float64)
+    nbytes, t_req, t_first, t_done = a[:, 1], a[:, 2], a[:, 3], a[:, 4]
+    # With pipelining a response can only start once the previous one is
+    # done, so time from max(request, previous completion)
+    start = np.maximum(t_req, np.concatenate(([t_req[0]], t_done[:-1])))
+    ttfb = t_first - start
+    dl = t_done - start
+    out["seg_ttfb_p50_s"], out["seg_ttfb_p95_s"] = (float(v) for v in np.percentile(ttfb, [50, 95]))
+    out["seg_time_p50_s"], out["seg_time_p95_s"] = (float(v) for v in np.percentile(dl, [50, 95]))
+    ok = dl > 0
+    gp = nbytes[ok] * 8.0 / dl[ok] / 1e6
+    out["seg_goodput_p05_mbps"] = float(np.percentile(gp, 5)) if gp.size else nan
+    if len(rows) < n_segments:
+        # Unplayed tail counts as one open-ended stall
+        out["stall_count"] += 1
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Segmented DASH-style video QoE fetch")
+    ap.add_argument("--host", required=True)
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--run-dir", required=True)
+    ap.add_argument("--template", default="video_segments_1M/seg_{:02d}.bin",
+                    help="segment path, formatted with the 1-based segment number")
+    ap.add_argument("--count", type=int, default=60)
+    ap.add_argument("--depth", type=int, default=1, help="requests in flight (pipelining)")
+    ap.add_argument("--seg-duration-s", type=float, default=1.0)
+    ap.add_argument("--max-buffer-s", type=float, default=0.0, help="0 = fetch as fast as possible")
+    ap.add_argument("--startup-segments", type=int, default=1)
+    ap.add_argument("--slot", default="slot1")
+    ap.add_argument("--tech", default="starlink")
+    ap.add_argument("--plan", default="residential")
+    ap.add_argument("--mode", default="direct")
+    ap.add_argument("--app-kind", default="synthetic")
+    ap.add_argument("--run-idx", default="1")
+    args = ap.parse_args()
+
+    if args.count < 1 or args.depth < 1 or args.seg_duration_s <= 0:
+        ap.error("need --count, --depth >= 1 and --seg-duration-s > 0")
+    if not 1 <= args.startup_segments <= args.count:
+        ap.error("--startup-segments must be between 1 and --count")
+    paths = [args.template.format(i) for i in range(1, args.count + 1)]
+
+    os.makedirs(args.run_dir, exist_ok=True)
+    run_id = os.path.basename(os.path.normpath(args.run_dir))
+    ts_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    player = Player(args.seg_duration_s, args.startup_segments)
+    try:
+        res, rows = asyncio.run(
+            asyncio.wait_for(
+                play(args.host, args.port, paths, run_id, args.depth, player, args.max_buffer_s),
+                TIMEOUT_S,
+            )
+        )
+    except asyncio.TimeoutError:
+        res, rows = {"size_download": 0, "error": "timeout"}, []
+
+    with open(os.path.join(args.run_dir, SEGMENT_LOG), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SEGMENT_LOG_FIELDS)
+        for idx, nbytes, t_req, t_first, t_done in rows:
+            writer.writerow([idx, nbytes, f"{t_req:.6f}", f"{t_first:.6f}", f"{t_done:.6f}"])
+
+    summary = summarize(rows, len(paths), args.depth, player, args.max_buffer_s)
+    row = {
+        "timestamp": ts_utc,
+        "slot": args.slot,
+        "tech": args.tech,
+        "plan": args.plan,
+        "mode": args.mode,
+        "app_class": "video",
+        "app_kind": args.app_kind,
+        "asset_name": os.path.dirname(args.template) or args.template,
+        "anchor_host": args.host,
+        "anchor_port": args.port,
+        "run_idx": args.run_idx,
+        "url": f"http://{args.host}:{args.port}/{os.path.dirname(args.template.lstrip('/'))}/",
+        **{k: res.get(k) for k in TIMING_FIELDS[12:20]},
+        **summary,
+    }
+    with open(os.path.join(args.run_dir, "video_timing.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(VIDEO_FIELDS)
+        writer.writerow([_fmt(row.get(k)) for k in VIDEO_FIELDS])
+
+    print(
+        f"[*] {summary['segments_ok']}/{summary['n_segments']} segments, depth {args.depth}: "
+        f"startup {summary['startup_delay_s']:.3f} s, "
+        f"{summary['stall_count']} stalls ({summary['stall_total_s']:.3f} s), "
+        f"segment TTFB p50 {summary['seg_ttfb_p50_s']:.3f} s"
+    )
+    if "error" in res:
+        print(f"[!] Segment fetch failed: {res['error']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-flow HTTP downloads (household contention mode).
+
+Starts N HTTP/1.1 GETs against the anchor at the same instant on one
+asyncio loop and times each flow the way run_starlink_web_qoe.sh times
+curl (seconds from flow start):
+
+    time_namelookup    after getaddrinfo
+    time_connect       after the TCP handshake
+    time_appconnect    0 (plain HTTP, same as curl)
+    time_pretransfer   just before the request is sent
+    time_starttransfer first response byte
+    time_total         last body byte
+    size_download      body bytes, speed_download = bytes/s
+
+Outputs (in RUN_DIR):
+  - web_timing.csv          one row per flow: web_timing.csv schema +
+                            flow_id, error (empty for completed flows)
+  - multiflow_summary.txt   n_flows, aggregate throughput (total bytes over
+                            the slowest flow's time_total), Jain's fairness
+                            index over per-flow goodput, min/mean/max flow
+                            goodput, all over the completed flows
+
+The metrics come from analysis/multiflow.py, which analyze_rq3_qoe.py
+uses for rq3_multiflow.csv as well.
+
+Assets are cycled over the flows, so `--files a.bin` with `--flows 4`
+runs four copies of a.bin and `--files a.bin,b.bin` alternates.
+
+Usage:
+  python3 web_multiflow.py --host H --port P --files F1[,F2...] --flows N
+                           --run-dir DIR [--slot S --tech T --plan P
+                           --mode M --app-kind K --run-idx R]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+# analysis/ in the repo; the same directory when deployed flat to ~/analysis
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+from multiflow import flow_metrics
+
+READ_BYTES = 256 * 1024
+TIMEOUT_S = 600.0
+
+TIMING_FIELDS = [
+    "timestamp",
+    "slot",
+    "tech",
+    "plan",
+    "mode",
+    "app_class",
+    "app_kind",
+    "asset_name",
+    "anchor_host",
+    "anchor_port",
+    "run_idx",
+    "url",
+    "time_namelookup",
+    "time_connect",
+    "time_appconnect",
+    "time_pretransfer",
+    "time_starttransfer",
+    "time_total",
+    "size_download",
+    "speed_download",
+    "flow_id",
+    "error",
+]
+
+
+def asset_name(path):
+    """
+    basename of the asset, keeping the size=... directory of virtual
+    synthetic objects (synthetic/size=250M/seed=7.bin -> size=250M_seed=7.bin).
+    """
+    parent, name = os.path.split(path.rstrip("/"))
+    if "=" in os.path.basename(parent):
+        return f"{os.path.basename(parent)}_{name}"
+    return name
+
+
+def _content_length(head):
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            return int(value.strip())
+    return None
+
+
+async def fetch(host, port, path, run_id):
+    """
+    One GET with curl-like timings. Returns a dict; on failure the
+    timings reached so far plus "error".
+    """
+    res = {"size_download": 0}
+    t0 = time.perf_counter()
+    res["start_epoch"] = time.time()
+    writer = None
+    try:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        res["time_namelookup"] = time.perf_counter() - t0
+
+        family, _, _, _, addr = infos[0]
+        reader, writer = await asyncio.open_connection(addr[0], port, family=family)
+        res["time_connect"] = time.perf_counter() - t0
+        res["time_appconnect"] = 0.0
+
+        request = (
+            f"GET /{path.lstrip('/')} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            f"User-Agent: starlink-qoe-multiflow\r\n"
+            f"X-Run-Id: {run_id}\r\n"
+            f"Connection: close\r\n\r\n"
+        ).encode()
+        res["time_pretransfer"] = time.perf_counter() - t0
+        writer.write(request)
+        await writer.drain()
+
+        buf = await reader.read(READ_BYTES)
+        res["time_starttransfer"] = time.perf_counter() - t0
+        while b"\r\n\r\n" not in buf:
+            more = await reader.read(READ_BYTES)
+            if not more:
+                raise ConnectionError("connection closed inside response headers")
+            buf += more
+
+        head, _, body = buf.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        if status != 200:
+            raise ConnectionError(f"HTTP {status}")
+        length = _content_length(head)
+
+        got = len(body)
+        while length is None or got < length:
+            chunk = await reader.read(READ_BYTES)
+            if not chunk:
+                break
+            got += len(chunk)
+
+        total = time.perf_counter() - t0
+        res["time_total"] = total
+        res["size_download"] = got
+        res["speed_download"] = got / total if total > 0 else 0.0
+        if length is not None and got < length:
+            res["error"] = f"short body {got}/{length}"
+    except (OSError, ValueError, IndexError, asyncio.TimeoutError) as e:
+        res["error"] = str(e) or e.__class__.__name__
+    finally:
+        res["end_epoch"] = time.time()
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+    return res
+
+
+async def run_flows(host, port, paths, run_id):
+    tasks = [
+        asyncio.wait_for(fetch(host, port, p, run_id), TIMEOUT_S) for p in paths
+    ]
+    out = await asyncio.gather(*tasks, return_exceptions=True)
+    return [
+        r if isinstance(r, dict) else {"size_download": 0, "error": repr(r)}
+        for r in out
+    ]
+
+
+def summarize(results):
+    m = flow_metrics(
+        [r.get("size_download") for r in results],
+        [r.get("time_total") for r in results],
+        [r.get("error") for r in results],
+    )
+    goodputs = m["goodputs_mbps"]
+    total_bytes = sum(r["size_download"] for r in results)
+
+    starts = [r["start_epoch"] for r in results if "start_epoch" in r]
+    ends = [r["end_epoch"] for r in results if "end_epoch" in r]
+    wall = max(ends) - min(starts) if starts and ends else float("nan")
+
+    nan = float("nan")
+    return {
+        "n_flows": len(results),
+        "failed_flows": len(results) - m["ok_flows"],
+        "total_bytes": total_bytes,
+        "wall_s": wall,
+        "aggregate_mbps": m["aggregate_mbps"],
+        "jain_index": m["jain_index"],
+        "flow_goodput_min_mbps": min(goodputs) if goodputs else nan,
+        "flow_goodput_mean_mbps": sum(goodputs) / len(goodputs) if goodputs else nan,
+        "flow_goodput_max_mbps": max(goodputs) if goodputs else nan,
+    }
+
+
+def _fmt(v):
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        return f"{v:.6f}"
+    return str(v)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent multi-flow web QoE downloads")
+    ap.add_argument("--host", required=True)
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--files", required=True, help="comma-separated asset paths")
+    ap.add_argument("--flows", type=int, default=4)
+    ap.add_argument("--run-dir", required=True)
+    ap.add_argument("--slot", default="slot1")
+    ap.add_argument("--tech", default="starlink")
+    ap.add_argument("--plan", default="residential")
+    ap.add_argument("--mode", default="direct")
+    ap.add_argument("--app-kind", default="synthetic")
+    ap.add_argument("--run-idx", default="1")
+    args = ap.parse_args()
+
+    files = [f for f in args.files.split(",") if f]
+    if not files or args.flows < 1:
+        ap.error("need at least one file and one flow")
+    paths = [files[i % len(files)] for i in range(args.flows)]
+
+    os.makedirs(args.run_dir, exist_ok=True)
+    run_id = os.path.basename(os.path.normpath(args.run_dir))
+    ts_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    results = asyncio.run(run_flows(args.host, args.port, paths, run_id))
+
+    csv_path = os.path.join(args.run_dir, "web_timing.csv")
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TIMING_FIELDS)
+        for flow_id, (path, r) in enumerate(zip(paths, results), start=1):
+            row = {
+                "timestamp": ts_utc,
+                "slot": args.slot,
+                "tech": args.tech,
+                "plan": args.plan,
+                "mode": args.mode,
+                "app_class": "web",
+                "app_kind": args.app_kind,
+                "asset_name": asset_name(path),
+                "anchor_host": args.host,
+                "anchor_port": args.port,
+                "run_idx": args.run_idx,
+                "url": f"http://{args.host}:{args.port}/{path.lstrip('/')}",
+                "flow_id": flow_id,
+                "error": r.get("error"),
+            }
+            for k in TIMING_FIELDS[12:20]:
+                row[k] = r.get(k)
+            writer.writerow([_fmt(row.get(k)) for k in TIMING_FIELDS])
+            if "error" in r:
+                print(f"[!] Flow {flow_id} ({path}) failed: {r['error']}", file=sys.stderr)
+
+    summary = summarize(results)
+    with open(os.path.join(args.run_dir, "multiflow_summary.txt"), "w") as f:
+        for k, v in summary.items():
+            f.write(f"{k}={_fmt(v)}\n")
+
+    print(
+        f"[*] {summary['n_flows']} flows: aggregate {summary['aggregate_mbps']:.2f} Mbps, "
+        f"Jain {summary['jain_index']:.3f}, "
+        f"per-flow {summary['flow_goodput_min_mbps']:.2f}-{summary['flow_goodput_max_mbps']:.2f} Mbps"
+    )
+    if summary["failed_flows"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()